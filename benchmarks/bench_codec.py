@@ -0,0 +1,56 @@
+"""
+Compares the binary game state encoding with the JSON one it replaced: encoded size, and encode/decode throughput.
+
+    python benchmarks/bench_codec.py
+"""
+import json
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import wordle  # noqa: E402
+
+
+def _sample_states():
+    states = {}
+    for label, guesses in (("new game", []), ("3 guesses", ["crane", "debug", "first"]),
+                           ("finished", ["crane", "debug", "first", "fifth", "sixth"])):
+        game = wordle.WordleGame()
+        game.game_state.solution = "sixth"
+        for guess in guesses:
+            game.submit_guess(guess, "Nobody")
+        game.game_state.game_board_message_id = 1012345678901234567
+        states[label] = game.game_state
+    return states
+
+
+def _ops_per_second(func, number=2_000):
+    return number / min(timeit.repeat(func, number=number, repeat=3))
+
+
+def main():
+    print(f"{'state':>10} {'format':>7} {'bytes':>6} {'encode/s':>10} {'decode/s':>10}")
+    for label, state in _sample_states().items():
+        encoded_json = json.dumps(state, cls=wordle.WordleJSONEncoder)
+        encoded_binary = wordle.encode_game_state(state)
+
+        def decode_json():
+            restored = wordle.WordleGameState()
+            restored.from_dict(json.loads(encoded_json))
+
+        rows = [
+            ("json", len(encoded_json.encode()),
+             _ops_per_second(lambda: json.dumps(state, cls=wordle.WordleJSONEncoder)),
+             _ops_per_second(decode_json)),
+            ("binary", len(encoded_binary),
+             _ops_per_second(lambda: wordle.encode_game_state(state)),
+             _ops_per_second(lambda: wordle.decode_game_state(encoded_binary))),
+        ]
+        for name, size, encode_rate, decode_rate in rows:
+            print(f"{label:>10} {name:>7} {size:>6} {encode_rate:>10.0f} {decode_rate:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Memory benchmark for active games.  Reports the bytes held per WordleGameState for the current compact board, and for
+the original layout of one WordleTile object (with a __dict__) per position, which is reproduced here for comparison.
+
+    python benchmarks/bench_memory.py [game count]
+"""
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import wordle  # noqa: E402
+
+
+class LegacyTile:
+    def __init__(self):
+        self.color = "#333"
+        self.letter = ' '
+        self.font_color = "#000000"
+
+    def from_dict(self, tile):
+        self.color = tile.get('color')
+        self.letter = tile.get('letter')
+        self.font_color = tile.get('font_color')
+
+
+class LegacyBoard:
+    def __init__(self):
+        self.board = [[LegacyTile() for _ in range(wordle.NUMBER_OF_LETTERS)] for _ in range(wordle.NUMBER_OF_GUESSES)]
+
+    def set_tile(self, row, col, color, letter):
+        self.board[row][col].color = color
+        self.board[row][col].letter = letter
+
+    def from_dict(self, board):
+        for y in range(0, len(board)):
+            for x in range(0, len(board[y])):
+                self.board[y][x].from_dict(board[y][x])
+
+
+class LegacyGameState:
+    def __init__(self):
+        self.game_board_message_id = None
+        self.guess_count = 0
+        self.solution = None
+        self.channel_id = None
+        self.is_over = False
+        self.board = LegacyBoard()
+
+    def from_dict(self, game_state):
+        self.game_board_message_id = game_state.get('game_board_message_id')
+        self.guess_count = game_state.get('guess_count')
+        self.solution = game_state.get('solution')
+        self.channel_id = game_state.get('channel_id')
+        self.is_over = game_state.get('is_over')
+        self.board.from_dict(game_state.get('board'))
+
+
+def _sample_state_dict():
+    game = wordle.WordleGame()
+    game.game_state.solution = "sixth"
+    for guess in ["crane", "debug", "first"]:
+        game.submit_guess(guess, "Nobody")
+    game.game_state.game_board_message_id = 1012345678901234567
+    return json.loads(json.dumps(game.game_state, cls=wordle.WordleJSONEncoder))
+
+
+def _measure(state_class, state_dict, count):
+    """
+    :return: (bytes per game, microseconds per from_dict restore)
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    states = []
+    for _ in range(count):
+        state = state_class()
+        state.from_dict(state_dict)
+        states.append(state)
+    elapsed = time.perf_counter() - started
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / count, elapsed / count * 1_000_000
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    state_dict = _sample_state_dict()
+    legacy_bytes, legacy_usec = _measure(LegacyGameState, state_dict, count)
+    compact_bytes, compact_usec = _measure(wordle.WordleGameState, state_dict, count)
+    print(f"{count} games with 3 guesses each")
+    print(f"{'layout':>8} {'bytes/game':>11} {'restore usec':>13}")
+    print(f"{'before':>8} {legacy_bytes:>11.0f} {legacy_usec:>13.1f}")
+    print(f"{'after':>8} {compact_bytes:>11.0f} {compact_usec:>13.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Storage throughput benchmark.  Saves, batch saves and loads binary game states through each backend the way the bot
+calls them, blocking backends included via the SyncStorageAdapter, and reports operations per second.  The Postgres
+backends are included when DATABASE_URL is set, and write to a scratch game name that is deleted afterwards.
+
+    python benchmarks/bench_storage.py [game count] [batch size]
+"""
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import wordle  # noqa: E402
+from storage.memory import MemoryStorage  # noqa: E402
+from storage.sqlite import SqliteStorage  # noqa: E402
+from storage.sync_adapter import as_async_storage  # noqa: E402
+
+GAME_NAME = "bench_storage"
+
+
+def _game_states(count):
+    rng = random.Random(1)
+    dictionary = wordle.dictionary.words_of_length(wordle.NUMBER_OF_LETTERS)
+    states = {}
+    for channel_id in range(1, count + 1):
+        game = wordle.WordleGame()
+        for _ in range(3):
+            game.submit_guess(rng.choice(dictionary), "Benchmark")
+        game.game_state.channel_id = channel_id
+        game.game_state.game_board_message_id = rng.getrandbits(60)
+        states[channel_id] = wordle.encode_game_state(game.game_state)
+    return states
+
+
+def _backends(directory):
+    yield "memory", lambda: MemoryStorage()
+    yield "sqlite", lambda: SqliteStorage(os.path.join(directory, "bench.db"))
+    if os.getenv("DATABASE_URL"):
+        import storage.async_postgres
+        import storage.postgres
+        yield "postgres", lambda: storage.async_postgres.AsyncPostgresStorage()
+        yield "postgres_sync", lambda: storage.postgres.PostgresStorage()
+
+
+async def _timed(operation):
+    started = time.perf_counter()
+    await operation()
+    return time.perf_counter() - started
+
+
+async def bench(name, game_storage, game_states, batch_size):
+    game_storage = as_async_storage(game_storage)
+    await game_storage.open()
+    count = len(game_states)
+    try:
+        async def save_each():
+            for channel_id, game_state in game_states.items():
+                await game_storage.save_game_state(GAME_NAME, channel_id, game_state)
+
+        async def save_batches():
+            items = list(game_states.items())
+            for start in range(0, count, batch_size):
+                await game_storage.save_game_states(GAME_NAME, dict(items[start:start + batch_size]))
+
+        async def load_each():
+            for channel_id in game_states:
+                await game_storage.load_game_state(GAME_NAME, channel_id)
+
+        async def load_concurrently():
+            await asyncio.gather(*(game_storage.load_game_state(GAME_NAME, channel_id) for channel_id in game_states))
+
+        results = [
+            ("save", await _timed(save_each)),
+            (f"save x{batch_size}", await _timed(save_batches)),
+            ("load", await _timed(load_each)),
+            ("load concurrent", await _timed(load_concurrently)),
+        ]
+        for operation, elapsed in results:
+            print(f"{name:>14} {operation:>16} {count / elapsed:>12,.0f} games/s")
+
+        for channel_id in game_states:
+            await game_storage.delete_game_state(GAME_NAME, channel_id)
+    finally:
+        await game_storage.close()
+
+
+async def main(count, batch_size):
+    game_states = _game_states(count)
+    print(f"{count} games, {sum(len(state) for state in game_states.values()) / count:.0f} bytes each")
+    with tempfile.TemporaryDirectory() as directory:
+        for name, create in _backends(directory):
+            await bench(name, create(), game_states, batch_size)
+
+
+if __name__ == '__main__':
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000,
+                     int(sys.argv[2]) if len(sys.argv) > 2 else 100))
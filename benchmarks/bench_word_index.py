@@ -0,0 +1,54 @@
+"""
+Micro-benchmark for guess validation.  Compares WordIndex membership checks against the plain list scan that
+WordleGame._check_valid_word used to do, as the dictionary grows.
+
+    python benchmarks/bench_word_index.py
+"""
+import random
+import string
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from word_index import WordIndex  # noqa: E402
+
+SIZES = [1_000, 10_000, 100_000, 250_000]
+LOOKUPS = 2_000
+
+
+def _random_words(count, rng):
+    generated = set()
+    while len(generated) < count:
+        length = rng.choice((4, 5, 5, 5, 6, 7))
+        generated.add("".join(rng.choice(string.ascii_lowercase) for _ in range(length)))
+    return list(generated)
+
+
+def _time_per_lookup(check, guesses, repeat=3):
+    # best of a few repeats, reported in microseconds per lookup
+    number = max(1, LOOKUPS // len(guesses)) if repeat > 1 else 1
+    best = min(timeit.repeat(lambda: [check(guess) for guess in guesses], number=number, repeat=repeat))
+    return best / (number * len(guesses)) * 1_000_000
+
+
+def main():
+    rng = random.Random(1234)
+    print(f"{'words':>8} {'index hit':>11} {'index miss':>11} {'list hit':>11} {'list miss':>11}   (usec/lookup)")
+    for size in SIZES:
+        word_list = _random_words(size, rng)
+        index = WordIndex(word_list)
+        hits = rng.sample(word_list, 200)
+        misses = ["".join(rng.choice(string.ascii_uppercase) for _ in range(5)) for _ in range(200)]
+
+        index_hit = _time_per_lookup(index.contains, hits)
+        index_miss = _time_per_lookup(index.contains, misses)
+        # the list scan is the old behaviour; keep its sample small so the run stays short at large sizes
+        list_hit = _time_per_lookup(lambda guess: guess.lower() in word_list, hits[:20], repeat=1)
+        list_miss = _time_per_lookup(lambda guess: guess.lower() in word_list, misses[:20], repeat=1)
+        print(f"{size:>8} {index_hit:>11.3f} {index_miss:>11.3f} {list_hit:>11.1f} {list_miss:>11.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,263 @@
+"""
+Offline load simulator.  Drives WordleDiscordHandler's /wordle command with stand-in Discord objects, so event loop,
+render and storage scaling can be measured without a live bot.  Players guess at random times in their channel, every
+Discord API call waits for the injected latency, and the run reports throughput, latency percentiles, event loop lag
+and memory.
+
+    python benchmarks/load_sim.py --channels 200 --players 4 --rate 0.5 --duration 30
+    python benchmarks/load_sim.py --storage memory --storage-latency 5 --render-mode thread --output run.json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import sys
+import time
+import warnings
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+warnings.simplefilter("ignore", DeprecationWarning)  # Pillow warns about textsize on every call
+
+import discord  # noqa: E402
+import wordle  # noqa: E402
+from image_cache import EncodedImageCache  # noqa: E402
+from metrics import NullMetrics  # noqa: E402
+from render_pool import RENDER_MODES, RenderExecutor  # noqa: E402
+from storage.memory import MemoryStorage  # noqa: E402
+
+
+class FakeDiscordApi:
+    """Stands in for Discord's REST API: every call waits for the injected latency, and is counted by route"""
+
+    def __init__(self, latency, jitter, rng):
+        self.latency = latency
+        self.jitter = jitter
+        self.rng = rng
+        self.calls = {}
+        self.messages = set()
+        self._message_ids = itertools.count(1)
+
+    async def request(self, route):
+        self.calls[route] = self.calls.get(route, 0) + 1
+        delay = self.latency + self.rng.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def new_message(self):
+        message_id = next(self._message_ids)
+        self.messages.add(message_id)
+        return FakeMessage(self, message_id)
+
+
+class FakeMessage:
+    def __init__(self, api, message_id):
+        self.api = api
+        self.id = message_id
+
+    async def delete(self):
+        await self.api.request("delete_message")
+        if self.id not in self.api.messages:
+            raise discord.NotFound(FakeHttpResponse(404, "Not Found"), "Unknown Message")
+        self.api.messages.discard(self.id)
+
+
+class FakeHttpResponse:
+    def __init__(self, status, reason):
+        self.status = status
+        self.reason = reason
+
+
+class FakeChannel:
+    def __init__(self, api, channel_id, guild_id=None):
+        self.api = api
+        self.id = channel_id
+        self.guild_id = guild_id
+
+    def get_partial_message(self, message_id):
+        return FakeMessage(self.api, message_id)
+
+
+class FakeResponse:
+    def __init__(self, api):
+        self.api = api
+
+    async def defer(self, thinking=False):
+        await self.api.request("interaction_callback")
+
+
+class FakeFollowup:
+    def __init__(self, api):
+        self.api = api
+
+    async def send(self, content=None, file=None, wait=False):
+        if file is not None:
+            file.fp.read()  # the upload reads the whole image
+        await self.api.request("followup")
+        return self.api.new_message()
+
+
+class FakeUser:
+    def __init__(self, name, user_id):
+        self.id = user_id
+        self.name = name
+        self.nick = None
+
+
+class FakeInteraction:
+    def __init__(self, api, channel, user):
+        self.api = api
+        self.client = None
+        self.channel = channel
+        self.channel_id = channel.id
+        self.guild_id = channel.guild_id
+        self.user = user
+        self.response = FakeResponse(api)
+        self.followup = FakeFollowup(api)
+
+    async def delete_original_response(self):
+        await self.api.request("delete_original_response")
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def _measure_loop_lag(lags, interval=0.05):
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, time.perf_counter() - started - interval))
+
+
+async def simulate(options):
+    rng = random.Random(options.seed)
+    api = FakeDiscordApi(options.api_latency / 1000, options.api_jitter / 1000, rng)
+    game_storage = None
+    if options.storage == "memory":
+        game_storage = MemoryStorage(latency=options.storage_latency / 1000)
+    handler = wordle.WordleDiscordHandler(None, game_storage,
+                                          render_executor=RenderExecutor(mode=options.render_mode,
+                                                                         max_workers=options.render_workers),
+                                          image_cache=EncodedImageCache(max_bytes=options.image_cache_mb * 1024 * 1024),
+                                          metrics=NullMetrics())
+    await handler.cog_load()
+
+    guesses = wordle.dictionary.words_of_length(wordle.NUMBER_OF_LETTERS)
+    # a few channels per guild, with guild ids spread across shards like real snowflakes
+    channels = [FakeChannel(api, channel_id, guild_id=(channel_id // 4 + 1) << 22)
+                for channel_id in range(1, options.channels + 1)]
+    latencies = []
+    errors = []
+    in_flight = set()
+    lags = []
+    lag_task = asyncio.ensure_future(_measure_loop_lag(lags))
+
+    async def guess(channel, user):
+        ctx = FakeInteraction(api, channel, user)
+        started = time.perf_counter()
+        try:
+            await handler._guess.callback(handler, ctx, rng.choice(guesses))
+        except Exception as e:
+            errors.append(repr(e))
+            return
+        latencies.append(time.perf_counter() - started)
+
+    async def player(channel, user, deadline):
+        loop = asyncio.get_running_loop()
+        while True:
+            wait = rng.expovariate(options.rate)
+            if loop.time() + wait >= deadline:
+                return
+            await asyncio.sleep(wait)
+            # players don't wait for each other's boards, so every guess is its own task, like a real interaction
+            task = asyncio.ensure_future(guess(channel, user))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+
+    deadline = asyncio.get_running_loop().time() + options.duration
+    started = time.perf_counter()
+    await asyncio.gather(*(player(channel, FakeUser(f"player{number}", number + 1), deadline)
+                           for channel in channels for number in range(options.players)))
+    submitted_for = time.perf_counter() - started
+    if in_flight:
+        await asyncio.gather(*list(in_flight))
+    elapsed = time.perf_counter() - started
+
+    lag_task.cancel()
+    try:
+        await lag_task
+    except asyncio.CancelledError:
+        pass
+    await handler.cog_unload()
+
+    outbound = handler._outbound.counters
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "options": vars(options),
+        },
+        "guesses": len(latencies),
+        "errors": len(errors),
+        "error_samples": errors[:5],
+        "elapsed_s": elapsed,
+        "submitting_s": submitted_for,
+        "throughput_per_s": len(latencies) / elapsed if elapsed else 0.0,
+        "latency_ms": {
+            "mean": statistics.mean(latencies) * 1000 if latencies else 0.0,
+            "p50": _percentile(latencies, 0.50) * 1000,
+            "p90": _percentile(latencies, 0.90) * 1000,
+            "p99": _percentile(latencies, 0.99) * 1000,
+            "max": max(latencies) * 1000 if latencies else 0.0,
+        },
+        "loop_lag_ms": {
+            "p50": _percentile(lags, 0.50) * 1000,
+            "p99": _percentile(lags, 0.99) * 1000,
+            "max": max(lags) * 1000 if lags else 0.0,
+        },
+        "board_updates": {"published": outbound["published"], "superseded": outbound["superseded"]},
+        "api_calls": dict(sorted(api.calls.items())),
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--channels", type=int, default=100, help="channels with a game going (default 100)")
+    parser.add_argument("--players", type=int, default=3, help="players guessing in each channel (default 3)")
+    parser.add_argument("--rate", type=float, default=0.2, help="guesses per second per player (default 0.2)")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds players keep guessing (default 10)")
+    parser.add_argument("--api-latency", type=float, default=80.0, help="ms per Discord API call (default 80)")
+    parser.add_argument("--api-jitter", type=float, default=20.0, help="+/- ms added to each call (default 20)")
+    parser.add_argument("--storage", choices=("none", "memory"), default="none", help="game storage (default none)")
+    parser.add_argument("--storage-latency", type=float, default=0.0, help="ms per storage call (default 0)")
+    parser.add_argument("--render-mode", choices=RENDER_MODES, default="inline", help="where boards are rendered")
+    parser.add_argument("--render-workers", type=int, default=None, help="render pool size (default CPU count)")
+    parser.add_argument("--image-cache-mb", type=float, default=32, help="encoded image cache size (default 32)")
+    parser.add_argument("--outbound-rate", type=float, help="override OUTBOUND_RATE, board requests/s per channel")
+    parser.add_argument("--seed", type=int, default=1, help="random seed (default 1)")
+    parser.add_argument("--output", help="also write the results JSON to this file")
+    options = parser.parse_args(argv)
+    if options.outbound_rate:
+        os.environ["OUTBOUND_RATE"] = str(options.outbound_rate)
+
+    results = asyncio.run(simulate(options))
+    text = json.dumps(results, indent=2)
+    if options.output:
+        Path(options.output).write_text(text)
+    print(text)
+    return 1 if results["errors"] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,272 @@
+"""
+Benchmark suite for the guess pipeline.  Each stage is timed on its own, at the scale of a busy bot, and the results are
+written as JSON so a run can be compared against a saved baseline.
+
+    python benchmarks/suite.py --output baseline.json
+    python benchmarks/suite.py --baseline baseline.json            # exits with 1 if any stage regressed
+    python benchmarks/suite.py --stages render,jpeg_encode --games 1000
+"""
+import argparse
+import io
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import warnings
+from datetime import datetime, timezone
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+
+warnings.simplefilter("ignore", DeprecationWarning)  # Pillow warns about textsize on every call
+
+import wordle  # noqa: E402
+
+SCHEMA_VERSION = 1
+
+
+def _guesses(count, rng):
+    dictionary = wordle.dictionary.words_of_length(wordle.NUMBER_OF_LETTERS)
+    return [rng.choice(dictionary) for _ in range(count)]
+
+
+def _games(count, guesses_each, rng):
+    """
+    :return: count games, each with guesses_each valid guesses already made
+    """
+    games = []
+    for _ in range(count):
+        game = wordle.WordleGame()
+        for guess in _guesses(guesses_each, rng):
+            game.submit_guess(guess, "Benchmark")
+        game.game_state.game_board_message_id = rng.getrandbits(60)
+        games.append(game)
+    return games
+
+
+def _time_rounds(run_round, ops_per_round, rounds):
+    """
+    :param run_round: callable doing ops_per_round operations
+    :return: a list of microseconds per operation, one per round
+    """
+    results = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        run_round()
+        results.append((time.perf_counter() - started) / ops_per_round * 1_000_000)
+    return results
+
+
+# Each stage takes the run options and returns a list of microseconds per operation, one per round
+
+def stage_import(options):
+    # a fresh interpreter each time, since the module only loads once per process
+    code = ("import time, warnings; warnings.simplefilter('ignore'); started = time.perf_counter(); import wordle; "
+            "print(time.perf_counter() - started)")
+    results = []
+    for _ in range(options.rounds):
+        output = subprocess.run([sys.executable, "-c", code], cwd=REPO_DIR, capture_output=True, text=True, check=True)
+        results.append(float(output.stdout.strip()) * 1_000_000)
+    return results
+
+
+def stage_submit_guess(options):
+    rng = random.Random(1)
+    games = [wordle.WordleGame() for _ in range(options.games)]
+    guesses = _guesses(options.games, rng)
+
+    def run_round():
+        for game, guess in zip(games, guesses):
+            game.game_state.guess_count = 0
+            game.game_state.is_over = False
+            game.submit_guess(guess, "Benchmark")
+    return _time_rounds(run_round, options.games, options.rounds)
+
+
+def stage_match_letters(options):
+    rng = random.Random(2)
+    games = [wordle.WordleGame() for _ in range(options.games)]
+    guesses = _guesses(options.games, rng)
+
+    def run_round():
+        for game, guess in zip(games, guesses):
+            game._match_letters(guess)
+    return _time_rounds(run_round, options.games, options.rounds)
+
+
+def stage_check_valid_word(options):
+    rng = random.Random(3)
+    game = wordle.WordleGame()
+    # a mix of valid words, unknown words and wrong lengths, roughly what players send
+    guesses = _guesses(options.games, rng)
+    for index in range(0, len(guesses), 4):
+        guesses[index] = "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(5))
+    for index in range(1, len(guesses), 10):
+        guesses[index] = guesses[index][:4]
+
+    def run_round():
+        for guess in guesses:
+            game.game_state.guess_count = 0
+            game._check_valid_word(guess)
+    return _time_rounds(run_round, len(guesses), options.rounds)
+
+
+def stage_render(options):
+    # one render per guess as a game progresses, which is what the bot does
+    rng = random.Random(4)
+    count = max(1, options.games // 50)
+    rounds = []
+    for _ in range(options.rounds):
+        games = [wordle.WordleGame() for _ in range(count)]
+        elapsed = 0
+        for guess_number in range(wordle.NUMBER_OF_GUESSES):
+            for game, guess in zip(games, _guesses(count, rng)):
+                game.submit_guess(guess, "Benchmark")
+                started = time.perf_counter()
+                game.render()
+                elapsed += time.perf_counter() - started
+        rounds.append(elapsed / (count * wordle.NUMBER_OF_GUESSES) * 1_000_000)
+    return rounds
+
+
+def stage_jpeg_encode(options):
+    games = _games(max(1, options.games // 50), 3, random.Random(5))
+    images = [game.render() for game in games]
+
+    def run_round():
+        for image in images:
+            arr = io.BytesIO()
+            image.save(arr, format="JPEG")
+    return _time_rounds(run_round, len(images), options.rounds)
+
+
+def stage_json_encode(options):
+    states = [game.game_state for game in _games(options.games, 3, random.Random(6))]
+
+    def run_round():
+        for state in states:
+            json.dumps(state, cls=wordle.WordleJSONEncoder)
+    return _time_rounds(run_round, len(states), options.rounds)
+
+
+def stage_from_dict(options):
+    states = [json.loads(json.dumps(game.game_state, cls=wordle.WordleJSONEncoder))
+              for game in _games(options.games, 3, random.Random(7))]
+
+    def run_round():
+        for state in states:
+            wordle.WordleGameState().from_dict(state)
+    return _time_rounds(run_round, len(states), options.rounds)
+
+
+def stage_binary_encode(options):
+    states = [game.game_state for game in _games(options.games, 3, random.Random(8))]
+
+    def run_round():
+        for state in states:
+            wordle.encode_game_state(state)
+    return _time_rounds(run_round, len(states), options.rounds)
+
+
+def stage_binary_decode(options):
+    blobs = [wordle.encode_game_state(game.game_state) for game in _games(options.games, 3, random.Random(9))]
+
+    def run_round():
+        for blob in blobs:
+            wordle.decode_game_state(blob)
+    return _time_rounds(run_round, len(blobs), options.rounds)
+
+
+STAGES = {
+    "import": stage_import,
+    "submit_guess": stage_submit_guess,
+    "match_letters": stage_match_letters,
+    "check_valid_word": stage_check_valid_word,
+    "render": stage_render,
+    "jpeg_encode": stage_jpeg_encode,
+    "json_encode": stage_json_encode,
+    "from_dict": stage_from_dict,
+    "binary_encode": stage_binary_encode,
+    "binary_decode": stage_binary_decode,
+}
+
+
+def run(options):
+    results = {
+        "schema": SCHEMA_VERSION,
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "games": options.games,
+            "rounds": options.rounds,
+        },
+        "stages": {},
+    }
+    for name in options.stages:
+        rounds = STAGES[name](options)
+        results["stages"][name] = {
+            "median_us": statistics.median(rounds),
+            "min_us": min(rounds),
+            "stdev_us": statistics.stdev(rounds) if len(rounds) > 1 else 0.0,
+            "rounds": len(rounds),
+        }
+        print(f"{name:>17} {results['stages'][name]['median_us']:>12.2f} us/op", file=sys.stderr)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    :return: a list of (stage, baseline median, current median, relative change) for stages present in both, and
+    whether any stage got slower by more than threshold
+    """
+    rows = []
+    regressed = False
+    for name, current in results["stages"].items():
+        previous = baseline.get("stages", {}).get(name)
+        if not previous:
+            continue
+        change = (current["median_us"] - previous["median_us"]) / previous["median_us"]
+        rows.append((name, previous["median_us"], current["median_us"], change))
+        if change > threshold:
+            regressed = True
+    return rows, regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=10_000, help="active games to simulate (default 10000)")
+    parser.add_argument("--rounds", type=int, default=5, help="timed rounds per stage (default 5)")
+    parser.add_argument("--stages", default=",".join(STAGES), help="comma separated stages to run")
+    parser.add_argument("--output", help="write the results JSON to this file, otherwise it goes to stdout")
+    parser.add_argument("--baseline", help="compare against a results file from an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="relative slowdown that counts as a regression (default 0.10)")
+    options = parser.parse_args(argv)
+    options.stages = [name.strip() for name in options.stages.split(",") if name.strip()]
+    unknown = [name for name in options.stages if name not in STAGES]
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(unknown)}")
+
+    results = run(options)
+    if options.output:
+        Path(options.output).write_text(json.dumps(results, indent=2))
+    else:
+        print(json.dumps(results, indent=2))
+
+    if options.baseline:
+        rows, regressed = compare(results, json.loads(Path(options.baseline).read_text()), options.threshold)
+        print(f"\n{'stage':>17} {'baseline':>12} {'current':>12} {'change':>8}", file=sys.stderr)
+        for name, previous, current, change in rows:
+            flag = "  REGRESSED" if change > options.threshold else ""
+            print(f"{name:>17} {previous:>12.2f} {current:>12.2f} {change:>+8.1%}{flag}", file=sys.stderr)
+        return 1 if regressed else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
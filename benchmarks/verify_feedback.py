@@ -0,0 +1,63 @@
+"""
+Checks the feedback module against the letter matching WordleGame used before it, the two pass scan over character
+lists below, for every guess and solution pair in a word list.  Every pair is scored by score_matrix, score and the
+reference, and score_pairs is checked on each row.  Exits with a non-zero status on the first mismatch.
+
+    python benchmarks/verify_feedback.py [word file]
+"""
+import sys
+import time
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+
+import feedback  # noqa: E402
+
+
+def reference_code(guess, solution):
+    """
+    The original WordleGame._match_letters, producing feedback values instead of setting tiles
+    """
+    colors = [feedback.GRAY] * len(guess)
+    solution = list(solution)
+    guess = list(guess)
+    for x in range(0, len(guess)):
+        if guess[x] == solution[x]:
+            colors[x] = feedback.GREEN
+            solution[x] = None
+            guess[x] = ' '
+    for x in range(0, len(guess)):
+        if guess[x] in solution:
+            colors[x] = feedback.YELLOW
+            solution[solution.index(guess[x])] = None
+    return feedback.pattern_code(colors)
+
+
+def main(argv):
+    path = Path(argv[0]) if argv else REPO_DIR / "data" / "words.txt"
+    words = [word.lower() for word in path.read_text().splitlines() if word]
+    started = time.perf_counter()
+    matrix = feedback.score_matrix(words, words)
+    print(f"score_matrix: {len(words) ** 2:,} pairs in {time.perf_counter() - started:.2f}s")
+
+    started = time.perf_counter()
+    encoded = feedback.encode_words(words)
+    for row, guess in enumerate(words):
+        pairs = feedback.score_pairs(encoded[row:row + 1].repeat(len(words), axis=0), encoded)
+        for column, solution in enumerate(words):
+            expected = reference_code(guess, solution)
+            results = {"score_matrix": matrix[row, column], "score_pairs": pairs[column],
+                       "score": feedback.score(guess, solution)}
+            for name, code in results.items():
+                if code != expected:
+                    print(f"Mismatch for {guess} against {solution}: expected "
+                          f"{feedback.decode_pattern(expected, len(guess))}, {name} gave "
+                          f"{feedback.decode_pattern(code, len(guess))}")
+                    return 1
+    print(f"All {len(words) ** 2:,} pairs match the reference, checked in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
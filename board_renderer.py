@@ -0,0 +1,245 @@
+import struct
+import threading
+from collections import OrderedDict
+from PIL import Image, ImageDraw
+
+EMPTY_TILE_COLOR = "#333"
+_BYTES_PER_PIXEL = 4  # Pillow keeps RGB pixels in 32 bits
+_sprite_header = struct.Struct('>HH')  # letter and color lengths, followed by both, then the raw RGB pixels
+
+
+class BoardCanvas:
+    """
+    A base image for one game, along with the tiles that have already been pasted onto each of its rows.
+    """
+
+    def __init__(self, image, rows):
+        self.image = image
+        self.rows = rows
+        self.lock = threading.Lock()
+
+
+class BoardRenderer:
+    """
+    Renders game boards from pre-rendered tile sprites.  Each (letter, color) tile is drawn once and cached, and each
+    game keeps a base image so that a new guess only pastes the row that changed.  The output is identical to drawing
+    every tile onto a blank canvas.  It is safe to render from several threads at once.
+    """
+
+    def __init__(self, tile_font, message_font, rows=6, cols=5, pixel_width=400, pixel_height=550,
+                 max_canvases=32):
+        """
+        :param tile_font: the ImageFont used for the tile letters, or a function returning it, which is called the
+            first time a tile has to be drawn
+        :param message_font: the ImageFont used for the message at the bottom of the board, or a function returning it
+        :param rows: the number of rows on the board
+        :param cols: the number of tiles in each row
+        :param pixel_width: width of the rendered image
+        :param pixel_height: height of the rendered image
+        :param max_canvases: how many per-game base images to keep before dropping the least recently used.  Each is a
+            full board's pixels, about 860 KiB at the default size, held by every process that renders
+        """
+        self._tile_font = tile_font
+        self._message_font = message_font
+        self.row_count = rows
+        self.col_count = cols
+        self.pixel_width = pixel_width
+        self.pixel_height = pixel_height
+        self.board_padding = 20
+        self.cell_padding = 3
+        self.block_size = int((pixel_width - (self.board_padding * 2)) / cols)
+        self.max_canvases = max_canvases
+
+        self._sprites = {}  # map of (letter, color) -> tile Image
+        self._text_sizes = {}  # map of (font, text) -> (width, height)
+        self._empty_board = None
+        self._empty_row = ((' ', EMPTY_TILE_COLOR),) * cols
+        self._canvases = OrderedDict()  # map of caller supplied key -> BoardCanvas, in least recently used order
+        self._lock = threading.RLock()  # guards the caches, each canvas has its own lock for pasting
+
+        # textsize needs a draw instance, but doesn't care what it draws on
+        self._measure = ImageDraw.Draw(Image.new("RGB", (1, 1)))
+
+    @property
+    def tile_font(self):
+        if callable(self._tile_font):
+            self._tile_font = self._tile_font()
+        return self._tile_font
+
+    @property
+    def message_font(self):
+        if callable(self._message_font):
+            self._message_font = self._message_font()
+        return self._message_font
+
+    def memory_usage(self):
+        """
+        The pixel memory the caches hold.  Pillow allocates pixels outside of Python's allocator, so tracemalloc misses
+        it.
+        :return: a dict of "canvases" and "sprites" -> (count, bytes)
+        """
+        with self._lock:
+            canvases = len(self._canvases)
+            sprites = len(self._sprites)
+        canvas_bytes = self.pixel_width * self.pixel_height * _BYTES_PER_PIXEL
+        sprite_bytes = self.block_size * self.block_size * _BYTES_PER_PIXEL
+        return {"canvases": (canvases, canvases * canvas_bytes), "sprites": (sprites, sprites * sprite_bytes)}
+
+    def export_sprites(self):
+        """
+        :return: every tile sprite drawn so far, packed into bytes for import_sprites
+        """
+        with self._lock:
+            sprites = list(self._sprites.items())
+        parts = [struct.pack('>H', self.block_size)]
+        for (text, color), sprite in sprites:
+            text = text.encode()
+            color = color.encode()
+            parts.append(_sprite_header.pack(len(text), len(color)))
+            parts.append(text)
+            parts.append(color)
+            parts.append(sprite.tobytes())
+        return b"".join(parts)
+
+    def import_sprites(self, data):
+        """
+        Add sprites exported by a renderer with the same fonts and size, so they don't have to be drawn again
+        :param data: bytes from export_sprites
+        :return: the number of sprites added
+        """
+        block_size = struct.unpack_from('>H', data, 0)[0]
+        if block_size != self.block_size:
+            raise ValueError(f"Sprites are {block_size} pixels, not {self.block_size}")
+        sprite_bytes = block_size * block_size * 3
+        sprites = {}
+        offset = 2
+        while offset < len(data):
+            text_length, color_length = _sprite_header.unpack_from(data, offset)
+            offset += _sprite_header.size
+            text = bytes(data[offset:offset + text_length]).decode()
+            offset += text_length
+            color = bytes(data[offset:offset + color_length]).decode()
+            offset += color_length
+            sprites[(text, color)] = Image.frombytes("RGB", (block_size, block_size),
+                                                     bytes(data[offset:offset + sprite_bytes]))
+            offset += sprite_bytes
+        with self._lock:
+            self._sprites.update(sprites)
+        return len(sprites)
+
+    def render(self, rows, message="", key=None):
+        """
+        Render an image of the board.
+        :param rows: a sequence of rows, each a sequence of (letter, color) tuples
+        :param message: an optional message to render at the bottom of the board
+        :param key: identifies the game, so that its base image can be reused on the next render
+        :return: a new Image instance that the caller owns
+        """
+        with self._lock:
+            canvas = self._canvas(key)
+        with canvas.lock:
+            for row_number, row in enumerate(rows):
+                row = tuple(row)
+                if canvas.rows[row_number] != row:
+                    self._paste_row(canvas.image, row_number, row)
+                    canvas.rows[row_number] = row
+            image = canvas.image.copy()
+
+        if message:
+            self._draw_message(image, message)
+        return image
+
+    def forget(self, key):
+        """
+        Drop the base image kept for a game, e.g. once the game is over
+        :param key: the key that was passed to render
+        :return: nothing
+        """
+        with self._lock:
+            self._canvases.pop(key, None)
+
+    def _canvas(self, key):
+        if key is not None:
+            canvas = self._canvases.get(key)
+            if canvas is not None:
+                self._canvases.move_to_end(key)
+                return canvas
+
+        canvas = BoardCanvas(self._empty_board_image().copy(), [self._empty_row] * self.row_count)
+        if key is not None:
+            self._canvases[key] = canvas
+            while len(self._canvases) > self.max_canvases:
+                self._canvases.popitem(last=False)
+        return canvas
+
+    def _empty_board_image(self):
+        if self._empty_board is None:
+            image = Image.new("RGB", (self.pixel_width, self.pixel_height))
+            for row_number in range(0, self.row_count):
+                self._paste_row(image, row_number, self._empty_row)
+            self._empty_board = image
+        return self._empty_board
+
+    def _paste_row(self, image, row_number, row):
+        y1 = self.board_padding + (row_number * self.block_size) + self.cell_padding
+        for col, (letter, color) in enumerate(row):
+            x1 = self.board_padding + (col * self.block_size) + self.cell_padding
+            image.paste(self._sprite(letter, color), (x1, y1))
+
+    def _sprite(self, letter, color):
+        """
+        Draw a single tile, including the gap to the next tile, with its top left corner at the origin.  Since tiles
+        always start on whole pixels, pasting the sprite gives the same pixels as drawing the tile in place.
+        """
+        text = letter.upper()
+        sprite = self._sprites.get((text, color))
+        if sprite is not None:
+            return sprite
+
+        with self._lock:
+            sprite = self._sprites.get((text, color))
+            if sprite is not None:
+                return sprite
+            sprite = Image.new("RGB", (self.block_size, self.block_size))
+            draw = ImageDraw.Draw(sprite)
+            draw.rounded_rectangle(xy=((0, 0), (self.block_size - self.cell_padding, self.block_size - self.cell_padding)),
+                                   radius=4,
+                                   fill=color)
+            text_size = self._text_size(self.tile_font, text)
+
+            # center the letter in the tile
+            draw.text(xy=((self.block_size - text_size[0]) / 2 - (self.cell_padding / 2),
+                          (self.block_size - text_size[1]) / 2 - self.cell_padding),
+                      text=text,
+                      font=self.tile_font
+                      )
+            # invalid guesses are drawn as typed, so arbitrary characters can end up here
+            if len(self._sprites) >= 1024:
+                self._sprites.clear()
+            self._sprites[(text, color)] = sprite
+        return sprite
+
+    def _text_size(self, font, text):
+        text_size = self._text_sizes.get((font, text))
+        if text_size is None:
+            text_size = self._measure.textsize(text=text, font=font)
+            # messages include player names, so don't let the metrics grow forever
+            if len(self._text_sizes) >= 4096:
+                self._text_sizes.clear()
+            self._text_sizes[(font, text)] = text_size
+        return text_size
+
+    def _draw_message(self, image, message):
+        # If there are multiple lines, render each line horizontally centered
+        draw = ImageDraw.Draw(image)
+        y1 = self.board_padding + (self.block_size * self.row_count) + (self.cell_padding * 4)
+        for message_line in message.splitlines():
+            text_size = self._text_size(self.message_font, message_line)
+            x1 = (self.pixel_width - text_size[0]) / 2
+            if x1 < self.board_padding:
+                x1 = self.board_padding
+            draw.text(xy=(x1,
+                          y1),
+                      text=message_line,
+                      font=self.message_font)
+            y1 += text_size[1] + (self.cell_padding * 2)
@@ -0,0 +1,140 @@
+"""
+Wordle feedback scoring, apart from any game or board.  Feedback for a guess is a color per tile, packed into a pattern
+code: each tile is a base 3 digit, the first tile least significant, so a five letter word's code fits in one byte.
+score and score_colors handle a single pair, and score_pairs and score_matrix score many at once with NumPy array
+operations over encoded words.  All of them follow WordleGame's duplicate letter rules: exact matches are green first,
+then each remaining guess letter, left to right, is yellow while the solution has an unmatched copy of it left over.
+"""
+import numpy as np
+
+GRAY = 0
+YELLOW = 1
+GREEN = 2
+
+
+def pattern_code(colors):
+    """
+    :param colors: a feedback value per tile, GRAY, YELLOW or GREEN
+    :return: the pattern code for those tiles
+    """
+    return sum(color * 3 ** i for i, color in enumerate(colors))
+
+
+def decode_pattern(code, length):
+    """
+    :param code: a pattern code
+    :param length: the number of tiles
+    :return: a list of the feedback value per tile
+    """
+    colors = []
+    for _ in range(0, length):
+        code, color = divmod(int(code), 3)
+        colors.append(color)
+    return colors
+
+
+def pattern_dtype(length):
+    """
+    :return: the smallest unsigned type that holds every pattern code for words of this length
+    """
+    return np.uint8 if 3 ** length <= 256 else np.uint16 if 3 ** length <= 65536 else np.uint32
+
+
+def encode_words(words):
+    """
+    :param words: equal length words
+    :return: a (len(words), word length) array of the words' code points
+    """
+    words = list(words)
+    if not words:
+        return np.empty((0, 0), dtype=np.uint32)
+    return np.frombuffer("".join(words).encode("utf-32-le"), dtype="<u4").reshape(len(words), -1)
+
+
+def score(guess, solution):
+    """
+    Score one guess.  For a single pair this is quicker than the array functions, which pay NumPy's per call overhead.
+    :param guess: the guessed word
+    :param solution: the solution, the same length as guess
+    :return: the pattern code
+    """
+    return pattern_code(score_colors(guess, solution))
+
+
+def score_colors(guess, solution):
+    """
+    :param guess: the guessed word
+    :param solution: the solution, the same length as guess
+    :return: a list of the feedback value per tile, as decode_pattern would give for score's code
+    """
+    colors = [GRAY] * len(guess)
+    unmatched = {}  # map of solution letter -> copies not matched exactly
+    for i in range(0, len(guess)):
+        if guess[i] == solution[i]:
+            colors[i] = GREEN
+        else:
+            unmatched[solution[i]] = unmatched.get(solution[i], 0) + 1
+    for i in range(0, len(guess)):
+        if colors[i] != GREEN and unmatched.get(guess[i]):
+            colors[i] = YELLOW
+            unmatched[guess[i]] -= 1
+    return colors
+
+
+def _score_arrays(guesses, solutions):
+    """
+    :param guesses: an (..., length) array of encoded guesses
+    :param solutions: an (..., length) array of encoded solutions, broadcastable against guesses
+    :return: the broadcast array of pattern codes
+    """
+    length = guesses.shape[-1]
+    shape = np.broadcast_shapes(guesses.shape[:-1], solutions.shape[:-1])
+    # unmatched[i] is where the solution's letter i isn't matched exactly, so is still free to make a yellow
+    unmatched = [guesses[..., i] != solutions[..., i] for i in range(0, length)]
+    codes = np.zeros(shape, dtype=pattern_dtype(length))
+    for i in range(0, length):
+        letter = guesses[..., i]
+        # copies of the letter the solution has outside of green tiles, less the copies earlier tiles took as yellow
+        available = np.zeros(shape, dtype=np.uint8)
+        for j in range(0, length):
+            available += (solutions[..., j] == letter) & unmatched[j]
+        taken = np.zeros(shape, dtype=np.uint8)
+        for j in range(0, i):
+            taken += (guesses[..., j] == letter) & unmatched[j]
+        colors = np.where(unmatched[i], (taken < available) * YELLOW, GREEN)
+        codes += colors.astype(codes.dtype) * codes.dtype.type(3 ** i)
+    return codes
+
+
+def _as_encoded(words):
+    return words if isinstance(words, np.ndarray) else encode_words(words)
+
+
+def score_pairs(guesses, solutions):
+    """
+    Score each guess against the solution at the same position
+    :param guesses: equal length words, or an array of them from encode_words
+    :param solutions: as many words as guesses, or an array of them
+    :return: an array of pattern codes, one per pair
+    """
+    guesses = _as_encoded(guesses)
+    solutions = _as_encoded(solutions)
+    if guesses.shape != solutions.shape:
+        raise ValueError(f"Expected as many guesses as solutions of the same length, got {guesses.shape} and "
+                         f"{solutions.shape}")
+    return _score_arrays(guesses, solutions)
+
+
+def score_matrix(guesses, solutions):
+    """
+    Score every guess against every solution
+    :param guesses: equal length words, or an array of them from encode_words
+    :param solutions: words of the same length, or an array of them
+    :return: a (len(guesses), len(solutions)) array of pattern codes
+    """
+    guesses = _as_encoded(guesses)
+    solutions = _as_encoded(solutions)
+    if guesses.shape[1:] != solutions.shape[1:]:
+        raise ValueError(f"Guesses of length {guesses.shape[1:]} can't be scored against solutions of length "
+                         f"{solutions.shape[1:]}")
+    return _score_arrays(guesses[:, None, :], solutions[None, :, :])
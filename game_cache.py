@@ -0,0 +1,217 @@
+import asyncio
+import itertools
+import logging
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class _CacheEntry:
+    __slots__ = ('game', 'last_used', 'dirty')
+
+    def __init__(self, game, dirty):
+        self.game = game
+        self.last_used = time.monotonic()
+        self.dirty = dirty
+
+
+class GameCache:
+    """
+    A bounded map of channel id -> game.  Games are loaded on first access, and evicted once they have been idle for
+    idle_ttl seconds or when more than max_games are held, least recently used first.  Games with changes that haven't
+    been saved are written back before they are dropped.
+    """
+
+    def __init__(self, load, save=None, max_games=10000, idle_ttl=3600.0):
+        """
+        :param load: coroutine function taking a channel id, returning the stored game or None
+        :param save: coroutine function taking a channel id and game, used to write back unsaved games
+        :param max_games: the most games to hold at once
+        :param idle_ttl: seconds a game may go unused before it is evicted
+        """
+        self._load = load
+        self._save = save
+        self.max_games = max_games
+        self.idle_ttl = idle_ttl
+        self._entries = OrderedDict()  # map of channel id -> _CacheEntry, least recently used first
+        self._loading = {}  # map of channel id -> Future, so concurrent misses share one load
+        self._eviction_task = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, channel_id):
+        return channel_id in self._entries
+
+    def games(self):
+        """
+        :return: a list of (channel id, game) for every game currently held
+        """
+        return [(channel_id, entry.game) for channel_id, entry in self._entries.items()]
+
+    async def get(self, channel_id):
+        """
+        Return the game for the channel, loading it if it isn't held yet
+        :param channel_id: the Discord channel id
+        :return: the game, or None if there isn't one
+        """
+        entry = self._entries.get(channel_id)
+        if entry is not None:
+            entry.last_used = time.monotonic()
+            self._entries.move_to_end(channel_id)
+            return entry.game
+
+        loading = self._loading.get(channel_id)
+        if loading is not None:
+            try:
+                return await asyncio.shield(loading)
+            except asyncio.CancelledError:
+                if not loading.cancelled():
+                    raise  # this caller was cancelled
+                return await self.get(channel_id)  # the caller doing the load was, so load it here instead
+
+        loading = asyncio.get_running_loop().create_future()
+        self._loading[channel_id] = loading
+        try:
+            game = await self._load(channel_id)
+            # the channel may have been given a new game while this one was loading
+            if channel_id not in self._entries and game is not None:
+                self._entries[channel_id] = _CacheEntry(game, dirty=False)
+                await self._evict_over_limit()
+            game = self._entries[channel_id].game if channel_id in self._entries else None
+        except BaseException as e:
+            # every outcome resolves the future, or callers waiting on it would wait forever
+            if isinstance(e, asyncio.CancelledError):
+                loading.cancel()
+            else:
+                loading.set_exception(e)
+                loading.exception()  # mark it retrieved, in case nobody else was waiting
+            raise
+        finally:
+            del self._loading[channel_id]
+        loading.set_result(game)
+        return game
+
+    async def put(self, channel_id, game):
+        """
+        Hold a new game for the channel, replacing any existing one.  It counts as unsaved until mark_saved is called.
+        :param channel_id: the Discord channel id
+        :param game: the game instance
+        :return: nothing
+        """
+        self._entries[channel_id] = _CacheEntry(game, dirty=True)
+        self._entries.move_to_end(channel_id)
+        await self._evict_over_limit()
+
+    def prime(self, channel_id, game):
+        """
+        Hold a game restored from storage ahead of its first use.  Games already held or being loaded are left alone,
+        and primed games are the first to go when space is needed.
+        :param channel_id: the Discord channel id
+        :param game: the game instance, as it is in storage
+        :return: True if the game was added
+        """
+        if channel_id in self._entries or channel_id in self._loading or len(self._entries) >= self.max_games:
+            return False
+        self._entries[channel_id] = _CacheEntry(game, dirty=False)
+        self._entries.move_to_end(channel_id, last=False)
+        return True
+
+    def mark_dirty(self, channel_id):
+        entry = self._entries.get(channel_id)
+        if entry is not None:
+            entry.dirty = True
+
+    def mark_saved(self, channel_id):
+        entry = self._entries.get(channel_id)
+        if entry is not None:
+            entry.dirty = False
+
+    async def evict_idle(self):
+        """
+        Drop every game that hasn't been used for idle_ttl seconds
+        :return: the number of games evicted
+        """
+        cutoff = time.monotonic() - self.idle_ttl
+        idle = []
+        for channel_id, entry in self._entries.items():
+            if entry.last_used > cutoff:
+                break  # everything after this was used more recently
+            idle.append(channel_id)
+        for channel_id in idle:
+            await self._evict(channel_id)
+        return len(idle)
+
+    async def flush(self):
+        """
+        Write back every game with unsaved changes, without evicting anything
+        :return: nothing
+        """
+        for channel_id, entry in list(self._entries.items()):
+            if entry.dirty:
+                await self._write_back(channel_id, entry)
+
+    def start(self, interval=60.0):
+        """
+        Start evicting idle games in the background
+        :param interval: seconds between checks
+        :return: nothing
+        """
+        if self._eviction_task is None:
+            self._eviction_task = asyncio.ensure_future(self._evict_periodically(interval))
+
+    async def close(self):
+        """
+        Stop the background eviction and write back anything unsaved
+        :return: nothing
+        """
+        if self._eviction_task is not None:
+            self._eviction_task.cancel()
+            try:
+                await self._eviction_task
+            except asyncio.CancelledError:
+                pass
+            self._eviction_task = None
+        await self.flush()
+
+    async def _evict_periodically(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                evicted = await self.evict_idle()
+                if evicted:
+                    logger.info(f"Evicted {evicted} idle games, {len(self._entries)} still active")
+            except Exception:
+                logger.exception("Failed to evict idle games")
+
+    async def _evict_over_limit(self):
+        excess = len(self._entries) - self.max_games
+        if excess > 0:
+            for channel_id in list(itertools.islice(self._entries, excess)):
+                await self._evict(channel_id)
+
+    async def _evict(self, channel_id):
+        entry = self._entries.get(channel_id)
+        if entry is None:
+            return
+        if entry.dirty:
+            try:
+                await self._write_back(channel_id, entry)
+            except Exception:
+                # keep it, a game that can't be saved yet is better held a little longer than lost
+                logger.exception(f"Failed to write back game for channel {channel_id}, not evicting it")
+                return
+        # it may have been used while it was being written back
+        if self._entries.get(channel_id) is entry and not entry.dirty:
+            del self._entries[channel_id]
+
+    async def _write_back(self, channel_id, entry):
+        entry.dirty = False  # cleared first, so a change made while saving marks it dirty again
+        if self._save is None:
+            return
+        try:
+            await self._save(channel_id, entry.game)
+        except Exception:
+            entry.dirty = True
+            raise
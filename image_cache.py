@@ -0,0 +1,179 @@
+import asyncio
+import functools
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+def board_key(rows, message, variant=""):
+    """
+    Build a content address for a board image, so identical boards share one encoded image regardless of which game
+    they belong to.
+    :param rows: a sequence of rows, each a sequence of (letter, color) tuples
+    :param message: the message shown under the board
+    :param variant: describes how the image is drawn and encoded, so the disk tier, which outlives the process, never
+        serves an image made by an older renderer or at another size or quality
+    :return: a hex digest
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{variant}\x1c".encode())
+    for row in rows:
+        for letter, color in row:
+            digest.update(f"{letter}\x1f{color}\x1e".encode())
+        digest.update(b"\x1d")
+    digest.update((message or "").encode())
+    return digest.hexdigest()
+
+
+class EncodedImageCache:
+    """
+    A bounded, least recently used cache of encoded board images keyed by board_key.  There is an optional disk tier,
+    which keeps images across restarts.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, disk_dir=None, max_disk_files=10000):
+        """
+        :param max_bytes: the most image bytes to hold in memory
+        :param disk_dir: a directory for the disk tier, or None to only cache in memory
+        :param max_disk_files: the most images to keep in disk_dir
+        """
+        self.max_bytes = max_bytes
+        self.max_disk_files = max_disk_files
+        self._images = OrderedDict()  # map of key -> encoded bytes, least recently used first
+        self._bytes = 0
+        self._disk_dir = Path(disk_dir) if disk_dir else None
+        self._disk_files = None  # number of files in the disk tier, counted on first write
+        self._disk_lock = threading.Lock()  # disk writes run on executor threads, this keeps the count right
+        self._disk_writes = set()  # writes started by put that haven't finished
+        self._counters = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "disk_evictions": 0}
+        if self._disk_dir:
+            self._disk_dir.mkdir(parents=True, exist_ok=True)
+
+    @classmethod
+    def from_env(cls):
+        """
+        Build a cache from the IMAGE_CACHE_MB, IMAGE_CACHE_DIR and IMAGE_CACHE_DISK_FILES environment variables
+        :return: the new EncodedImageCache instance
+        """
+        return cls(max_bytes=int(float(os.getenv("IMAGE_CACHE_MB") or 32) * 1024 * 1024),
+                   disk_dir=os.getenv("IMAGE_CACHE_DIR") or None,
+                   max_disk_files=int(os.getenv("IMAGE_CACHE_DISK_FILES") or 10000))
+
+    @property
+    def stats(self):
+        """
+        :return: the hit/miss/eviction counters, along with the current memory tier size
+        """
+        stats = dict(self._counters)
+        stats["images"] = len(self._images)
+        stats["bytes"] = self._bytes
+        return stats
+
+    async def get(self, key):
+        """
+        :param key: a board_key
+        :return: the encoded image bytes, or None if it isn't cached
+        """
+        data = self._images.get(key)
+        if data is not None:
+            self._images.move_to_end(key)
+            self._counters["hits"] += 1
+            return data
+
+        if self._disk_dir:
+            loop = asyncio.get_running_loop()
+            data = await loop.run_in_executor(None, self._read_disk, key)
+            if data is not None:
+                self._counters["disk_hits"] += 1
+                self._remember(key, data)
+                return data
+
+        self._counters["misses"] += 1
+        return None
+
+    async def put(self, key, data):
+        """
+        Cache an encoded image.  The disk tier is written in the background, so the caller isn't held up by it.
+        :param key: a board_key
+        :param data: the encoded image bytes
+        :return: nothing
+        """
+        self._remember(key, data)
+        if self._disk_dir:
+            loop = asyncio.get_running_loop()
+            write = loop.run_in_executor(None, functools.partial(self._write_disk, key, data))
+            self._disk_writes.add(write)
+            write.add_done_callback(self._disk_write_done)
+
+    def _disk_write_done(self, write):
+        self._disk_writes.discard(write)
+        if not write.cancelled() and write.exception() is not None:
+            logger.error("Failed to write a cached board image", exc_info=write.exception())
+
+    async def wait_for_disk(self):
+        """
+        Wait for the disk writes started so far, such as before shutting down
+        :return: nothing
+        """
+        if self._disk_writes:
+            await asyncio.gather(*self._disk_writes, return_exceptions=True)
+
+    def _remember(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        previous = self._images.pop(key, None)
+        if previous is not None:
+            self._bytes -= len(previous)
+        self._images[key] = data
+        self._bytes += len(data)
+        while self._bytes > self.max_bytes:
+            _, evicted = self._images.popitem(last=False)
+            self._bytes -= len(evicted)
+            self._counters["evictions"] += 1
+
+    def _disk_path(self, key):
+        return self._disk_dir / f"{key}.jpg"
+
+    def _read_disk(self, key):
+        try:
+            return self._disk_path(key).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def _write_disk(self, key, data):
+        with self._disk_lock:
+            self._write_disk_locked(key, data)
+
+    def _write_disk_locked(self, key, data):
+        path = self._disk_path(key)
+        if path.exists():
+            return
+        try:
+            if self._disk_files is None:
+                self._disk_files = sum(1 for _ in self._disk_dir.glob("*.jpg"))
+            if self._disk_files >= self.max_disk_files:
+                self._trim_disk()
+            # write to a temp file first, so a crash never leaves a partial image behind under the real name
+            temp_path = path.with_suffix(f".{os.getpid()}.tmp")
+            temp_path.write_bytes(data)
+            os.replace(temp_path, path)
+            self._disk_files += 1
+        except OSError:
+            logger.exception(f"Failed to write cached board image {path}")
+
+    def _trim_disk(self):
+        # drop the oldest tenth, so the directory isn't rescanned on every write
+        files = sorted(self._disk_dir.glob("*.jpg"), key=lambda file: file.stat().st_mtime)
+        remove = files[:max(1, len(files) - int(self.max_disk_files * 0.9))]
+        for file in remove:
+            try:
+                file.unlink()
+                self._counters["disk_evictions"] += 1
+            except FileNotFoundError:
+                pass
+        self._disk_files = len(files) - len(remove)
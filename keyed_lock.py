@@ -0,0 +1,67 @@
+import asyncio
+
+
+class _KeyedLockEntry:
+    __slots__ = ('lock', 'users')
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0  # holders plus waiters
+
+
+class _KeyedLockContext:
+    __slots__ = ('_locks', '_key', '_entry')
+
+    def __init__(self, locks, key):
+        self._locks = locks
+        self._key = key
+
+    async def __aenter__(self):
+        self._entry = self._locks._acquire_entry(self._key)
+        try:
+            await self._entry.lock.acquire()
+        except BaseException:
+            self._locks._release_entry(self._key, self._entry)
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self._entry.lock.release()
+        self._locks._release_entry(self._key, self._entry)
+        return False
+
+
+class KeyedLock:
+    """
+    One asyncio lock per key (a channel), created on first use and dropped again once nobody holds or waits for it, so
+    only keys in use take any memory.  Work under different keys runs in parallel, and work under the same key runs one
+    at a time in the order it asked for the lock.
+
+        async with channel_locks(channel_id):
+            ...
+    """
+
+    def __init__(self):
+        self._entries = {}  # map of key -> _KeyedLockEntry
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __call__(self, key):
+        return _KeyedLockContext(self, key)
+
+    def locked(self, key):
+        entry = self._entries.get(key)
+        return entry is not None and entry.lock.locked()
+
+    def _acquire_entry(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = _KeyedLockEntry()
+        entry.users += 1
+        return entry
+
+    def _release_entry(self, key, entry):
+        entry.users -= 1
+        if entry.users == 0 and self._entries.get(key) is entry:
+            del self._entries[key]
@@ -0,0 +1,222 @@
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+_STOP = None  # put on the queue to end the writer thread
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats each record as one line of JSON, with its traceback, if it has one, as a field"""
+
+    def format(self, record):
+        entry = {"time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+                 "level": record.levelname,
+                 "logger": record.name,
+                 "message": record.getMessage()}
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        repeated = getattr(record, "repeated", 0)
+        if repeated:
+            entry["repeated"] = repeated
+        return json.dumps(entry)
+
+
+class DuplicateFilter(logging.Filter):
+    """
+    Lets the first of a run of identical errors through, then drops the same error until window seconds have passed
+    since the last one let through.  The next one let through carries how many were dropped in its repeated field.
+    Records below level always pass.
+    """
+
+    def __init__(self, window=60.0, level=logging.ERROR, max_keys=1024, clock=time.monotonic):
+        """
+        :param window: seconds an error is suppressed for after it is let through
+        :param level: the lowest level that is rate limited
+        :param max_keys: the most distinct errors to track, least recently seen are forgotten first
+        :param clock: returns the current time in seconds
+        """
+        super().__init__()
+        self.window = window
+        self.level = level
+        self.max_keys = max_keys
+        self._clock = clock
+        self._seen = OrderedDict()  # map of error key -> [time let through, count suppressed since]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno < self.level or self.window <= 0:
+            return True
+        exception = record.exc_info[1] if record.exc_info else None
+        key = (record.name, record.levelno, record.getMessage(), type(exception).__name__, str(exception))
+        now = self._clock()
+        with self._lock:
+            seen = self._seen.get(key)
+            if seen is not None and now - seen[0] < self.window:
+                seen[1] += 1
+                return False
+            if seen is not None and seen[1]:
+                record.repeated = seen[1]
+            self._seen[key] = [now, 0]
+            self._seen.move_to_end(key)
+            while len(self._seen) > self.max_keys:
+                self._seen.popitem(last=False)
+        return True
+
+
+class BatchRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """A RotatingFileHandler that can write a batch of records with a single flush"""
+
+    def emit_batch(self, records):
+        with self.lock:
+            if self.stream is None:
+                self.stream = self._open()
+            for record in records:
+                try:
+                    if self.shouldRollover(record):
+                        self.doRollover()
+                    self.stream.write(self.format(record) + self.terminator)
+                except Exception:
+                    self.handleError(record)
+            self.stream.flush()
+
+
+class _EnqueueHandler(logging.handlers.QueueHandler):
+    """
+    Puts records on the pipeline's queue, with their message and traceback rendered to text so the writer thread
+    never touches objects the logging code still uses.  Records are dropped and counted when the queue is full.
+    """
+
+    def __init__(self, pipeline_queue):
+        super().__init__(pipeline_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogPipeline:
+    """
+    Routes every logger through a queue, so logging from the event loop never waits on a file or the console.  A
+    background thread takes whatever records have queued up, writes them as JSON lines to size capped, rotating log
+    files, echoes them to the console, and flushes once per batch.  Identical errors are rate limited before they are
+    queued.
+    """
+
+    def __init__(self, path="log.txt", max_bytes=5 * 1024 * 1024, backup_count=5, level=logging.INFO,
+                 error_window=60.0, max_queued=10000, console=True):
+        """
+        :param path: the log file, rotated to path.1 and so on once it reaches max_bytes
+        :param max_bytes: the largest a log file grows to before it is rotated
+        :param backup_count: how many rotated files to keep
+        :param level: the lowest level logged
+        :param error_window: seconds an identical error is suppressed for after it is logged, 0 to log every one
+        :param max_queued: the most records waiting to be written, more are dropped
+        :param console: whether to echo records to stderr as well
+        """
+        self.level = level
+        self._queue = queue.Queue(max_queued)
+        self._enqueue = _EnqueueHandler(self._queue)
+        self._enqueue.addFilter(DuplicateFilter(error_window))
+        self._handlers = []
+        if path:
+            file_handler = BatchRotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count,
+                                                    encoding="utf-8", delay=True)
+            file_handler.setFormatter(JsonFormatter())
+            self._handlers.append(file_handler)
+        if console:
+            console_handler = logging.StreamHandler()
+            console_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+            self._handlers.append(console_handler)
+        self._thread = None
+
+    @classmethod
+    def from_env(cls):
+        """
+        Build a pipeline using the LOG_FILE, LOG_MAX_BYTES, LOG_BACKUP_COUNT, LOG_LEVEL and LOG_ERROR_WINDOW
+        environment variables
+        :return: the new LogPipeline instance
+        """
+        return cls(path=os.getenv("LOG_FILE", "log.txt"),
+                   max_bytes=int(os.getenv("LOG_MAX_BYTES") or 5 * 1024 * 1024),
+                   backup_count=int(os.getenv("LOG_BACKUP_COUNT") or 5),
+                   level=(os.getenv("LOG_LEVEL") or "INFO").upper(),
+                   error_window=float(os.getenv("LOG_ERROR_WINDOW") or 60))
+
+    @property
+    def dropped(self):
+        """
+        :return: the number of records dropped because the queue was full
+        """
+        return self._enqueue.dropped
+
+    def start(self):
+        """
+        Start the writer thread, and send the root logger's records through the pipeline in place of its handlers
+        :return: nothing
+        """
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._write_batches, name="log-writer", daemon=True)
+        self._thread.start()
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(self._enqueue)
+        root.setLevel(self.level)
+
+    def stop(self):
+        """
+        Detach from the root logger, write everything still queued and close the log files
+        :return: nothing
+        """
+        if self._thread is None:
+            return
+        logging.getLogger().removeHandler(self._enqueue)
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._thread = None
+        for handler in self._handlers:
+            handler.close()
+
+    def _write_batches(self):
+        while True:
+            batch = [self._queue.get()]
+            while batch[-1] is not _STOP:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            records = [record for record in batch if record is not _STOP]
+            if records:
+                self._write(records)
+            if batch[-1] is _STOP:
+                return
+
+    def _write(self, records):
+        for handler in self._handlers:
+            records_at_level = [record for record in records if record.levelno >= handler.level]
+            if hasattr(handler, "emit_batch"):
+                handler.emit_batch(records_at_level)
+            else:
+                for record in records_at_level:
+                    handler.handle(record)
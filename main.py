@@ -1,17 +1,27 @@
 import discord
-import asyncio
 from discord import app_commands
 from discord.ext import commands
+import atexit
 import dotenv
 import logging
 import os
-# import storage.postgres
-from datetime import datetime
+import storage.async_postgres
+import storage.memory
+import storage.postgres
+import storage.sqlite
+from storage.sync_adapter import as_async_storage
+from storage.write_behind import WriteBehindStorage
+from sharding import ShardConfig
+from log_pipeline import LogPipeline
 import json
 
 
 # Opens .env file
 dotenv.load_dotenv(".env")
+# every logger, discord.py's included, writes through a queue to a background thread, so logging never blocks the bot
+log_pipeline = LogPipeline.from_env()
+log_pipeline.start()
+atexit.register(log_pipeline.stop)
 logger = logging.getLogger(__name__)
 
 
@@ -20,32 +30,60 @@ storage_type = os.getenv("STORAGE_TYPE")
 if storage_type:
     storage_type = storage_type.lower()
     if storage_type == 'postgres':
+        game_storage = storage.async_postgres.AsyncPostgresStorage()
+    elif storage_type == 'postgres_sync':
         game_storage = storage.postgres.PostgresStorage()
+    elif storage_type == 'sqlite':
+        game_storage = storage.sqlite.SqliteStorage()
+    elif storage_type == 'memory':
+        game_storage = storage.memory.MemoryStorage()
 
+# Optionally hold back saves and write only the latest state per channel, in batches
+flush_interval = float(os.getenv("STORAGE_FLUSH_INTERVAL") or 0)
+if game_storage and flush_interval > 0:
+    game_storage = WriteBehindStorage(as_async_storage(game_storage),
+                                      flush_interval=flush_interval,
+                                      max_pending=int(os.getenv("STORAGE_FLUSH_SIZE") or 100))
 
-# Logs exception to .txt file.
+
+# Logs exception to the log file and the console, through the log pipeline
 def log_and_print_exception(e):
-    logging_file = open("log.txt", "a")
-    logging_file.write(f"{datetime.now()}\n{str(e)}\n\n")
-    logging_file.close()
-    print(f"Exception logged. Error:\n{e}")
+    logger.error("Exception logged", exc_info=e)
 
 
 
 
 def run_interaction_bot():
     # from discord.ext import commands
-    bot = commands.Bot(command_prefix='', intents=discord.Intents.all())
+    # Several processes can share the bot, each running some of the shards.  A process restores and plays only its own
+    # shards' games, and writes everything back when it stops, so changing the shard count is a restart of every
+    # process with the new SHARD_COUNT.
+    shards = ShardConfig.from_env()
+    if shards is None:
+        bot = commands.Bot(command_prefix='', intents=discord.Intents.all())
+    elif len(shards.shard_ids) == 1:
+        bot = commands.Bot(command_prefix='', intents=discord.Intents.all(),
+                           shard_id=shards.shard_ids[0], shard_count=shards.shard_count)
+    else:
+        bot = commands.AutoShardedBot(command_prefix='', intents=discord.Intents.all(),
+                                      shard_ids=list(shards.shard_ids), shard_count=shards.shard_count)
 
     @bot.event
     async def on_ready():
         logger.info(f'{bot.user} has logged in.')
-        await bot.tree.sync()
+        # commands are global, so one process registering them is enough
+        if ShardConfig.from_client(bot).primary:
+            await bot.tree.sync()
         print("Commands synced")
 
-    import wordle
-    asyncio.run(bot.add_cog(wordle.WordleDiscordHandler(bot, game_storage)))
-    bot.run(os.getenv('BOT_TOKEN'))
+    # The cog opens its storage when it loads, so it has to be added on the same event loop that bot.run uses
+    async def setup_hook():
+        import wordle
+        await bot.add_cog(wordle.WordleDiscordHandler(bot, game_storage))
+
+    bot.setup_hook = setup_hook
+    # discord.py would otherwise add its own console handler, its records already reach the pipeline
+    bot.run(os.getenv('BOT_TOKEN'), log_handler=None)
 
 
 
@@ -0,0 +1,258 @@
+import asyncio
+import logging
+import os
+import time
+from abc import ABCMeta, abstractmethod
+
+logger = logging.getLogger(__name__)
+
+# seconds, from a fast cache hit up to a slow Discord upload
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+class Histogram:
+    """Counts of observations falling into fixed upper-bound buckets, plus their total and sum"""
+    __slots__ = ('buckets', 'counts', 'count', 'sum')
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+
+
+class _Timer:
+    __slots__ = ('_metrics', '_name', '_labels', '_started')
+
+    def __init__(self, metrics, name, labels):
+        self._metrics = metrics
+        self._name = name
+        self._labels = labels
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._metrics.observe(f"{self._name}_seconds", time.perf_counter() - self._started, **self._labels)
+        if exc_type is not None:
+            self._metrics.increment(f"{self._name}_errors", **self._labels)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+class MetricsSink(metaclass=ABCMeta):
+    """Somewhere to publish metrics, such as an HTTP endpoint that is scraped"""
+
+    @abstractmethod
+    async def start(self, metrics):
+        pass
+
+    @abstractmethod
+    async def stop(self):
+        pass
+
+
+class NullMetrics:
+    """Collects nothing.  Used when metrics are disabled, so instrumented code costs next to nothing."""
+    enabled = False
+    _timer = _NullTimer()
+
+    def time(self, name, **labels):
+        return self._timer
+
+    def observe(self, name, value, **labels):
+        pass
+
+    def increment(self, name, amount=1, **labels):
+        pass
+
+    def set_gauge(self, name, value, **labels):
+        pass
+
+    def register_gauge(self, name, callback, **labels):
+        pass
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+
+class Metrics(NullMetrics):
+    """
+    Counters, gauges and latency histograms, published through one or more sinks.  Metric names get the prefix, and
+    every timed block records both its latency and, if it raised, an error count.
+    """
+    enabled = True
+
+    def __init__(self, sinks=(), prefix="wordle_", loop_lag_interval=1.0):
+        """
+        :param sinks: MetricsSink instances to publish through
+        :param prefix: prepended to every metric name
+        :param loop_lag_interval: seconds between event loop lag checks, or 0 to not check
+        """
+        self.prefix = prefix
+        self.sinks = list(sinks)
+        self.loop_lag_interval = loop_lag_interval
+        self.counters = {}  # map of name -> {label key -> value}
+        self.gauges = {}  # map of name -> {label key -> value or callable}
+        self.histograms = {}  # map of name -> {label key -> Histogram}
+        self._loop_lag_task = None
+
+    @classmethod
+    def from_env(cls):
+        """
+        Metrics are enabled by setting METRICS_PORT, which serves them for Prometheus on METRICS_HOST (127.0.0.1 by
+        default).
+        :return: a Metrics instance, or a NullMetrics if metrics are disabled
+        """
+        port = os.getenv("METRICS_PORT")
+        if not port:
+            return NullMetrics()
+        return cls(sinks=[PrometheusHttpSink(host=os.getenv("METRICS_HOST") or "127.0.0.1", port=int(port))])
+
+    def time(self, name, **labels):
+        """
+        Time a block of code, for use with a with statement.  The latency goes to the name_seconds histogram, and if
+        the block raises, name_errors_total is incremented.
+        :param name: the metric name
+        :return: a context manager
+        """
+        return _Timer(self, name, labels)
+
+    def observe(self, name, value, **labels):
+        series = self.histograms.setdefault(self.prefix + name, {})
+        key = _label_key(labels)
+        histogram = series.get(key)
+        if histogram is None:
+            histogram = series[key] = Histogram()
+        histogram.observe(value)
+
+    def increment(self, name, amount=1, **labels):
+        series = self.counters.setdefault(self.prefix + name + "_total", {})
+        key = _label_key(labels)
+        series[key] = series.get(key, 0) + amount
+
+    def set_gauge(self, name, value, **labels):
+        self.gauges.setdefault(self.prefix + name, {})[_label_key(labels)] = value
+
+    def register_gauge(self, name, callback, **labels):
+        """
+        Register a gauge whose value is read from callback whenever metrics are published
+        """
+        self.set_gauge(name, callback, **labels)
+
+    async def start(self):
+        for sink in self.sinks:
+            await sink.start(self)
+        if self.loop_lag_interval:
+            self._loop_lag_task = asyncio.ensure_future(self._measure_loop_lag())
+
+    async def stop(self):
+        if self._loop_lag_task:
+            self._loop_lag_task.cancel()
+            try:
+                await self._loop_lag_task
+            except asyncio.CancelledError:
+                pass
+            self._loop_lag_task = None
+        for sink in self.sinks:
+            await sink.stop()
+
+    async def _measure_loop_lag(self):
+        # anything blocking the loop delays this wake up, by as long as it blocked
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.loop_lag_interval)
+            lag = max(0.0, time.perf_counter() - started - self.loop_lag_interval)
+            self.observe("event_loop_lag_seconds", lag)
+            self.set_gauge("event_loop_lag_seconds_last", lag)
+
+    def exposition(self):
+        """
+        :return: every metric in the Prometheus text exposition format
+        """
+        lines = []
+        for name, series in sorted(self.counters.items()):
+            lines.append(f"# TYPE {name} counter")
+            for key, value in series.items():
+                lines.append(f"{name}{_format_labels(key)} {value}")
+        for name, series in sorted(self.gauges.items()):
+            lines.append(f"# TYPE {name} gauge")
+            for key, value in series.items():
+                if callable(value):
+                    try:
+                        value = value()
+                    except Exception:
+                        logger.exception(f"Failed to read gauge {name}")
+                        continue
+                lines.append(f"{name}{_format_labels(key)} {value}")
+        for name, series in sorted(self.histograms.items()):
+            lines.append(f"# TYPE {name} histogram")
+            for key, histogram in series.items():
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(key + (('le', repr(bound)),))} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(key + (('le', '+Inf'),))} {histogram.count}")
+                lines.append(f"{name}_sum{_format_labels(key)} {histogram.sum}")
+                lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(key):
+    if not key:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in key)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(key, escaped)) + "}"
+
+
+class PrometheusHttpSink(MetricsSink):
+    """Serves the metrics at /metrics in the Prometheus text format"""
+
+    def __init__(self, host="127.0.0.1", port=9100):
+        self.host = host
+        self.port = port
+        self._runner = None
+
+    async def start(self, metrics):
+        from aiohttp import web  # installed with discord.py
+
+        async def handle_metrics(request):
+            return web.Response(body=metrics.exposition().encode(),
+                                headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+        app = web.Application()
+        app.router.add_get("/metrics", handle_metrics)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info(f"Serving metrics on http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,180 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Paces requests to an average rate, allowing bursts of up to capacity.  Matches how Discord budgets requests per
+    channel, so waiting here instead of being rate limited keeps the bucket from running dry.
+    """
+    __slots__ = ('rate', 'capacity', '_tokens', '_updated', '_clock')
+
+    def __init__(self, rate=1.0, capacity=5, clock=time.monotonic):
+        """
+        :param rate: tokens added per second
+        :param capacity: the most tokens the bucket holds
+        :param clock: returns the current time in seconds
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._clock = clock
+        self._updated = clock()
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, cost=1):
+        """
+        Take cost tokens, going into debt if there aren't enough
+        :param cost: the number of tokens to take
+        :return: seconds to wait before the reserved requests may be sent
+        """
+        self._refill()
+        self._tokens -= cost
+        return max(0.0, -self._tokens / self.rate)
+
+    def time_to_full(self):
+        """
+        :return: seconds until the bucket is full again
+        """
+        self._refill()
+        return max(0.0, (self.capacity - self._tokens) / self.rate)
+
+    async def acquire(self, cost=1):
+        delay = self.reserve(cost)
+        if delay:
+            await asyncio.sleep(delay)
+
+
+class _Outbox:
+    __slots__ = ('bucket', 'pending', 'task', 'forget_handle')
+
+    def __init__(self, bucket):
+        self.bucket = bucket
+        self.pending = deque()  # (item, future, cost, keep) of updates not yet published, oldest first
+        self.task = None
+        self.forget_handle = None
+
+
+class OutboundScheduler:
+    """
+    Publishes updates one at a time per key (a channel), paced by a token bucket per key.  An update still waiting
+    when a newer one arrives for the same key is superseded and never published, since only the latest state is worth
+    posting, unless it was submitted with keep.
+    """
+
+    def __init__(self, publish, rate=1.0, burst=5):
+        """
+        :param publish: coroutine function taking an item, called for each update that is published
+        :param rate: requests per second allowed per key, on average
+        :param burst: requests that may be sent back to back before pacing kicks in
+        """
+        self._publish = publish
+        self.rate = rate
+        self.burst = burst
+        self._outboxes = {}  # map of key -> _Outbox
+        self._counters = {"submitted": 0, "published": 0, "superseded": 0}
+
+    @classmethod
+    def from_env(cls, publish):
+        """
+        Build a scheduler from the OUTBOUND_RATE and OUTBOUND_BURST environment variables
+        :param publish: coroutine function taking an item, called for each update that is published
+        :return: the new OutboundScheduler instance
+        """
+        return cls(publish,
+                   rate=float(os.getenv("OUTBOUND_RATE") or 1.0),
+                   burst=int(os.getenv("OUTBOUND_BURST") or 5))
+
+    @property
+    def counters(self):
+        """
+        :return: a copy of the submitted/published/superseded counters, with the number of keys currently tracked
+        """
+        counters = dict(self._counters)
+        counters["channels"] = len(self._outboxes)
+        return counters
+
+    async def submit(self, key, item, cost=1, keep=False):
+        """
+        Queue an update and wait for it to be published or superseded
+        :param key: updates with the same key are published in order, one at a time
+        :param item: passed to publish
+        :param cost: the number of requests publishing this update makes
+        :param keep: publish this update even if newer ones arrive before it goes out
+        :return: True if the update was published, False if a newer one replaced it first
+        """
+        return await self.enqueue(key, item, cost=cost, keep=keep)
+
+    def enqueue(self, key, item, cost=1, keep=False):
+        """
+        Queue an update without waiting for it, for callers that need it queued before they give up a lock.  Takes the
+        same arguments as submit.
+        :return: a Future resolving to True if the update was published, or False if a newer one replaced it first
+        """
+        outbox = self._outboxes.get(key)
+        if outbox is None:
+            outbox = self._outboxes[key] = _Outbox(TokenBucket(self.rate, self.burst))
+        if outbox.forget_handle is not None:
+            outbox.forget_handle.cancel()
+            outbox.forget_handle = None
+
+        self._counters["submitted"] += 1
+        if outbox.pending and not outbox.pending[-1][3]:
+            _, superseded, _, _ = outbox.pending.pop()
+            if not superseded.done():
+                superseded.set_result(False)
+            self._counters["superseded"] += 1
+        future = asyncio.get_running_loop().create_future()
+        outbox.pending.append((item, future, cost, keep))
+        if outbox.task is None:
+            outbox.task = asyncio.ensure_future(self._drain(key, outbox))
+        return future
+
+    async def close(self):
+        """
+        Wait for every queued update to be published
+        :return: nothing
+        """
+        tasks = [outbox.task for outbox in self._outboxes.values() if outbox.task is not None]
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        for outbox in self._outboxes.values():
+            if outbox.forget_handle is not None:
+                outbox.forget_handle.cancel()
+        self._outboxes.clear()
+
+    async def _drain(self, key, outbox):
+        try:
+            while outbox.pending:
+                # anything submitted while waiting for the bucket may replace what was pending, so take it afterwards
+                await outbox.bucket.acquire(outbox.pending[0][2])
+                item, future, _, _ = outbox.pending.popleft()
+                if future.done():
+                    continue  # the caller gave up waiting
+                try:
+                    await self._publish(item)
+                except Exception as e:
+                    if not future.done():
+                        future.set_exception(e)
+                    continue
+                self._counters["published"] += 1
+                if not future.done():
+                    future.set_result(True)
+        finally:
+            outbox.task = None
+            # keep the bucket until it has refilled, so a channel can't dodge the pacing by going briefly quiet
+            outbox.forget_handle = asyncio.get_running_loop().call_later(outbox.bucket.time_to_full(),
+                                                                        self._forget, key, outbox)
+
+    def _forget(self, key, outbox):
+        if self._outboxes.get(key) is outbox and outbox.task is None and not outbox.pending:
+            del self._outboxes[key]
@@ -0,0 +1,261 @@
+import asyncio
+import cProfile
+import io
+import logging
+import os
+import pstats
+import random
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# tracemalloc allocations are attributed to the first of these files found in their traceback, innermost first.
+# Pillow allocates pixels outside of Python's allocator, so tracemalloc only sees the renderer's Python objects, and
+# the pixels it holds come from a memory source instead.
+MEMORY_CATEGORIES = {
+    "game_cache.py": "active games",
+    "wordle.py": "games and tiles",
+    "board_renderer.py": "renderer objects",
+    "image_cache.py": "image buffers",
+    "render_pool.py": "image buffers",
+}
+_MEMORY_FRAMES = 8  # frames kept per allocation, enough to get from library code back to one of the files above
+_REPORT_LIMIT = 1900  # Discord messages are capped at 2000 characters
+
+
+def _format_bytes(size):
+    for unit in ("B", "KiB", "MiB"):
+        if abs(size) < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
+
+def memory_report(snapshot: tracemalloc.Snapshot, sources=None, top=5):
+    """
+    Summarize a tracemalloc snapshot.  CPU bound for a large snapshot, so the profiler runs this in an executor.
+    :param snapshot: the snapshot
+    :param sources: a dict of name -> a count, or a (count, bytes) tuple, reported by the bot rather than traced, such
+        as the number of active games or the renderer's pixel memory
+    :param top: how many of the largest allocating lines to list
+    :return: the report text
+    """
+    by_category = {}
+    for statistic in snapshot.statistics("traceback"):
+        category = "other"
+        for frame in statistic.traceback:
+            category = MEMORY_CATEGORIES.get(os.path.basename(frame.filename))
+            if category is not None:
+                break
+        else:
+            category = "other"
+        by_category[category] = by_category.get(category, 0) + statistic.size
+    lines = [f"Memory at {datetime.now():%H:%M:%S}, {_format_bytes(sum(by_category.values()))} traced"]
+    for category, size in sorted(by_category.items(), key=lambda item: item[1], reverse=True):
+        lines.append(f"  {category}: {_format_bytes(size)}")
+    if sources:
+        counted = []
+        for name, value in sources.items():
+            if isinstance(value, tuple):
+                count, size = value
+                counted.append(f"{name} {count} ({_format_bytes(size)})")
+            else:
+                counted.append(f"{name} {value}")
+        lines.append("  Reported by the bot, not traced: " + ", ".join(counted))
+    for statistic in snapshot.statistics("lineno")[:top]:
+        frame = statistic.traceback[0]
+        lines.append(f"  {os.path.basename(frame.filename)}:{frame.lineno} {_format_bytes(statistic.size)}")
+    return "\n".join(lines)
+
+
+class CommandProfiler:
+    """
+    Opt-in profiling of slash commands.  While capturing, a fraction of commands run under cProfile, one at a time
+    since it profiles everything the event loop does meanwhile.  A sampled command slower than the threshold has its
+    profile saved to a .prof file and summarized in the report.  A slow command that wasn't sampled makes the next run
+    of the same command be profiled.  Capturing also takes a tracemalloc snapshot every so often, broken down by
+    where the memory went.  When not capturing, wrapping a command costs one attribute check.
+    """
+
+    def __init__(self, sample_rate=0.05, slow_seconds=1.0, directory="profiles", memory_interval=300.0,
+                 max_dumps=20, random=random.random, clock=time.perf_counter):
+        """
+        :param sample_rate: the fraction of commands profiled while capturing
+        :param slow_seconds: commands taking at least this long have their profile kept
+        :param directory: where .prof files are saved
+        :param memory_interval: seconds between memory snapshots while capturing, or 0 to not trace memory
+        :param max_dumps: the most .prof files to keep, the oldest are deleted first
+        :param random: returns a random number in [0, 1)
+        :param clock: returns the current time in seconds
+        """
+        self.sample_rate = sample_rate
+        self.slow_seconds = slow_seconds
+        self.directory = Path(directory)
+        self.memory_interval = memory_interval
+        self.max_dumps = max_dumps
+        self.capturing = False
+        self.counters = {"profiled": 0, "slow": 0, "dumps": 0}
+        self.latest_profile = None  # summary of the last slow profiled command
+        self.latest_dump = None  # the .prof file for it
+        self.latest_memory = None  # the last memory report
+        self._random = random
+        self._clock = clock
+        self._active = None  # the cProfile.Profile running, only one can be
+        self._armed = set()  # commands that ran slow without being sampled, profiled on their next run
+        self._memory_sources = {}  # map of name -> callable, for live counts in the memory report
+        self._memory_task = None
+        self._started_tracing = False  # tracing may have been started outside the profiler, then it is left running
+
+    @classmethod
+    def from_env(cls):
+        """
+        Build a profiler using the PROFILE_SAMPLE_RATE, PROFILE_SLOW_SECONDS, PROFILE_DIR and PROFILE_MEMORY_INTERVAL
+        environment variables.  It is off until /wordle_profile starts it, unless PROFILE_ON_START is 1.
+        :return: the new CommandProfiler instance
+        """
+        profiler = cls(sample_rate=float(os.getenv("PROFILE_SAMPLE_RATE") or 0.05),
+                       slow_seconds=float(os.getenv("PROFILE_SLOW_SECONDS") or 1),
+                       directory=os.getenv("PROFILE_DIR") or "profiles",
+                       memory_interval=float(os.getenv("PROFILE_MEMORY_INTERVAL") or 300))
+        profiler.capturing = os.getenv("PROFILE_ON_START") == "1"
+        return profiler
+
+    def add_memory_source(self, name, callback):
+        """
+        :param name: the label in the memory report
+        :param callback: returns the current count, such as the number of active games, or a (count, bytes) tuple
+        :return: nothing
+        """
+        self._memory_sources[name] = callback
+
+    async def start(self):
+        """
+        Start tracing memory if capturing was turned on from the environment
+        :return: nothing
+        """
+        if self.capturing:
+            await self.start_capture()
+
+    async def start_capture(self):
+        self.capturing = True
+        if self.memory_interval > 0 and self._memory_task is None:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(_MEMORY_FRAMES)
+                self._started_tracing = True
+            self._memory_task = asyncio.ensure_future(self._snapshot_memory_periodically())
+
+    async def stop_capture(self):
+        self.capturing = False
+        self._armed.clear()
+        if self._memory_task is not None:
+            self._memory_task.cancel()
+            try:
+                await self._memory_task
+            except asyncio.CancelledError:
+                pass
+            self._memory_task = None
+            if self._started_tracing:
+                tracemalloc.stop()
+                self._started_tracing = False
+
+    async def close(self):
+        await self.stop_capture()
+
+    @contextmanager
+    def profile(self, command):
+        """
+        Wrap a command, for use with a with statement
+        :param command: the command name
+        :return: a context manager
+        """
+        if not self.capturing:
+            yield
+            return
+        profile = None
+        if self._active is None and (command in self._armed or self._random() < self.sample_rate):
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+                self._active = profile
+            except ValueError:
+                profile = None  # another profiler, such as a debugger's, is running
+        started = self._clock()
+        try:
+            yield
+        finally:
+            elapsed = self._clock() - started
+            if profile is not None:
+                profile.disable()
+                self._active = None
+                self.counters["profiled"] += 1
+            if elapsed >= self.slow_seconds:
+                self.counters["slow"] += 1
+                if profile is None:
+                    self._armed.add(command)
+                else:
+                    self._armed.discard(command)
+                    self._keep(command, elapsed, profile)
+
+    def _keep(self, command, elapsed, profile):
+        """
+        Save a slow command's profile and summarize it.  Only slow commands that were sampled get here, so the
+        small blocking write is rare.
+        """
+        output = io.StringIO()
+        pstats.Stats(profile, stream=output).strip_dirs().sort_stats("cumulative").print_stats(12)
+        started = datetime.now()
+        self.latest_profile = f"{command} took {elapsed:.2f}s at {started:%H:%M:%S}\n{output.getvalue().strip()}"
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            path = self.directory / f"{command}-{started:%Y%m%d-%H%M%S-%f}.prof"
+            profile.dump_stats(path)
+            self.latest_dump = path
+            self.counters["dumps"] += 1
+            for old in sorted(self.directory.glob("*.prof"))[:-self.max_dumps]:
+                old.unlink()
+        except OSError:
+            logger.exception(f"Failed to save the profile for a slow {command}")
+        logger.warning(f"Profiled a slow {command}, {elapsed:.2f}s")
+
+    async def _snapshot_memory_periodically(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.memory_interval)
+            await self.snapshot_memory(loop)
+
+    async def snapshot_memory(self, loop=None):
+        """
+        Take a tracemalloc snapshot and update the memory report from it, off the event loop
+        :return: the memory report, or None if memory isn't being traced
+        """
+        if not tracemalloc.is_tracing():
+            return None
+        loop = loop or asyncio.get_running_loop()
+        sources = {name: callback() for name, callback in self._memory_sources.items()}
+        try:
+            self.latest_memory = await loop.run_in_executor(
+                None, lambda: memory_report(tracemalloc.take_snapshot(), sources))
+        except Exception:
+            logger.exception("Failed to take a memory snapshot")
+        return self.latest_memory
+
+    def report(self):
+        """
+        :return: the capture state, counters, latest slow profile and latest memory report, short enough for one
+            Discord message
+        """
+        state = "on" if self.capturing else "off"
+        lines = [f"Profiling is {state}: sampling {self.sample_rate:.0%} of commands, keeping those over "
+                 f"{self.slow_seconds:g}s",
+                 f"Profiled {self.counters['profiled']}, slow {self.counters['slow']}, "
+                 f"saved {self.counters['dumps']}"]
+        if self.latest_memory:
+            lines.append(self.latest_memory)
+        if self.latest_profile:
+            lines.append(self.latest_profile)
+        report = "\n".join(lines)
+        return report if len(report) <= _REPORT_LIMIT else report[:_REPORT_LIMIT - 3] + "..."
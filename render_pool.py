@@ -0,0 +1,112 @@
+import asyncio
+import functools
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+MODE_INLINE = "inline"
+MODE_THREAD = "thread"
+MODE_PROCESS = "process"
+RENDER_MODES = (MODE_INLINE, MODE_THREAD, MODE_PROCESS)
+
+
+class RenderQueueFull(Exception):
+    """Raised when too many renders are already waiting for a worker"""
+    pass
+
+
+class RenderExecutor:
+    """
+    Runs CPU bound render and encode work, either inline on the event loop, or in a bounded thread or process pool so
+    that Pillow doesn't stall the Discord gateway.  At most max_workers jobs run at once, and at most max_queue more may
+    wait for a worker before new submissions are rejected with RenderQueueFull.
+    """
+
+    def __init__(self, mode=MODE_INLINE, max_workers=None, max_queue=64):
+        """
+        :param mode: one of RENDER_MODES
+        :param max_workers: the size of the pool, defaults to the number of CPUs
+        :param max_queue: how many jobs may wait for a free worker before submissions are rejected
+        """
+        if mode not in RENDER_MODES:
+            raise ValueError(f"Unknown render mode '{mode}', expected one of {', '.join(RENDER_MODES)}")
+        self.mode = mode
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self._executor = None
+        if mode == MODE_THREAD:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="render")
+        elif mode == MODE_PROCESS:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        self._slots = None  # created on first use, so it belongs to the running event loop
+        self._waiting = 0
+        self._running = 0
+        self._closed = False
+
+    @classmethod
+    def from_env(cls):
+        """
+        Build an executor from the RENDER_MODE, RENDER_WORKERS and RENDER_QUEUE_LIMIT environment variables
+        :return: the new RenderExecutor instance
+        """
+        mode = (os.getenv("RENDER_MODE") or MODE_INLINE).lower()
+        max_workers = os.getenv("RENDER_WORKERS")
+        max_queue = os.getenv("RENDER_QUEUE_LIMIT")
+        return cls(mode=mode,
+                   max_workers=int(max_workers) if max_workers else None,
+                   max_queue=int(max_queue) if max_queue else 64)
+
+    @property
+    def queue_depth(self):
+        """The number of jobs waiting for a free worker"""
+        return self._waiting
+
+    async def run(self, func, *args):
+        """
+        Run func(*args) according to the execution mode.  For the process mode, func and args must be picklable, so pass
+        module level functions and compact values rather than whole game instances.
+        :return: whatever func returns
+        """
+        if self._closed:
+            raise RuntimeError("RenderExecutor has been shut down")
+        if self._executor is None:
+            return func(*args)
+
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers)
+        if self._slots.locked():
+            if self._waiting >= self.max_queue:
+                raise RenderQueueFull(f"{self._waiting} renders are already waiting")
+            self._waiting += 1
+            try:
+                await self._slots.acquire()
+            finally:
+                self._waiting -= 1
+        else:
+            await self._slots.acquire()
+        if self._closed:
+            self._slots.release()
+            raise RuntimeError("RenderExecutor has been shut down")
+
+        self._running += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(func, *args))
+        finally:
+            self._running -= 1
+            self._slots.release()
+
+    async def shutdown(self):
+        """
+        Stop accepting work, let the jobs that were already submitted finish, and then stop the pool
+        :return: nothing
+        """
+        if self._closed:
+            return
+        self._closed = True
+        if self._executor is not None:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, functools.partial(self._executor.shutdown, wait=True))
+            logger.info(f"Render pool ({self.mode}) shut down")
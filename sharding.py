@@ -0,0 +1,77 @@
+import os
+from storage.base_storage import shard_for_guild
+
+
+class ShardConfig:
+    """
+    Which of Discord's shards this process runs.  Discord sends each guild's events to one shard, picked from the
+    guild id, so a process only ever sees guesses for the guilds its shards own.  Games are restored for that slice
+    alone, and the same handler code runs whether there is one process or many.
+    """
+    __slots__ = ('shard_ids', 'shard_count')
+
+    def __init__(self, shard_ids=(0,), shard_count=1):
+        """
+        :param shard_ids: the shards this process runs
+        :param shard_count: the total number of shards across every process
+        """
+        self.shard_ids = tuple(shard_ids)
+        self.shard_count = shard_count
+
+    @classmethod
+    def from_env(cls):
+        """
+        Read SHARD_COUNT, the total number of shards, and SHARD_IDS, the comma separated shards this process runs.
+        SHARD_IDS defaults to all of them.
+        :return: the new ShardConfig instance, or None to leave sharding to discord.py
+        """
+        shard_count = os.getenv("SHARD_COUNT")
+        if not shard_count:
+            return None
+        shard_count = int(shard_count)
+        shard_ids = os.getenv("SHARD_IDS")
+        if shard_ids:
+            shard_ids = [int(shard_id) for shard_id in shard_ids.split(",") if shard_id.strip()]
+        else:
+            shard_ids = range(0, shard_count)
+        for shard_id in shard_ids:
+            if not 0 <= shard_id < shard_count:
+                raise ValueError(f"Shard {shard_id} is outside of SHARD_COUNT {shard_count}")
+        return cls(shard_ids, shard_count)
+
+    @classmethod
+    def from_client(cls, client):
+        """
+        :param client: a discord Client or AutoShardedClient, or None
+        :return: the shards the client runs, or a single shard if it isn't sharded
+        """
+        shard_count = getattr(client, "shard_count", None) or 1
+        shard_ids = getattr(client, "shard_ids", None)
+        if shard_ids is None:
+            shard_id = getattr(client, "shard_id", None)
+            shard_ids = (shard_id,) if shard_id is not None else range(0, shard_count)
+        return cls(shard_ids, shard_count)
+
+    @property
+    def sharded(self):
+        """
+        :return: whether other processes run some of the shards
+        """
+        return len(self.shard_ids) < self.shard_count
+
+    @property
+    def primary(self):
+        """
+        :return: whether this process runs shard 0, which does the work only one process should, such as retention
+        """
+        return 0 in self.shard_ids
+
+    @property
+    def storage_filter(self):
+        """
+        :return: the shard argument for storage's iter_game_states, None when this process owns every game
+        """
+        return (self.shard_ids, self.shard_count) if self.sharded else None
+
+    def owns(self, guild_id):
+        return shard_for_guild(guild_id, self.shard_count) in self.shard_ids
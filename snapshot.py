@@ -0,0 +1,176 @@
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# A snapshot is a header, a table of named sections, then the sections themselves.  Each section has its own digest, so
+# a torn or corrupted file is caught before anything in it is used.
+SNAPSHOT_MAGIC = b'WGSNAP'
+SNAPSHOT_VERSION = 1
+_header = struct.Struct('>6sHH')  # magic, version, section count
+_section = struct.Struct('>16sQQ16s')  # name, offset, length, digest
+
+
+class SnapshotError(Exception):
+    """Raised when a snapshot file can't be used"""
+    pass
+
+
+def _digest(data):
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def write_snapshot(path, sections):
+    """
+    Write sections to a snapshot file.  It is written to a temporary file and renamed into place, so a reader never
+    sees half of one.
+    :param path: the snapshot file
+    :param sections: a dict of section name -> bytes
+    :return: the number of bytes written
+    """
+    path = Path(path)
+    table = []
+    offset = _header.size + _section.size * len(sections)
+    for name, data in sections.items():
+        encoded_name = name.encode()
+        if len(encoded_name) > 16:
+            raise ValueError(f"Snapshot section name {name} is longer than 16 bytes")
+        table.append(_section.pack(encoded_name, offset, len(data), _digest(data)))
+        offset += len(data)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    handle, temporary = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(handle, "wb") as snapshot_file:
+            snapshot_file.write(_header.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(sections)))
+            snapshot_file.writelines(table)
+            snapshot_file.writelines(sections.values())
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+    return offset
+
+
+class Snapshot:
+    """
+    A snapshot file, memory mapped so sections are read straight from the page cache rather than copied in.  Every
+    section's digest is checked when it is opened.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: the snapshot file
+        :raises SnapshotError: if the file isn't a snapshot, is from another version, or fails its checks
+        """
+        self.path = Path(path)
+        with open(self.path, "rb") as snapshot_file:
+            try:
+                self._map = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise SnapshotError(f"Snapshot {self.path} is empty")
+        self._view = memoryview(self._map)
+        self._sections = {}
+        try:
+            self._read_table()
+        except BaseException:
+            self.close()
+            raise
+
+    @classmethod
+    def open(cls, path):
+        """
+        :param path: the snapshot file, or None
+        :return: the Snapshot instance, or None if there is no usable snapshot at path
+        """
+        if not path:
+            return None
+        try:
+            return cls(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, SnapshotError) as e:
+            logger.warning(f"Ignoring snapshot {path}: {e}")
+            return None
+
+    def _read_table(self):
+        view = self._view
+        if len(view) < _header.size:
+            raise SnapshotError("File is too short")
+        magic, version, count = _header.unpack_from(view, 0)
+        if magic != SNAPSHOT_MAGIC:
+            raise SnapshotError("Not a snapshot file")
+        if version != SNAPSHOT_VERSION:
+            raise SnapshotError(f"Snapshot version {version} isn't {SNAPSHOT_VERSION}")
+        if len(view) < _header.size + _section.size * count:
+            raise SnapshotError("Section table is truncated")
+        for index in range(0, count):
+            name, offset, length, digest = _section.unpack_from(view, _header.size + _section.size * index)
+            name = name.rstrip(bytes(1)).decode()
+            data = self._sections[name] = view[offset:offset + length]
+            if len(data) != length or _digest(data) != digest:
+                raise SnapshotError(f"Section {name} failed its integrity check")
+
+    def section(self, name):
+        """
+        :param name: the section name
+        :return: a read only memoryview of the section, or None if the snapshot doesn't have it.  It is only valid
+            until the snapshot is closed, so copy anything that is kept.
+        """
+        return self._sections.get(name)
+
+    def close(self):
+        for data in self._sections.values():
+            data.release()
+        self._sections = {}
+        self._view.release()
+        self._map.close()
+
+
+class StartupTimer:
+    """
+    Times each phase of starting the bot, such as loading word lists or restoring games, for a breakdown once it is
+    ready to play
+    """
+
+    def __init__(self):
+        self.phases = []  # (name, seconds) in the order they finished
+        self._reported = False
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - started))
+
+    def add(self, name, seconds):
+        self.phases.append((name, seconds))
+
+    def report(self):
+        """
+        :return: a one line summary of the phases, slowest first
+        """
+        phases = sorted(self.phases, key=lambda phase: phase[1], reverse=True)
+        return ", ".join(f"{name} {seconds * 1000:.1f}ms" for name, seconds in phases)
+
+    def report_once(self, metrics):
+        """
+        Log the breakdown and record each phase in the startup_seconds histogram, the first time this is called
+        :param metrics: the Metrics instance
+        :return: nothing
+        """
+        if self._reported:
+            return
+        self._reported = True
+        for name, seconds in self.phases:
+            metrics.observe("startup_seconds", seconds, phase=name)
+        logger.info(f"Startup: {self.report()}")
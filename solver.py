@@ -0,0 +1,171 @@
+import hashlib
+import logging
+import os
+import tempfile
+import numpy as np
+import feedback
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+PATTERN_COUNT = 3 ** 5  # every code for a five letter word fits in a uint8
+_BUILD_ROWS = 512  # guesses scored at a time while building the matrix, and ranked at a time
+
+
+def word_list_digest(guesses, solutions):
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update("\n".join(guesses).encode())
+    digest.update(b"\x1d")
+    digest.update("\n".join(solutions).encode())
+    return digest.hexdigest()
+
+
+class FeedbackMatrix:
+    """
+    The feedback for every allowed guess against every possible solution, as a guess by solution array of pattern
+    codes.  It is built once per word list and saved as a .npy file, which later runs memory map rather than read, so
+    startup is instant and processes on the same host share the pages.
+    """
+
+    def __init__(self, guesses, solutions, codes):
+        """
+        :param guesses: the words that may be guessed, in row order
+        :param solutions: the words that may be the solution, in column order
+        :param codes: a (len(guesses), len(solutions)) uint8 array of pattern codes
+        """
+        self.guesses = list(guesses)
+        self.solutions = list(solutions)
+        self.codes = codes
+        self._guess_rows = {word: row for row, word in enumerate(self.guesses)}
+        self._solution_columns = {word: column for column, word in enumerate(self.solutions)}
+
+    @classmethod
+    def build(cls, guesses, solutions):
+        guesses = list(guesses)
+        solutions = list(solutions)
+        encoded_guesses = feedback.encode_words(guesses)
+        encoded_solutions = feedback.encode_words(solutions)
+        codes = np.empty((len(guesses), len(solutions)), dtype=np.uint8)
+        for start in range(0, len(guesses), _BUILD_ROWS):
+            codes[start:start + _BUILD_ROWS] = feedback.score_matrix(encoded_guesses[start:start + _BUILD_ROWS],
+                                                                     encoded_solutions)
+        return cls(guesses, solutions, codes)
+
+    @classmethod
+    def load_or_build(cls, guesses, solutions, directory):
+        """
+        Memory map the saved matrix for these word lists, building and saving it first if there isn't one.  The file
+        name includes a digest of the word lists, so changing either list builds a new matrix.
+        :param guesses: the words that may be guessed
+        :param solutions: the words that may be the solution
+        :param directory: where matrix files are kept
+        :return: the FeedbackMatrix instance
+        """
+        guesses = list(guesses)
+        solutions = list(solutions)
+        path = Path(directory) / f"feedback-{word_list_digest(guesses, solutions)}.npy"
+        try:
+            codes = np.load(path, mmap_mode="r")
+            if codes.shape == (len(guesses), len(solutions)):
+                return cls(guesses, solutions, codes)
+            logger.warning(f"Feedback matrix {path} has the wrong shape {codes.shape}, rebuilding it")
+        except FileNotFoundError:
+            pass
+        except ValueError:
+            logger.warning(f"Feedback matrix {path} can't be read, rebuilding it")
+
+        logger.info(f"Building the feedback matrix for {len(guesses)} guesses and {len(solutions)} solutions")
+        matrix = cls.build(guesses, solutions)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # written to a temporary file and renamed, so a process starting at the same time never maps half a matrix
+        handle, temporary = tempfile.mkstemp(dir=path.parent, suffix=".npy")
+        try:
+            with os.fdopen(handle, "wb") as matrix_file:
+                np.save(matrix_file, matrix.codes)
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+        return cls(guesses, solutions, np.load(path, mmap_mode="r"))
+
+    def guess_row(self, word):
+        return self._guess_rows.get(word)
+
+    def feedback(self, guess, solution):
+        """
+        :return: the pattern code for guess against solution, both of which must be in the matrix
+        """
+        return int(self.codes[self._guess_rows[guess], self._solution_columns[solution]])
+
+
+class Solver:
+    """
+    Narrows down the possible solutions from the feedback seen so far, and ranks guesses by how many solutions they
+    would leave on average.  Ranking reads a column of the feedback matrix per remaining solution and counts
+    patterns per guess, so it takes milliseconds once a guess or two have been made.  The opening ranking, over every
+    solution, is the slowest and is the same for every game, so it is kept after it is first worked out.
+    """
+
+    def __init__(self, matrix: FeedbackMatrix):
+        self.matrix = matrix
+        self._opening = None
+
+    @classmethod
+    def from_env(cls, guesses, solutions, default_directory):
+        """
+        Load the feedback matrix from FEEDBACK_MATRIX_DIR, building it there first if needed
+        :param guesses: the words that may be guessed
+        :param solutions: the words that may be the solution
+        :param default_directory: the matrix directory when FEEDBACK_MATRIX_DIR isn't set
+        :return: the new Solver instance
+        """
+        return cls(FeedbackMatrix.load_or_build(guesses, solutions,
+                                                os.getenv("FEEDBACK_MATRIX_DIR") or default_directory))
+
+    def candidates(self, history):
+        """
+        :param history: (guess, pattern code) for every guess made so far
+        :return: a sorted array of the solution columns that agree with all of them
+        """
+        columns = np.arange(0, len(self.matrix.solutions))
+        for guess, code in history:
+            row = self.matrix.guess_row(guess)
+            if row is not None:
+                observed = self.matrix.codes[row, columns]
+            else:
+                observed = feedback.score_matrix([guess], [self.matrix.solutions[column] for column in columns])[0]
+            columns = columns[observed == code]
+        return columns
+
+    def rank_guesses(self, columns, limit=5):
+        """
+        Rank every allowed guess by the expected number of solutions left after making it.  A guess that may be the
+        solution leaves none when it is, which breaks ties in its favor.
+        :param columns: the remaining solution columns, from candidates
+        :param limit: how many guesses to return
+        :return: up to limit (guess, expected solutions left) tuples, best first
+        """
+        remaining = len(columns)
+        if remaining == 0:
+            return []
+        if remaining == len(self.matrix.solutions) and self._opening is not None and len(self._opening) >= limit:
+            return self._opening[:limit]
+
+        scores = np.empty(len(self.matrix.guesses), dtype=np.float64)
+        offsets = (np.arange(0, _BUILD_ROWS, dtype=np.int64) * PATTERN_COUNT)[:, None]
+        for start in range(0, len(self.matrix.guesses), _BUILD_ROWS):
+            block = np.asarray(self.matrix.codes[start:start + _BUILD_ROWS][:, columns], dtype=np.int64)
+            rows = block.shape[0]
+            counts = np.bincount((block + offsets[:rows]).ravel(), minlength=rows * PATTERN_COUNT)
+            scores[start:start + rows] = (counts.reshape(rows, PATTERN_COUNT).astype(np.float64) ** 2).sum(axis=1)
+        for column in columns:
+            row = self.matrix.guess_row(self.matrix.solutions[column])
+            if row is not None:
+                scores[row] -= 1  # the all green pattern ends the game
+        scores /= remaining
+
+        best = np.argsort(scores, kind="stable")[:limit]
+        ranking = [(self.matrix.guesses[row], float(scores[row])) for row in best]
+        if remaining == len(self.matrix.solutions):
+            self._opening = ranking
+        return ranking
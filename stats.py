@@ -0,0 +1,243 @@
+import json
+import logging
+import os
+from collections import OrderedDict
+from keyed_lock import KeyedLock
+from storage.memory import MemoryStorage
+from storage.sync_adapter import as_async_storage
+
+logger = logging.getLogger(__name__)
+
+# Stats are stored per (guild, user).  The guild's own totals and leaderboard are stored under this user id, which no
+# Discord user has.
+GUILD_TOTALS = 0
+NO_GUILD = 0  # games played outside of a guild, such as in a DM
+
+
+class PlayerStats:
+    """
+    One player's counters within a guild.  A player has played every game they made a guess in, and won the games
+    they made the winning guess in.
+    """
+    __slots__ = ('played', 'wins', 'streak', 'max_streak', 'distribution')
+
+    def __init__(self, max_guesses=6):
+        self.played = 0
+        self.wins = 0
+        self.streak = 0  # wins in a row, up to the last game played
+        self.max_streak = 0
+        self.distribution = [0] * max_guesses  # wins by the number of guesses the game took
+
+    def record(self, won, guess_count):
+        self.played += 1
+        if won:
+            self.wins += 1
+            self.streak += 1
+            self.max_streak = max(self.max_streak, self.streak)
+            if 0 < guess_count <= len(self.distribution):
+                self.distribution[guess_count - 1] += 1
+        else:
+            self.streak = 0
+
+    def to_json(self):
+        return json.dumps({"played": self.played, "wins": self.wins, "streak": self.streak,
+                           "max_streak": self.max_streak, "distribution": self.distribution})
+
+    @classmethod
+    def from_json(cls, text, max_guesses=6):
+        values = json.loads(text)
+        stats = cls(max_guesses)
+        stats.played = values.get("played", 0)
+        stats.wins = values.get("wins", 0)
+        stats.streak = values.get("streak", 0)
+        stats.max_streak = values.get("max_streak", 0)
+        distribution = values.get("distribution") or []
+        stats.distribution[:len(distribution)] = distribution[:max_guesses]
+        return stats
+
+
+class Leaderboard:
+    """
+    A guild's top players by wins, then longest streak, kept up to date as each game is recorded rather than worked
+    out from every player's stats.  Both of those only ever go up, so a player outside the top can only get in when
+    one of their own games is recorded, and checking that player against the lowest entry keeps the board exact.
+    """
+    __slots__ = ('size', 'entries')
+
+    def __init__(self, size=10):
+        self.size = size
+        self.entries = []  # [user id, wins, max streak, played], best first
+
+    def update(self, user_id, stats: PlayerStats):
+        """
+        :param user_id: the player whose stats changed
+        :param stats: their new stats
+        :return: nothing
+        """
+        entry = [user_id, stats.wins, stats.max_streak, stats.played]
+        for index, existing in enumerate(self.entries):
+            if existing[0] == user_id:
+                self.entries[index] = entry
+                break
+        else:
+            if len(self.entries) >= self.size and _rank(entry) <= _rank(self.entries[-1]):
+                return
+            self.entries.append(entry)
+        self.entries.sort(key=_rank, reverse=True)
+        del self.entries[self.size:]
+
+
+def _rank(entry):
+    return entry[1], entry[2]
+
+
+class GuildStats:
+    """The guild's totals, and its leaderboard"""
+    __slots__ = ('played', 'wins', 'leaderboard')
+
+    def __init__(self, leaderboard_size=10):
+        self.played = 0
+        self.wins = 0
+        self.leaderboard = Leaderboard(leaderboard_size)
+
+    def to_json(self):
+        return json.dumps({"played": self.played, "wins": self.wins, "leaderboard": self.leaderboard.entries})
+
+    @classmethod
+    def from_json(cls, text, leaderboard_size=10):
+        values = json.loads(text)
+        stats = cls(leaderboard_size)
+        stats.played = values.get("played", 0)
+        stats.wins = values.get("wins", 0)
+        stats.leaderboard.entries = [list(entry) for entry in values.get("leaderboard") or []][:leaderboard_size]
+        return stats
+
+
+class StatsTracker:
+    """
+    Keeps per player and per guild counters as games finish, so reading a player's stats or a guild's leaderboard is
+    a single row, however many games have been played.  Rows are cached in memory, least recently used first, and
+    written through to storage as each game is recorded.  Games in one guild are recorded one at a time.
+    """
+
+    def __init__(self, game_storage, game_name, leaderboard_size=10, max_cached=10000, max_guesses=6):
+        """
+        :param game_storage: a BaseStorage or AsyncBaseStorage, or None to only keep stats in memory
+        :param game_name: the game the stats are for
+        :param leaderboard_size: how many players each guild's leaderboard holds
+        :param max_cached: the most player and guild rows to hold in memory
+        :param max_guesses: the most guesses a game can take
+        """
+        self._owns_storage = game_storage is None
+        self._storage = as_async_storage(game_storage if game_storage is not None else MemoryStorage())
+        self.game_name = game_name
+        self.leaderboard_size = leaderboard_size
+        self.max_cached = max_cached
+        self.max_guesses = max_guesses
+        # map of (guild id, user id) -> PlayerStats, or GuildStats for GUILD_TOTALS, least recently used first
+        self._cache = OrderedDict()
+        self._guild_locks = KeyedLock()
+
+    @classmethod
+    def from_env(cls, game_storage, game_name):
+        """
+        Build a tracker using the LEADERBOARD_SIZE and STATS_CACHE_SIZE environment variables
+        :param game_storage: the storage the stats are kept in
+        :param game_name: the game the stats are for
+        :return: the new StatsTracker instance
+        """
+        return cls(game_storage, game_name,
+                   leaderboard_size=int(os.getenv("LEADERBOARD_SIZE") or 10),
+                   max_cached=int(os.getenv("STATS_CACHE_SIZE") or 10000))
+
+    async def close(self):
+        """
+        Release the in-memory storage used when there was no game storage.  Game storage is left to its owner.
+        :return: nothing
+        """
+        if self._owns_storage:
+            await self._storage.close()
+
+    def _cached(self, key):
+        stats = self._cache.get(key)
+        if stats is not None:
+            self._cache.move_to_end(key)
+        return stats
+
+    def _remember(self, key, stats):
+        self._cache[key] = stats
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_cached:
+            self._cache.popitem(last=False)
+
+    def _parse(self, user_id, text):
+        if user_id == GUILD_TOTALS:
+            return GuildStats.from_json(text, self.leaderboard_size)
+        return PlayerStats.from_json(text, self.max_guesses)
+
+    def _new(self, user_id):
+        return GuildStats(self.leaderboard_size) if user_id == GUILD_TOTALS else PlayerStats(self.max_guesses)
+
+    async def _get_all(self, guild_id, user_ids):
+        """
+        :return: a dict of user id -> stats for each user id, from the cache or one storage call for the rest
+        """
+        found = {}
+        missing = []
+        for user_id in user_ids:
+            stats = self._cached((guild_id, user_id))
+            if stats is None:
+                missing.append(user_id)
+            else:
+                found[user_id] = stats
+        if missing:
+            stored = await self._storage.load_stats(self.game_name, guild_id, missing)
+            for user_id in missing:
+                # another call may have loaded the row meanwhile, and even changed it, so keep the one it cached
+                stats = self._cached((guild_id, user_id))
+                if stats is None:
+                    text = stored.get(user_id)
+                    stats = self._parse(user_id, text) if text is not None else self._new(user_id)
+                    self._remember((guild_id, user_id), stats)
+                found[user_id] = stats
+        return found
+
+    async def record_game(self, guild_id, participants, winner_id, guess_count):
+        """
+        Count a finished game for every player in it, and for the guild
+        :param guild_id: the guild the game was played in, or None outside of a guild
+        :param participants: the user ids of everyone who made a guess
+        :param winner_id: the user id that made the winning guess, or None if nobody won
+        :param guess_count: the number of guesses the game took
+        :return: nothing
+        """
+        guild_id = guild_id or NO_GUILD
+        participants = list(dict.fromkeys(participants))
+        if not participants:
+            return
+        async with self._guild_locks(guild_id):
+            rows = await self._get_all(guild_id, [GUILD_TOTALS] + participants)
+            guild = rows[GUILD_TOTALS]
+            guild.played += 1
+            if winner_id is not None:
+                guild.wins += 1
+            for user_id in participants:
+                player = rows[user_id]
+                player.record(user_id == winner_id, guess_count)
+                guild.leaderboard.update(user_id, player)
+            await self._storage.save_stats(self.game_name, guild_id,
+                                           {user_id: stats.to_json() for user_id, stats in rows.items()})
+
+    async def player_stats(self, guild_id, user_id):
+        """
+        :return: the player's PlayerStats in the guild, which are all zero if they haven't finished a game there
+        """
+        guild_id = guild_id or NO_GUILD
+        return (await self._get_all(guild_id, [user_id]))[user_id]
+
+    async def guild_stats(self, guild_id):
+        """
+        :return: the guild's GuildStats, with its leaderboard
+        """
+        guild_id = guild_id or NO_GUILD
+        return (await self._get_all(guild_id, [GUILD_TOTALS]))[GUILD_TOTALS]
@@ -0,0 +1,92 @@
+from abc import ABCMeta, abstractmethod
+from .base_storage import DEFAULT_BATCH_SIZE, filter_game_states
+
+
+class AsyncBaseStorage(metaclass=ABCMeta):
+    """Awaitable version of BaseStorage, for backends that shouldn't block the event loop"""
+
+    async def open(self):
+        """Connects to the database, called once the event loop is running"""
+        pass
+
+    async def close(self):
+        """Releases any connections"""
+        pass
+
+    async def flush(self):
+        """Writes out anything the storage is holding back, for backends that buffer saves"""
+        pass
+
+    @abstractmethod
+    async def delete_game_state(self, game_name, channel_id):
+        """Deletes current game"""
+        pass
+
+    @abstractmethod
+    async def get_all_game_states(self, game_name):
+        """Retrieves entire database"""
+        pass
+
+    @abstractmethod
+    async def load_game_state(self, game_name, channel_id):
+        pass
+
+    @abstractmethod
+    async def save_game_state(self, game_name, channel_id, game_state):
+        pass
+
+    async def save_game_states(self, game_name, game_states):
+        """
+        Saves several games at once.  Backends that can write them in one statement should override this.
+        :param game_name: the game all of the states belong to
+        :param game_states: a dict of channel id -> game state
+        """
+        for channel_id, game_state in game_states.items():
+            await self.save_game_state(game_name, channel_id, game_state)
+
+    async def archive_game_states(self, game_name, finished_age, stale_age, batch_size=DEFAULT_BATCH_SIZE):
+        """
+        Retention: move games that finished more than finished_age seconds ago to the archive, and delete unfinished
+        games nobody has played for stale_age seconds.  Rows are moved in batches.  Backends without an archive keep
+        everything.
+        :param game_name: the game to clean up
+        :param finished_age: seconds a finished game stays in the main table
+        :param stale_age: seconds an unfinished game may go unplayed before it is deleted
+        :param batch_size: the most rows moved or deleted per statement
+        :return: a tuple of (games archived, games deleted)
+        """
+        return 0, 0
+
+    async def load_stats(self, game_name, guild_id, user_ids):
+        """
+        Load rows of per player and per guild stats, as kept by stats.StatsTracker.  Backends without a stats table keep
+        none.
+        :param game_name: the game the stats are for
+        :param guild_id: the guild the stats are for
+        :param user_ids: the user ids of the rows to load
+        :return: a dict of user id -> stats text, for the rows that exist
+        """
+        return {}
+
+    async def save_stats(self, game_name, guild_id, stats):
+        """
+        Save rows of stats together, replacing any already stored
+        :param game_name: the game the stats are for
+        :param guild_id: the guild the stats are for
+        :param stats: a dict of user id -> stats text
+        """
+        pass
+
+    async def iter_game_states(self, game_name, include_finished=False, batch_size=DEFAULT_BATCH_SIZE, shard=None):
+        """
+        Stream the stored games in batches, so restoring doesn't hold every row at once.  Backends that can page
+        through their rows should override this.
+        :param game_name: the game to restore
+        :param include_finished: whether to include games that are over
+        :param batch_size: the most rows per batch
+        :param shard: a tuple of (shard ids, shard count) to only include games owned by those shards
+        :return: an async generator of lists of dicts of channel_id and game_state
+        """
+        rows = filter_game_states(await self.get_all_game_states(game_name), include_finished, shard)
+        for start in range(0, len(rows), batch_size):
+            yield rows[start:start + batch_size]
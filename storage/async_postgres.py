@@ -0,0 +1,177 @@
+import logging
+import os
+import psycopg
+from psycopg_pool import AsyncConnectionPool
+from .async_base_storage import AsyncBaseStorage
+from .base_storage import DEFAULT_BATCH_SIZE
+from .postgres import (ARCHIVE_FINISHED, COLUMN_MIGRATIONS, CREATE_ARCHIVE_TABLE, CREATE_STATS_TABLE, DELETE_STALE,
+                       INDEXES, LOAD_STATS, UPSERT_GAME_STATES, UPSERT_STATS, UPSERT_STATS_VALUES, UPSERT_VALUES,
+                       game_state_params, restore_query)
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncPostgresStorage(AsyncBaseStorage):
+    """
+    Postgres storage on a pool of async connections.  Statements are prepared on each connection, and connections that
+    have dropped are replaced by the pool, with a failed statement retried once on a fresh connection.
+    """
+
+    def __init__(self, connection_str=None, min_size=None, max_size=None):
+        self._connection_str = connection_str or os.getenv('DATABASE_URL')
+        self._min_size = min_size or int(os.getenv('DATABASE_POOL_MIN', 1))
+        self._max_size = max_size or int(os.getenv('DATABASE_POOL_MAX', 4))
+        self._pool: AsyncConnectionPool = None
+
+    async def open(self):
+        self._pool = AsyncConnectionPool(self._connection_str,
+                                         min_size=self._min_size,
+                                         max_size=self._max_size,
+                                         kwargs={"autocommit": True},
+                                         open=False)
+        await self._pool.open(wait=True)
+        await self._check_tables()
+
+    async def close(self):
+        if self._pool:
+            await self._pool.close()
+            self._pool = None
+
+    async def _execute(self, query, params=None, fetch=None, prepare=True):
+        """
+        Run a single statement, retrying once if the connection turned out to be broken
+        :param query: the SQL to run
+        :param params: the query parameters
+        :param fetch: None, "one", "all" or "rowcount"
+        :param prepare: whether to prepare the statement on the connection
+        :return: the fetched rows, if any were asked for
+        """
+        for attempt in range(0, 2):
+            try:
+                async with self._pool.connection() as connection:
+                    cursor = await connection.execute(query, params, prepare=prepare)
+                    if fetch == "one":
+                        return await cursor.fetchone()
+                    if fetch == "all":
+                        return await cursor.fetchall()
+                    if fetch == "rowcount":
+                        return cursor.rowcount
+                    return None
+            except psycopg.OperationalError:
+                if attempt:
+                    raise
+                logger.warning("Database connection failed, checking the pool and retrying")
+                await self._pool.check()
+
+    async def _create_game_states_table(self):
+        await self._execute("create table game_states ( "
+                            " game_name varchar(32), "
+                            " channel_id bigint, "
+                            " game_state text,"
+                            " unique (game_name, channel_id) "
+                            ");")
+        await self._execute("create unique index idx_game_channel on game_states (game_name, channel_id)")
+
+    async def _check_tables(self):
+        """
+        Check for missing tables and create them if necessary
+        :return:
+        """
+        tables = await self._execute("select table_name "
+                                     "from information_schema.tables "
+                                     "where table_schema='public' "
+                                     "and table_type='BASE TABLE' ", fetch="all")
+        table_names = [table[0] for table in tables]
+        if 'game_states' not in table_names:
+            await self._create_game_states_table()
+        await self._check_columns()
+
+    async def _check_columns(self):
+        """
+        Add any columns, indexes and tables that were introduced after the table was first created
+        :return:
+        """
+        columns = await self._execute("select column_name from information_schema.columns "
+                                      "where table_name='game_states'", fetch="all")
+        column_names = [column[0] for column in columns]
+        for column_name, definition, backfill in COLUMN_MIGRATIONS:
+            if column_name not in column_names:
+                await self._execute(f"alter table game_states add column {column_name} {definition}", prepare=False)
+                if backfill:
+                    await self._execute(backfill, prepare=False)
+        for index in INDEXES:
+            await self._execute(index, prepare=False)
+        await self._execute(CREATE_ARCHIVE_TABLE, prepare=False)
+        await self._execute(CREATE_STATS_TABLE, prepare=False)
+
+    async def delete_game_state(self, game_name, channel_id):
+        await self._execute("delete from game_states where game_name=%s and channel_id=%s",
+                            (game_name, channel_id))
+
+    async def get_all_game_states(self, game_name):
+        rows = await self._execute("select channel_id, game_state, game_state_bin from game_states where game_name=%s",
+                                   (game_name,), fetch="all")
+        return [{"channel_id": row[0], "game_state": row[2] if row[2] is not None else row[1]} for row in rows]
+
+    async def load_game_state(self, game_name, channel_id):
+        row = await self._execute("select game_state, game_state_bin from game_states "
+                                  "where game_name=%s and channel_id=%s",
+                                  (game_name, channel_id), fetch="one")
+        if not row:
+            return None
+        return row[1] if row[1] is not None else row[0]
+
+    async def iter_game_states(self, game_name, include_finished=False, batch_size=DEFAULT_BATCH_SIZE, shard=None):
+        # A server-side cursor holds one pooled connection for the whole restore, and rows arrive a batch at a time
+        async with self._pool.connection() as connection:
+            async with connection.transaction():
+                async with connection.cursor(name="restore_game_states") as cursor:
+                    await cursor.execute(*restore_query(game_name, include_finished, shard))
+                    while True:
+                        rows = await cursor.fetchmany(batch_size)
+                        if not rows:
+                            return
+                        yield [{"channel_id": row[0], "game_state": row[2] if row[2] is not None else row[1]}
+                               for row in rows]
+
+    async def load_stats(self, game_name, guild_id, user_ids):
+        rows = await self._execute(LOAD_STATS, (game_name, guild_id, list(user_ids)), fetch="all")
+        return dict(rows)
+
+    async def save_stats(self, game_name, guild_id, stats):
+        if not stats:
+            return
+        params = []
+        for user_id, text in stats.items():
+            params.extend((game_name, guild_id, user_id, text))
+        await self._execute(UPSERT_STATS.format(values=", ".join([UPSERT_STATS_VALUES] * len(stats))), params,
+                            prepare=False)
+
+    async def save_game_state(self, game_name, channel_id, game_state):
+        await self._execute(UPSERT_GAME_STATES.format(values=UPSERT_VALUES),
+                            game_state_params(game_name, channel_id, game_state))
+
+    async def save_game_states(self, game_name, game_states):
+        if not game_states:
+            return
+        params = []
+        for channel_id, game_state in game_states.items():
+            params.extend(game_state_params(game_name, channel_id, game_state))
+        # batch sizes vary, so don't fill the prepared statement cache with one entry per size
+        await self._execute(UPSERT_GAME_STATES.format(values=", ".join([UPSERT_VALUES] * len(game_states))),
+                            params, prepare=False)
+
+    async def archive_game_states(self, game_name, finished_age, stale_age, batch_size=DEFAULT_BATCH_SIZE):
+        # a batch per statement, so no single statement holds its locks for long
+        archived = deleted = 0
+        while True:
+            count = await self._execute(ARCHIVE_FINISHED, (game_name, finished_age, batch_size), fetch="rowcount")
+            archived += count
+            if count < batch_size:
+                break
+        while True:
+            count = await self._execute(DELETE_STALE, (game_name, stale_age, batch_size), fetch="rowcount")
+            deleted += count
+            if count < batch_size:
+                break
+        return archived, deleted
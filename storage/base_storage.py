@@ -1,4 +1,66 @@
+import json
 from abc import ABCMeta, abstractmethod
+from .game_state_header import read_header
+
+DEFAULT_BATCH_SIZE = 500
+
+
+def split_game_state(game_state):
+    """
+    Game states are either the older JSON text, or bytes in the binary format, and each has its own column.
+    :param game_state: a str or bytes game state
+    :return: a tuple of (text, binary) column values, one of which is None
+    """
+    if isinstance(game_state, (bytes, bytearray, memoryview)):
+        return None, bytes(game_state)
+    return game_state, None
+
+
+def summarize_game_state(game_state):
+    """
+    Read the fields storage keeps in their own columns, so they can be queried without decoding the whole game.  Binary
+    game states are read through game_state_header, the same layout the codec in wordle writes.
+    :param game_state: a str or bytes game state
+    :return: a tuple of (is_over, guess_count, guild_id)
+    """
+    if isinstance(game_state, (bytes, bytearray, memoryview)):
+        summary = read_header(game_state)
+        if summary is not None:
+            return summary
+        game_state = bytes(game_state).decode()
+    try:
+        values = json.loads(game_state)
+    except ValueError:
+        return False, 0, None
+    return bool(values.get('is_over')), int(values.get('guess_count') or 0), values.get('guild_id')
+
+
+def shard_for_guild(guild_id, shard_count):
+    """
+    The shard Discord sends a guild's events to.  Direct messages have no guild, and go to shard 0.
+    :param guild_id: the Discord guild id, or None
+    :param shard_count: the total number of shards
+    :return: the shard id
+    """
+    return ((guild_id or 0) >> 22) % shard_count
+
+
+def filter_game_states(rows, include_finished, shard=None):
+    """
+    :param rows: dicts of channel_id and game_state
+    :param include_finished: whether to keep games that are over
+    :param shard: a tuple of (shard ids, shard count) to keep only games owned by those shards, or None to keep all
+    :return: the rows to restore, for backends that can't filter in their query
+    """
+    kept = []
+    for row in rows:
+        is_over, _, guild_id = summarize_game_state(row["game_state"])
+        if is_over and not include_finished:
+            continue
+        if shard is not None and shard_for_guild(guild_id, shard[1]) not in shard[0]:
+            continue
+        kept.append(row)
+    return kept
 
 
 class BaseStorage(metaclass=ABCMeta):
@@ -22,9 +84,58 @@ class BaseStorage(metaclass=ABCMeta):
     def save_game_state(self, game_name, channel_id, game_state):
         pass
 
+    def save_game_states(self, game_name, game_states):
+        """
+        Saves several games at once.  Backends that can write them in one statement should override this.
+        :param game_name: the game all of the states belong to
+        :param game_states: a dict of channel id -> game state
+        """
+        for channel_id, game_state in game_states.items():
+            self.save_game_state(game_name, channel_id, game_state)
 
+    def archive_game_states(self, game_name, finished_age, stale_age, batch_size=DEFAULT_BATCH_SIZE):
+        """
+        Retention: move games that finished more than finished_age seconds ago to the archive, and delete unfinished
+        games nobody has played for stale_age seconds.  Rows are moved in batches.  Backends without an archive keep
+        everything.
+        :param game_name: the game to clean up
+        :param finished_age: seconds a finished game stays in the main table
+        :param stale_age: seconds an unfinished game may go unplayed before it is deleted
+        :param batch_size: the most rows moved or deleted per statement
+        :return: a tuple of (games archived, games deleted)
+        """
+        return 0, 0
 
+    def load_stats(self, game_name, guild_id, user_ids):
+        """
+        Load rows of per player and per guild stats, as kept by stats.StatsTracker.  Backends without a stats table keep
+        none.
+        :param game_name: the game the stats are for
+        :param guild_id: the guild the stats are for
+        :param user_ids: the user ids of the rows to load
+        :return: a dict of user id -> stats text, for the rows that exist
+        """
+        return {}
 
+    def save_stats(self, game_name, guild_id, stats):
+        """
+        Save rows of stats together, replacing any already stored
+        :param game_name: the game the stats are for
+        :param guild_id: the guild the stats are for
+        :param stats: a dict of user id -> stats text
+        """
+        pass
 
-
-
+    def iter_game_states(self, game_name, include_finished=False, batch_size=DEFAULT_BATCH_SIZE, shard=None):
+        """
+        Stream the stored games in batches, so restoring doesn't hold every row at once.  Backends that can page
+        through their rows should override this.
+        :param game_name: the game to restore
+        :param include_finished: whether to include games that are over
+        :param batch_size: the most rows per batch
+        :param shard: a tuple of (shard ids, shard count) to only include games owned by those shards
+        :return: a generator of lists of dicts of channel_id and game_state
+        """
+        rows = filter_game_states(self.get_all_game_states(game_name), include_finished, shard)
+        for start in range(0, len(rows), batch_size):
+            yield rows[start:start + batch_size]
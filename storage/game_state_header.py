@@ -0,0 +1,34 @@
+"""
+The fixed header that starts every binary game state, and the optional ids right after it.  wordle's encode_game_state
+and decode_game_state handle the whole format, while storage reads only these fields to fill in its own columns, so
+both take the layout from here.
+"""
+import struct
+
+GAME_STATE_MAGIC = b'WG'
+STATE_HEADER = struct.Struct('>2sBBBBB')  # magic, version, flags, guess count, rows, cols
+FLAGS_OFFSET = 3  # byte offsets into the header, for queries that read it in SQL
+GUESS_COUNT_OFFSET = 4
+ID_SIZE = 8  # each of the message, channel and guild ids that follow the header, in that order, when flagged
+
+FLAG_IS_OVER = 0x01
+FLAG_MESSAGE_ID = 0x02
+FLAG_CHANNEL_ID = 0x04
+FLAG_WIDE_COLORS = 0x08
+FLAG_GUILD_ID = 0x10
+FLAG_PARTICIPANTS = 0x20
+
+
+def read_header(game_state):
+    """
+    :param game_state: bytes that may be a binary game state
+    :return: a tuple of (is_over, guess_count, guild_id), or None if game_state doesn't start with a binary header
+    """
+    if len(game_state) < STATE_HEADER.size or bytes(game_state[:2]) != GAME_STATE_MAGIC:
+        return None
+    _, _, flags, guess_count, _, _ = STATE_HEADER.unpack_from(game_state, 0)
+    guild_id = None
+    if flags & FLAG_GUILD_ID:
+        offset = STATE_HEADER.size + ID_SIZE * (bool(flags & FLAG_MESSAGE_ID) + bool(flags & FLAG_CHANNEL_ID))
+        guild_id = int.from_bytes(bytes(game_state[offset:offset + ID_SIZE]), "big")
+    return bool(flags & FLAG_IS_OVER), guess_count, guild_id
@@ -0,0 +1,63 @@
+import threading
+import time
+from .base_storage import BaseStorage
+
+
+class MemoryStorage(BaseStorage):
+    """
+    Keeps game states in a dict, for load testing and local runs without a database.  An optional delay on every call
+    stands in for the round trip to a real database.
+    """
+
+    def __init__(self, latency=0.0):
+        """
+        :param latency: seconds each call blocks for, as a database round trip would
+        """
+        self.latency = latency
+        self._game_states = {}  # map of (game_name, channel_id) -> game state
+        self._stats = {}  # map of (game_name, guild_id, user_id) -> stats
+        self._lock = threading.Lock()
+
+    def _wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def delete_game_state(self, game_name, channel_id):
+        self._wait()
+        with self._lock:
+            self._game_states.pop((game_name, channel_id), None)
+
+    def get_all_game_states(self, game_name):
+        self._wait()
+        with self._lock:
+            return [{"channel_id": channel_id, "game_state": game_state}
+                    for (name, channel_id), game_state in self._game_states.items() if name == game_name]
+
+    def load_game_state(self, game_name, channel_id):
+        self._wait()
+        with self._lock:
+            return self._game_states.get((game_name, channel_id))
+
+    def load_stats(self, game_name, guild_id, user_ids):
+        self._wait()
+        with self._lock:
+            return {user_id: self._stats[(game_name, guild_id, user_id)] for user_id in user_ids
+                    if (game_name, guild_id, user_id) in self._stats}
+
+    def save_stats(self, game_name, guild_id, stats):
+        self._wait()
+        with self._lock:
+            for user_id, text in stats.items():
+                self._stats[(game_name, guild_id, user_id)] = text
+
+    def save_game_state(self, game_name, channel_id, game_state):
+        self._wait()
+        with self._lock:
+            self._game_states[(game_name, channel_id)] = game_state
+
+    def save_game_states(self, game_name, game_states):
+        # one round trip for the whole batch
+        self._wait()
+        with self._lock:
+            for channel_id, game_state in game_states.items():
+                self._game_states[(game_name, channel_id)] = game_state
@@ -1,18 +1,117 @@
 import os
 import psycopg
-from .base_storage import BaseStorage
+from .base_storage import DEFAULT_BATCH_SIZE, BaseStorage, split_game_state, summarize_game_state
+from .game_state_header import FLAG_IS_OVER, FLAGS_OFFSET, GAME_STATE_MAGIC, GUESS_COUNT_OFFSET, STATE_HEADER
+
+# A binary game state with a whole header, matching the layout summarize_game_state reads
+_HAS_HEADER = (f"game_state_bin is not null and length(game_state_bin) >= {STATE_HEADER.size} "
+               f"and get_byte(game_state_bin, 0) = {GAME_STATE_MAGIC[0]} "
+               f"and get_byte(game_state_bin, 1) = {GAME_STATE_MAGIC[1]}")
+
+# Columns added after the table was first created, each with a statement filling it in for the rows already there.
+# Those come from the binary header, through the same offsets and flags the codec uses, or the JSON text.
+COLUMN_MIGRATIONS = [
+    ("game_state_bin", "bytea", None),  # binary game states, the older JSON ones stay in game_state
+    ("is_over", "boolean not null default false",
+     "update game_states set is_over = case "
+     f" when {_HAS_HEADER} then (get_byte(game_state_bin, {FLAGS_OFFSET}) & {FLAG_IS_OVER}) = {FLAG_IS_OVER} "
+     " when game_state is not null then coalesce((game_state::json->>'is_over')::boolean, false) "
+     " else false end"),
+    ("guess_count", "smallint not null default 0",
+     "update game_states set guess_count = case "
+     f" when {_HAS_HEADER} then get_byte(game_state_bin, {GUESS_COUNT_OFFSET}) "
+     " when game_state is not null then coalesce((game_state::json->>'guess_count')::smallint, 0) "
+     " else 0 end"),
+    ("updated_at", "timestamptz not null default now()", None),
+    ("guild_id", "bigint", None),  # which shard owns the game, games saved before it was added go to shard 0
+]
+
+# Restores and lookups only want games in progress, and retention only wants finished ones, so each gets an index over
+# just its own rows
+INDEXES = [
+    "create index if not exists idx_game_states_playing on game_states (game_name, channel_id) where not is_over",
+    "create index if not exists idx_game_states_finished on game_states (game_name, updated_at) where is_over",
+]
+
+# Append only, with no indexes to keep up, since it is only read for the odd look back
+CREATE_ARCHIVE_TABLE = ("create table if not exists game_states_archive ( "
+                        " game_name varchar(32), "
+                        " channel_id bigint, "
+                        " game_state text, "
+                        " game_state_bin bytea, "
+                        " guess_count smallint, "
+                        " finished_at timestamptz "
+                        ")")
+
+# One row per player per guild, plus a row for each guild's totals, so reads never depend on how many games were played
+CREATE_STATS_TABLE = ("create table if not exists game_stats ( "
+                      " game_name varchar(32) not null, "
+                      " guild_id bigint not null, "
+                      " user_id bigint not null, "
+                      " stats text not null, "
+                      " updated_at timestamptz not null default now(), "
+                      " primary key (game_name, guild_id, user_id) "
+                      ")")
+LOAD_STATS = "select user_id, stats from game_stats where game_name=%s and guild_id=%s and user_id = any(%s)"
+UPSERT_STATS = ("insert into game_stats (game_name, guild_id, user_id, stats) values {values} "
+                "on conflict (game_name, guild_id, user_id) do update set stats=excluded.stats, updated_at=now()")
+UPSERT_STATS_VALUES = "(%s, %s, %s, %s)"
+
+UPSERT_GAME_STATES = ("insert into game_states "
+                      "(game_name, channel_id, game_state, game_state_bin, is_over, guess_count, guild_id) "
+                      "values {values} "
+                      "on conflict on constraint game_states_game_name_channel_id_key "
+                      "do update set game_state=excluded.game_state, game_state_bin=excluded.game_state_bin, "
+                      "is_over=excluded.is_over, guess_count=excluded.guess_count, guild_id=excluded.guild_id, "
+                      "updated_at=now() ")
+UPSERT_VALUES = "(%s, %s, %s, %s, %s, %s, %s)"
+
+# Moves one batch of finished games to the archive in a single statement
+ARCHIVE_FINISHED = ("with moved as ( "
+                    " delete from game_states where ctid in ( "
+                    "  select ctid from game_states "
+                    "  where game_name=%s and is_over and updated_at < now() - make_interval(secs => %s) limit %s) "
+                    " returning game_name, channel_id, game_state, game_state_bin, guess_count, updated_at) "
+                    "insert into game_states_archive "
+                    " (game_name, channel_id, game_state, game_state_bin, guess_count, finished_at) "
+                    "select * from moved")
+DELETE_STALE = ("delete from game_states where ctid in ( "
+                " select ctid from game_states "
+                " where game_name=%s and not is_over and updated_at < now() - make_interval(secs => %s) limit %s)")
+
+
+def restore_query(game_name, include_finished, shard):
+    """
+    :return: the query and parameters for iter_game_states
+    """
+    query = "select channel_id, game_state, game_state_bin from game_states where game_name=%s"
+    params = [game_name]
+    if not include_finished:
+        query += " and not is_over"
+    if shard is not None:
+        # the same formula as shard_for_guild
+        query += " and (coalesce(guild_id, 0) >> 22) %% %s = any(%s)"
+        params.extend((shard[1], list(shard[0])))
+    return query, params
+
+
+def game_state_params(game_name, channel_id, game_state):
+    """
+    :return: the values for one row of UPSERT_GAME_STATES
+    """
+    return (game_name, channel_id) + split_game_state(game_state) + summarize_game_state(game_state)
 
 
 class PostgresStorage(BaseStorage):
 
     def __init__(self):
         self._connection: psycopg.Connection = None
+        self._connection_str = os.getenv('DATABASE_URL')
         self._connect()
         self._check_tables()
 
     def _connect(self):
-        connection_str = os.getenv('DATABASE_URL')
-        self._connection = psycopg.connect(connection_str)
+        self._connection = psycopg.connect(self._connection_str)
         self._connection.autocommit = True
 
     def _create_game_states_table(self):
@@ -42,6 +141,25 @@ class PostgresStorage(BaseStorage):
             table_names.append(table[0])
         if 'game_states' not in table_names:
             self._create_game_states_table()
+        self._check_columns()
+
+    def _check_columns(self):
+        """
+        Add any columns, indexes and tables that were introduced after the table was first created
+        :return:
+        """
+        cursor = self._connection.cursor()
+        cursor.execute("select column_name from information_schema.columns where table_name='game_states'")
+        column_names = [row[0] for row in cursor.fetchall()]
+        for column_name, definition, backfill in COLUMN_MIGRATIONS:
+            if column_name not in column_names:
+                cursor.execute(f"alter table game_states add column {column_name} {definition}")
+                if backfill:
+                    cursor.execute(backfill)
+        for index in INDEXES:
+            cursor.execute(index)
+        cursor.execute(CREATE_ARCHIVE_TABLE)
+        cursor.execute(CREATE_STATS_TABLE)
 
     def delete_game_state(self, game_name, channel_id):
         cursor = self._connection.cursor()
@@ -51,27 +169,76 @@ class PostgresStorage(BaseStorage):
     def get_all_game_states(self, game_name):
         results = []
         cursor = self._connection.cursor()
-        cursor.execute("select channel_id, game_state from game_states where game_name=%s", [game_name])
+        cursor.execute("select channel_id, game_state, game_state_bin from game_states where game_name=%s", [game_name])
         rows = cursor.fetchall()
         for row in rows:
             results.append({
                 "channel_id": row[0],
-                "json_game_state": row[1]
+                "game_state": row[2] if row[2] is not None else row[1]
             })
         return results
 
     def load_game_state(self, game_name, channel_id):
         cursor = self._connection.cursor()
-        cursor.execute("select game_state from game_states where game_name=%s and channel_id=%s",
+        cursor.execute("select game_state, game_state_bin from game_states where game_name=%s and channel_id=%s",
                        (game_name, channel_id))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        return row[1] if row[1] is not None else row[0]
 
-    def save_game_state(self, game_name, channel_id, game_state):
+    def iter_game_states(self, game_name, include_finished=False, batch_size=DEFAULT_BATCH_SIZE, shard=None):
+        # A server-side cursor on its own connection, so rows arrive a batch at a time and the bot's connection stays
+        # free for games being played meanwhile
+        with psycopg.connect(self._connection_str) as connection:
+            with connection.cursor(name="restore_game_states") as cursor:
+                cursor.execute(*restore_query(game_name, include_finished, shard))
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        return
+                    yield [{"channel_id": row[0], "game_state": row[2] if row[2] is not None else row[1]}
+                           for row in rows]
+
+    def load_stats(self, game_name, guild_id, user_ids):
         cursor = self._connection.cursor()
-        cursor.execute("insert into game_states (game_name, channel_id, game_state) "
-                       "values (%s, %s, %s) "
-                       "on conflict on constraint game_states_game_name_channel_id_key "
-                       "do update set game_state=%s ",
-                       (game_name, channel_id, game_state, game_state))
+        cursor.execute(LOAD_STATS, (game_name, guild_id, list(user_ids)))
+        return dict(cursor.fetchall())
 
+    def save_stats(self, game_name, guild_id, stats):
+        if not stats:
+            return
+        params = []
+        for user_id, text in stats.items():
+            params.extend((game_name, guild_id, user_id, text))
+        cursor = self._connection.cursor()
+        cursor.execute(UPSERT_STATS.format(values=", ".join([UPSERT_STATS_VALUES] * len(stats))), params)
+
+    def save_game_state(self, game_name, channel_id, game_state):
+        cursor = self._connection.cursor()
+        cursor.execute(UPSERT_GAME_STATES.format(values=UPSERT_VALUES),
+                       game_state_params(game_name, channel_id, game_state))
 
+    def save_game_states(self, game_name, game_states):
+        if not game_states:
+            return
+        params = []
+        for channel_id, game_state in game_states.items():
+            params.extend(game_state_params(game_name, channel_id, game_state))
+        cursor = self._connection.cursor()
+        cursor.execute(UPSERT_GAME_STATES.format(values=", ".join([UPSERT_VALUES] * len(game_states))), params)
 
+    def archive_game_states(self, game_name, finished_age, stale_age, batch_size=DEFAULT_BATCH_SIZE):
+        archived = deleted = 0
+        cursor = self._connection.cursor()
+        while True:
+            cursor.execute(ARCHIVE_FINISHED, (game_name, finished_age, batch_size))
+            archived += cursor.rowcount
+            if cursor.rowcount < batch_size:
+                break
+        while True:
+            cursor.execute(DELETE_STALE, (game_name, stale_age, batch_size))
+            deleted += cursor.rowcount
+            if cursor.rowcount < batch_size:
+                break
+        return archived, deleted
@@ -0,0 +1,239 @@
+import os
+import sqlite3
+import threading
+import time
+from .base_storage import DEFAULT_BATCH_SIZE, BaseStorage, split_game_state, summarize_game_state
+
+_UPSERT = ("insert into game_states "
+           "(game_name, channel_id, game_state, game_state_bin, is_over, guess_count, guild_id, updated_at) "
+           "values (?, ?, ?, ?, ?, ?, ?, ?) "
+           "on conflict (game_name, channel_id) "
+           "do update set game_state=excluded.game_state, game_state_bin=excluded.game_state_bin, "
+           "is_over=excluded.is_over, guess_count=excluded.guess_count, guild_id=excluded.guild_id, "
+           "updated_at=excluded.updated_at")
+
+# Columns added after the table was first created.  Existing rows get is_over, guess_count and guild_id from their game
+# state, and updated_at from the time of the migration.
+_COLUMN_MIGRATIONS = [
+    ("is_over", "integer not null default 0"),
+    ("guess_count", "integer not null default 0"),
+    ("updated_at", "real not null default 0"),  # unix time
+    ("guild_id", "integer"),
+]
+
+
+def _row_params(game_name, channel_id, game_state, now):
+    is_over, guess_count, guild_id = summarize_game_state(game_state)
+    return (game_name, channel_id) + split_game_state(game_state) + (int(is_over), guess_count, guild_id, now)
+
+
+class SqliteStorage(BaseStorage):
+    """
+    Game states in a local SQLite file, for single-node deployments that don't want a database server.  The database
+    runs in WAL mode so reads don't wait on writes, and batches of saves share one transaction.  Calls block, so the
+    bot runs them through a SyncStorageAdapter.
+    """
+
+    def __init__(self, path=None):
+        """
+        :param path: the database file, defaults to the SQLITE_PATH environment variable or game_states.db
+        """
+        self.path = path or os.getenv("SQLITE_PATH") or "game_states.db"
+        self._lock = threading.Lock()
+        self._connection: sqlite3.Connection = None
+        self._connect()
+        self._check_tables()
+
+    def _connect(self):
+        # statements are compiled once and reused from the connection's cache, keyed by their text
+        self._connection = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False,
+                                           cached_statements=32)
+        self._connection.execute("pragma journal_mode=wal")
+        # with WAL, a commit is durable once it reaches the log, and a power loss can only lose the newest commits
+        self._connection.execute("pragma synchronous=normal")
+        self._connection.execute("pragma busy_timeout=5000")
+
+    def _check_tables(self):
+        """
+        Check for missing tables and create them if necessary
+        :return:
+        """
+        with self._lock:
+            self._connection.execute("create table if not exists game_states ( "
+                                     " game_name text not null, "
+                                     " channel_id integer not null, "
+                                     " game_state text, "
+                                     " game_state_bin blob "
+                                     ")")
+            self._connection.execute("create unique index if not exists idx_game_channel "
+                                     "on game_states (game_name, channel_id)")
+        self._check_columns()
+
+    def _check_columns(self):
+        """
+        Add any columns, indexes and tables that were introduced after the table was first created
+        :return:
+        """
+        with self._lock:
+            columns = {row[1] for row in self._connection.execute("pragma table_info(game_states)")}
+            missing = [(name, definition) for name, definition in _COLUMN_MIGRATIONS if name not in columns]
+            for name, definition in missing:
+                self._connection.execute(f"alter table game_states add column {name} {definition}")
+            if missing:
+                rows = self._connection.execute("select rowid, game_state, game_state_bin from game_states").fetchall()
+                now = time.time()
+                updates = []
+                for row in rows:
+                    is_over, guess_count, guild_id = summarize_game_state(row[2] if row[2] is not None else row[1])
+                    updates.append((int(is_over), guess_count, guild_id, now, row[0]))
+                self._connection.executemany("update game_states set is_over=?, guess_count=?, guild_id=?, "
+                                             "updated_at=? where rowid=?", updates)
+            # restores only want games in progress, and retention only wants finished ones
+            self._connection.execute("create index if not exists idx_game_states_playing "
+                                     "on game_states (game_name, channel_id) where is_over=0")
+            self._connection.execute("create index if not exists idx_game_states_finished "
+                                     "on game_states (game_name, updated_at) where is_over=1")
+            self._connection.execute("create table if not exists game_stats ( "
+                                     " game_name text not null, "
+                                     " guild_id integer not null, "
+                                     " user_id integer not null, "
+                                     " stats text not null, "
+                                     " updated_at real not null, "
+                                     " primary key (game_name, guild_id, user_id) "
+                                     ")")
+            self._connection.execute("create table if not exists game_states_archive ( "
+                                     " game_name text, "
+                                     " channel_id integer, "
+                                     " game_state text, "
+                                     " game_state_bin blob, "
+                                     " guess_count integer, "
+                                     " finished_at real "
+                                     ")")
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def delete_game_state(self, game_name, channel_id):
+        with self._lock:
+            self._connection.execute("delete from game_states where game_name=? and channel_id=?",
+                                     (game_name, channel_id))
+
+    def get_all_game_states(self, game_name):
+        with self._lock:
+            rows = self._connection.execute("select channel_id, game_state, game_state_bin from game_states "
+                                            "where game_name=?", (game_name,)).fetchall()
+        return [{"channel_id": row[0], "game_state": row[2] if row[2] is not None else row[1]} for row in rows]
+
+    def load_game_state(self, game_name, channel_id):
+        with self._lock:
+            row = self._connection.execute("select game_state, game_state_bin from game_states "
+                                           "where game_name=? and channel_id=?", (game_name, channel_id)).fetchone()
+        if not row:
+            return None
+        return row[1] if row[1] is not None else row[0]
+
+    def iter_game_states(self, game_name, include_finished=False, batch_size=DEFAULT_BATCH_SIZE, shard=None):
+        # pages through the index by channel id, so nothing stays locked between batches
+        query = "select channel_id, game_state, game_state_bin from game_states where game_name=? and channel_id>? "
+        filters = []
+        if not include_finished:
+            query += "and is_over=0 "
+        if shard is not None:
+            # the same formula as shard_for_guild
+            query += f"and (coalesce(guild_id, 0) >> 22) % ? in ({', '.join('?' * len(shard[0]))}) "
+            filters = [shard[1]] + list(shard[0])
+        query += "order by channel_id limit ?"
+        last_channel_id = -2 ** 63
+        while True:
+            with self._lock:
+                rows = self._connection.execute(query, [game_name, last_channel_id] + filters + [batch_size]).fetchall()
+            if not rows:
+                return
+            yield [{"channel_id": row[0], "game_state": row[2] if row[2] is not None else row[1]} for row in rows]
+            last_channel_id = rows[-1][0]
+
+    def load_stats(self, game_name, guild_id, user_ids):
+        user_ids = list(user_ids)
+        with self._lock:
+            rows = self._connection.execute(f"select user_id, stats from game_stats where game_name=? and guild_id=? "
+                                            f"and user_id in ({', '.join('?' * len(user_ids))})",
+                                            [game_name, guild_id] + user_ids).fetchall()
+        return dict(rows)
+
+    def save_stats(self, game_name, guild_id, stats):
+        now = time.time()
+        params = [(game_name, guild_id, user_id, text, now) for user_id, text in stats.items()]
+        with self._lock:
+            # the players and the guild's totals change together, so they are written in one transaction
+            self._connection.execute("begin")
+            try:
+                self._connection.executemany("insert into game_stats (game_name, guild_id, user_id, stats, updated_at) "
+                                             "values (?, ?, ?, ?, ?) "
+                                             "on conflict (game_name, guild_id, user_id) "
+                                             "do update set stats=excluded.stats, updated_at=excluded.updated_at",
+                                             params)
+            except BaseException:
+                self._connection.execute("rollback")
+                raise
+            self._connection.execute("commit")
+
+    def save_game_state(self, game_name, channel_id, game_state):
+        with self._lock:
+            self._connection.execute(_UPSERT, _row_params(game_name, channel_id, game_state, time.time()))
+
+    def save_game_states(self, game_name, game_states):
+        if not game_states:
+            return
+        now = time.time()
+        params = [_row_params(game_name, channel_id, game_state, now) for channel_id, game_state in game_states.items()]
+        with self._lock:
+            # one transaction for the whole batch, so it is one sync to disk rather than one per game
+            self._connection.execute("begin")
+            try:
+                self._connection.executemany(_UPSERT, params)
+            except BaseException:
+                self._connection.execute("rollback")
+                raise
+            self._connection.execute("commit")
+
+    def archive_game_states(self, game_name, finished_age, stale_age, batch_size=DEFAULT_BATCH_SIZE):
+        archived = self._in_batches("insert into game_states_archive "
+                                    " (game_name, channel_id, game_state, game_state_bin, guess_count, finished_at) "
+                                    "select game_name, channel_id, game_state, game_state_bin, guess_count, updated_at "
+                                    "from game_states where rowid in ({batch})",
+                                    "select rowid from game_states where game_name=? and is_over=1 and updated_at<? "
+                                    "limit ?", (game_name, time.time() - finished_age, batch_size))
+        deleted = self._in_batches(None,
+                                   "select rowid from game_states where game_name=? and is_over=0 and updated_at<? "
+                                   "limit ?", (game_name, time.time() - stale_age, batch_size))
+        return archived, deleted
+
+    def _in_batches(self, copy, select, params):
+        """
+        Copy rows elsewhere and then delete them, a batch per transaction
+        :param copy: a statement copying the rows with the rowids in {batch}, or None to only delete them
+        :param select: a query for the rowids of one batch, its last parameter is the batch size
+        :param params: the parameters for select
+        :return: the number of rows deleted
+        """
+        total = 0
+        while True:
+            with self._lock:
+                self._connection.execute("begin")
+                try:
+                    rowids = [row[0] for row in self._connection.execute(select, params)]
+                    if rowids:
+                        batch = ", ".join("?" * len(rowids))
+                        if copy:
+                            self._connection.execute(copy.format(batch=batch), rowids)
+                        self._connection.execute(f"delete from game_states where rowid in ({batch})", rowids)
+                except BaseException:
+                    self._connection.execute("rollback")
+                    raise
+                self._connection.execute("commit")
+            total += len(rowids)
+            if len(rowids) < params[-1]:
+                return total
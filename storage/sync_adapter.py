@@ -0,0 +1,80 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from .async_base_storage import AsyncBaseStorage
+from .base_storage import DEFAULT_BATCH_SIZE, BaseStorage
+
+
+class SyncStorageAdapter(AsyncBaseStorage):
+    """
+    Makes a blocking BaseStorage awaitable by running each call on a dedicated worker thread.  A single thread is used
+    so that backends holding one connection never see concurrent calls.
+    """
+
+    def __init__(self, game_storage: BaseStorage):
+        self._storage = game_storage
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="storage")
+
+    @property
+    def storage(self):
+        return self._storage
+
+    async def _call(self, method, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(method, *args, **kwargs))
+
+    async def close(self):
+        # backends holding a connection may offer close(), which runs on the same thread as every other call
+        close = getattr(self._storage, "close", None)
+        if close is not None:
+            await self._call(close)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, functools.partial(self._executor.shutdown, wait=True))
+
+    async def delete_game_state(self, game_name, channel_id):
+        return await self._call(self._storage.delete_game_state, game_name, channel_id)
+
+    async def get_all_game_states(self, game_name):
+        return await self._call(self._storage.get_all_game_states, game_name)
+
+    async def load_game_state(self, game_name, channel_id):
+        return await self._call(self._storage.load_game_state, game_name, channel_id)
+
+    async def save_game_state(self, game_name, channel_id, game_state):
+        return await self._call(self._storage.save_game_state, game_name, channel_id, game_state)
+
+    async def save_game_states(self, game_name, game_states):
+        return await self._call(self._storage.save_game_states, game_name, game_states)
+
+    async def archive_game_states(self, game_name, finished_age, stale_age, batch_size=DEFAULT_BATCH_SIZE):
+        return await self._call(self._storage.archive_game_states, game_name, finished_age, stale_age,
+                                batch_size=batch_size)
+
+    async def load_stats(self, game_name, guild_id, user_ids):
+        return await self._call(self._storage.load_stats, game_name, guild_id, user_ids)
+
+    async def save_stats(self, game_name, guild_id, stats):
+        return await self._call(self._storage.save_stats, game_name, guild_id, stats)
+
+    async def iter_game_states(self, game_name, include_finished=False, batch_size=DEFAULT_BATCH_SIZE, shard=None):
+        # each batch is fetched on the storage thread, the event loop only ever waits for one at a time
+        batches = self._storage.iter_game_states(game_name, include_finished=include_finished, batch_size=batch_size,
+                                                 shard=shard)
+        try:
+            while True:
+                batch = await self._call(next, batches, None)
+                if batch is None:
+                    return
+                yield batch
+        finally:
+            await self._call(batches.close)
+
+
+def as_async_storage(game_storage):
+    """
+    :param game_storage: a BaseStorage or AsyncBaseStorage instance, or None
+    :return: an AsyncBaseStorage for the same backend, or None if there is no storage
+    """
+    if game_storage is None or isinstance(game_storage, AsyncBaseStorage):
+        return game_storage
+    return SyncStorageAdapter(game_storage)
@@ -0,0 +1,155 @@
+import asyncio
+import logging
+from .async_base_storage import AsyncBaseStorage
+from .base_storage import DEFAULT_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindStorage(AsyncBaseStorage):
+    """
+    Sits in front of another storage and holds back saves, keeping only the latest state for each
+    (game_name, channel_id).  Pending saves are written in batches every flush_interval seconds, as soon as max_pending
+    games are waiting, or when flush() is called.
+    """
+
+    def __init__(self, game_storage: AsyncBaseStorage, flush_interval=1.0, max_pending=100):
+        """
+        :param game_storage: the storage that saves are eventually written to
+        :param flush_interval: seconds between background flushes
+        :param max_pending: flush immediately once this many games have unsaved states
+        """
+        self._storage = game_storage
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending = {}  # map of (game_name, channel_id) -> latest unsaved game state
+        self._inflight = {}  # map of (game_name, channel_id) -> game state a flush is writing right now
+        self._flush_lock = None
+        self._flush_task = None
+        self._counters = {
+            "saves": 0,  # save_game_state calls
+            "coalesced": 0,  # saves that replaced a pending state before it was written
+            "flushed": 0,  # game states written to the underlying storage
+            "flushes": 0,  # batches written
+        }
+
+    @property
+    def counters(self):
+        """
+        :return: a copy of the write counters, with the number of games currently waiting to be written
+        """
+        counters = dict(self._counters)
+        counters["pending"] = len(self._pending)
+        return counters
+
+    async def open(self):
+        await self._storage.open()
+        self._flush_lock = asyncio.Lock()
+        self._flush_task = asyncio.ensure_future(self._flush_periodically())
+
+    async def close(self):
+        if self._flush_task:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
+        await self._storage.close()
+
+    async def flush(self):
+        """
+        Write every pending state to the underlying storage, one batch per game name
+        :return: nothing
+        """
+        async with self._get_flush_lock():
+            if not self._pending:
+                return
+            # held in _inflight until written, so a load meanwhile still finds them rather than the older row
+            pending, self._pending = self._pending, {}
+            self._inflight = pending
+            batches = {}
+            for (game_name, channel_id), game_state in pending.items():
+                batches.setdefault(game_name, {})[channel_id] = game_state
+
+            try:
+                for game_name, game_states in batches.items():
+                    try:
+                        await self._storage.save_game_states(game_name, game_states)
+                    except Exception:
+                        # put back anything that hasn't been saved again since, so the next flush retries it
+                        for channel_id, game_state in game_states.items():
+                            self._pending.setdefault((game_name, channel_id), game_state)
+                        raise
+                    self._counters["flushed"] += len(game_states)
+                    self._counters["flushes"] += 1
+            finally:
+                self._inflight = {}
+
+    def _get_flush_lock(self):
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        return self._flush_lock
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception(f"Failed to flush {len(self._pending)} pending game states, will retry")
+
+    async def delete_game_state(self, game_name, channel_id):
+        # a flush in progress may be writing this game, so wait for it, or it would put the row back after the delete
+        async with self._get_flush_lock():
+            self._pending.pop((game_name, channel_id), None)
+            await self._storage.delete_game_state(game_name, channel_id)
+
+    async def get_all_game_states(self, game_name):
+        await self.flush()
+        return await self._storage.get_all_game_states(game_name)
+
+    async def archive_game_states(self, game_name, finished_age, stale_age, batch_size=DEFAULT_BATCH_SIZE):
+        await self.flush()
+        return await self._storage.archive_game_states(game_name, finished_age, stale_age, batch_size=batch_size)
+
+    async def iter_game_states(self, game_name, include_finished=False, batch_size=DEFAULT_BATCH_SIZE, shard=None):
+        await self.flush()
+        batches = self._storage.iter_game_states(game_name, include_finished=include_finished, batch_size=batch_size,
+                                                 shard=shard)
+        # closed here rather than left to the garbage collector, so a consumer stopping early releases the cursor
+        try:
+            async for batch in batches:
+                yield batch
+        finally:
+            await batches.aclose()
+
+    async def load_stats(self, game_name, guild_id, user_ids):
+        return await self._storage.load_stats(game_name, guild_id, user_ids)
+
+    async def save_stats(self, game_name, guild_id, stats):
+        # stats are only written once a game finishes, so they go straight through
+        await self._storage.save_stats(game_name, guild_id, stats)
+
+    async def load_game_state(self, game_name, channel_id):
+        key = (game_name, channel_id)
+        game_state = self._pending.get(key)
+        if game_state is None:
+            game_state = self._inflight.get(key)
+        if game_state is not None:
+            return game_state
+        return await self._storage.load_game_state(game_name, channel_id)
+
+    async def save_game_state(self, game_name, channel_id, game_state):
+        key = (game_name, channel_id)
+        self._counters["saves"] += 1
+        if key in self._pending:
+            self._counters["coalesced"] += 1
+        self._pending[key] = game_state
+        if len(self._pending) >= self.max_pending:
+            await self.flush()
+
+    async def save_game_states(self, game_name, game_states):
+        for channel_id, game_state in game_states.items():
+            await self.save_game_state(game_name, channel_id, game_state)
@@ -0,0 +1,82 @@
+import wordle
+from wordle import WordleGame
+from PIL import Image, ImageChops, ImageDraw
+import unittest
+
+
+def reference_render(game):
+    """
+    The original full-canvas render, kept here to check that the sprite renderer is pixel-identical
+    """
+    board_padding = 20
+    cell_padding: int = 3
+    block_size = int((game.pixel_width - (board_padding * 2)) / 5)
+
+    image = Image.new("RGB", (game.pixel_width, game.pixel_height))
+    draw = ImageDraw.Draw(image)
+
+    for row in range(0, game.max_guesses):
+        for col in range(0, game.col_count):
+            block = game.game_state.board.get_tile(row, col)
+            x1 = board_padding + (col * block_size) + cell_padding
+            y1 = board_padding + (row * block_size) + cell_padding
+            x2 = x1 + block_size - cell_padding
+            y2 = y1 + block_size - cell_padding
+            draw.rounded_rectangle(xy=((x1, y1), (x2, y2)), radius=4, fill=block.color)
+            text_size = draw.textsize(text=block.letter.upper(), font=wordle.board_renderer.tile_font)
+            draw.text(xy=(x1 + (block_size - text_size[0]) / 2 - (cell_padding / 2),
+                          y1 + (block_size - text_size[1]) / 2 - cell_padding),
+                      text=block.letter.upper(),
+                      font=wordle.board_renderer.tile_font)
+
+    if game.current_message:
+        y1 = board_padding + (block_size * game.max_guesses) + (cell_padding * 4)
+        for message_line in game.current_message.splitlines():
+            text_size = draw.textsize(text=message_line, font=wordle.board_renderer.message_font)
+            x1 = (game.pixel_width - text_size[0]) / 2
+            if x1 < board_padding:
+                x1 = board_padding
+            draw.text(xy=(x1, y1), text=message_line, font=wordle.board_renderer.message_font)
+            y1 += text_size[1] + (cell_padding * 2)
+    return image
+
+
+class TestBoardRenderer(unittest.TestCase):
+
+    def assertSameImage(self, game):
+        difference = ImageChops.difference(game.render(), reference_render(game))
+        self.assertIsNone(difference.getbbox())
+
+    def test_empty_board(self):
+        game = WordleGame()
+        self.assertSameImage(game)
+
+    def test_each_guess(self):
+        game = WordleGame()
+        game.game_state.solution = 'SIXTH'
+        for guess in ["FIRST", "XYZAB", "DEBUG", "QUJWV", "PUPPY", "abc", "FIFTH", "SIXTH"]:
+            game.submit_guess(guess, "Somebody With A Long Name")
+            self.assertSameImage(game)
+
+    def test_every_letter_and_color(self):
+        game = WordleGame()
+        letters = "abcdefghijklmnopqrstuvwxyz?é"
+        colors = [wordle.GRAY, wordle.GREEN, wordle.YELLOW, wordle.RED]
+        for offset in range(0, len(letters), wordle.NUMBER_OF_LETTERS * wordle.NUMBER_OF_GUESSES):
+            for index in range(0, wordle.NUMBER_OF_LETTERS * wordle.NUMBER_OF_GUESSES):
+                letter = letters[(offset + index) % len(letters)]
+                row, col = divmod(index, wordle.NUMBER_OF_LETTERS)
+                game.game_state.board.set_tile(row, col, colors[index % len(colors)], letter)
+            self.assertSameImage(game)
+
+    def test_row_replaced_after_invalid_guess(self):
+        game = WordleGame()
+        game.game_state.solution = 'CRUST'
+        game.submit_guess("XYZAB", "Nobody")
+        game.render()
+        game.submit_guess("TRUST", "Nobody")
+        self.assertSameImage(game)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import itertools
+import random
+import sys
+import unittest
+from pathlib import Path
+import numpy as np
+import feedback
+import wordle
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "benchmarks"))
+from verify_feedback import reference_code  # noqa: E402
+
+
+class TestFeedback(unittest.TestCase):
+
+    def test_duplicate_letters(self):
+        # only one of the g's is in debug, and the first one takes it
+        self.assertEqual(feedback.decode_pattern(feedback.score("buggy", "debug"), 5), [1, 1, 1, 0, 0])
+        # the exact match takes one of speed's e's, leaving one for the first e in geese
+        self.assertEqual(feedback.decode_pattern(feedback.score("geese", "speed"), 5), [0, 1, 2, 1, 0])
+        self.assertEqual(feedback.score("crane", "crane"), 242)
+
+    def test_pattern_code_round_trip(self):
+        for colors in itertools.product((feedback.GRAY, feedback.YELLOW, feedback.GREEN), repeat=5):
+            self.assertEqual(feedback.decode_pattern(feedback.pattern_code(colors), 5), list(colors))
+
+    def test_batches_match_reference(self):
+        rng = random.Random(1)
+        words = wordle.words.words_of_length(5)
+        guesses = [rng.choice(words) for _ in range(300)] + ["buggy", "geese", "eerie"]
+        solutions = [rng.choice(words) for _ in range(300)] + ["debug", "speed", "there"]
+        expected = [reference_code(guess, solution) for guess, solution in zip(guesses, solutions)]
+        self.assertEqual(feedback.score_pairs(guesses, solutions).tolist(), expected)
+        self.assertEqual([feedback.score(guess, solution) for guess, solution in zip(guesses, solutions)], expected)
+
+        matrix = feedback.score_matrix(guesses[:40], solutions[:30])
+        self.assertEqual(matrix.shape, (40, 30))
+        self.assertEqual(matrix.dtype, np.uint8)
+        for row, column in itertools.product(range(0, 40), range(0, 30)):
+            self.assertEqual(matrix[row, column], reference_code(guesses[row], solutions[column]))
+
+    def test_longer_words(self):
+        codes = feedback.score_pairs(["abcdefg"], ["gfedcba"])
+        self.assertEqual(codes.dtype, np.uint16)
+        self.assertEqual(feedback.decode_pattern(codes[0], 7), [1, 1, 1, 2, 1, 1, 1])
+
+    def test_mismatched_batches(self):
+        with self.assertRaises(ValueError):
+            feedback.score_pairs(["crane", "slate"], ["moldy"])
+        with self.assertRaises(ValueError):
+            feedback.score_matrix(["crane"], ["cranes"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import asyncio
+from game_cache import GameCache
+import unittest
+
+
+class TestGameCache(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.stored = {1: "stored game"}
+        self.loads = []
+        self.saves = []
+        self.cache = GameCache(load=self._load, save=self._save, max_games=2, idle_ttl=60)
+
+    async def _load(self, channel_id):
+        self.loads.append(channel_id)
+        await asyncio.sleep(0)
+        return self.stored.get(channel_id)
+
+    async def _save(self, channel_id, game):
+        self.saves.append((channel_id, game))
+        self.stored[channel_id] = game
+
+    async def test_loads_once_on_first_access(self):
+        results = await asyncio.gather(self.cache.get(1), self.cache.get(1))
+        self.assertEqual(results, ["stored game", "stored game"])
+        self.assertEqual(await self.cache.get(1), "stored game")
+        self.assertEqual(self.loads, [1])
+        self.assertIsNone(await self.cache.get(2))
+        self.assertNotIn(2, self.cache)
+
+    async def test_cancelled_load_doesnt_strand_waiters(self):
+        released = asyncio.Event()
+
+        async def load_slowly(channel_id):
+            self.loads.append(channel_id)
+            await released.wait()
+            return self.stored.get(channel_id)
+
+        self.cache = GameCache(load=load_slowly, max_games=2, idle_ttl=60)
+        first = asyncio.ensure_future(self.cache.get(1))
+        await asyncio.sleep(0)  # first is now loading
+        second = asyncio.ensure_future(self.cache.get(1))
+        await asyncio.sleep(0)  # second is waiting on it
+        first.cancel()
+        await asyncio.sleep(0)
+        released.set()
+        self.assertEqual(await asyncio.wait_for(second, 1), "stored game")
+        with self.assertRaises(asyncio.CancelledError):
+            await first
+        self.assertEqual(self.loads, [1, 1])
+
+    async def test_prime_never_replaces_or_overfills(self):
+        await self.cache.put(10, "new game")
+        self.assertFalse(self.cache.prime(10, "restored game"))
+        self.assertTrue(self.cache.prime(11, "restored game"))
+        self.assertFalse(self.cache.prime(12, "restored game"))  # full
+        self.assertEqual(await self.cache.get(10), "new game")
+        self.assertEqual(await self.cache.get(11), "restored game")
+        self.assertEqual(self.loads, [])
+        await self.cache.close()
+        self.assertEqual(self.saves, [(10, "new game")])
+
+    async def test_size_limit_writes_back_unsaved_games(self):
+        await self.cache.put(10, "game 10")
+        await self.cache.put(11, "game 11")
+        self.cache.mark_saved(11)
+        await self.cache.get(10)  # 11 is now the least recently used
+        await self.cache.put(12, "game 12")
+        self.assertNotIn(11, self.cache)
+        self.assertEqual(self.saves, [])
+        await self.cache.put(13, "game 13")
+        self.assertNotIn(10, self.cache)
+        self.assertEqual(self.saves, [(10, "game 10")])
+        self.assertEqual(len(self.cache), 2)
+
+    async def test_idle_games_are_evicted(self):
+        await self.cache.put(10, "game 10")
+        self.cache.idle_ttl = 0
+        self.assertEqual(await self.cache.evict_idle(), 1)
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.saves, [(10, "game 10")])
+
+    async def test_close_flushes_unsaved_games(self):
+        await self.cache.put(10, "game 10")
+        self.cache.start(interval=60)
+        await self.cache.close()
+        self.assertEqual(self.saves, [(10, "game 10")])
+        self.assertIn(10, self.cache)
+
+    async def test_failed_write_back_keeps_the_game(self):
+        async def failing_save(channel_id, game):
+            raise ConnectionError("database is down")
+        cache = GameCache(load=self._load, save=failing_save, max_games=1)
+        await cache.put(10, "game 10")
+        await cache.put(11, "game 11")
+        self.assertIn(10, cache)
+
+
+if __name__ == '__main__':
+    unittest.main()
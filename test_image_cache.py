@@ -0,0 +1,71 @@
+import asyncio
+import tempfile
+import wordle
+from image_cache import EncodedImageCache, board_key
+import unittest
+
+
+class TestEncodedImageCache(unittest.IsolatedAsyncioTestCase):
+
+    def test_key_depends_on_content_only(self):
+        first = wordle.WordleGame()
+        second = wordle.WordleGame()
+        for game in (first, second):
+            game.game_state.solution = 'CRUST'
+            game.submit_guess("TRUST", "Nobody")
+        self.assertEqual(board_key(first.game_state.board.rows(), first.current_message),
+                         board_key(second.game_state.board.rows(), second.current_message))
+        self.assertNotEqual(board_key(first.game_state.board.rows(), ""),
+                            board_key(first.game_state.board.rows(), "Better luck next time"))
+
+    def test_key_depends_on_how_the_board_is_drawn(self):
+        game = wordle.WordleGame()
+        game.game_state.solution = 'CRUST'
+        game.submit_guess("TRUST", "Nobody")
+        rows = game.game_state.board.rows()
+        self.assertNotEqual(board_key(rows, "", wordle.BOARD_IMAGE_VARIANT), board_key(rows, ""))
+        self.assertNotEqual(board_key(rows, "", "v1:500x600:92:q75"), board_key(rows, "", "v1:500x600:92:q90"))
+
+    async def test_memory_eviction(self):
+        cache = EncodedImageCache(max_bytes=10)
+        await cache.put("a", b"12345")
+        await cache.put("b", b"12345")
+        self.assertEqual(await cache.get("a"), b"12345")  # b is now the least recently used
+        await cache.put("c", b"12345")
+        self.assertIsNone(await cache.get("b"))
+        self.assertEqual(cache.stats["hits"], 1)
+        self.assertEqual(cache.stats["misses"], 1)
+        self.assertEqual(cache.stats["evictions"], 1)
+        self.assertEqual(cache.stats["bytes"], 10)
+
+    async def test_disk_tier_survives_restart(self):
+        with tempfile.TemporaryDirectory() as disk_dir:
+            cache = EncodedImageCache(disk_dir=disk_dir)
+            await cache.put("a", b"image")
+            await cache.wait_for_disk()
+            restarted = EncodedImageCache(disk_dir=disk_dir)
+            self.assertEqual(await restarted.get("a"), b"image")
+            self.assertEqual(await restarted.get("a"), b"image")
+            self.assertEqual(restarted.stats["disk_hits"], 1)
+            self.assertEqual(restarted.stats["hits"], 1)
+
+    async def test_disk_tier_is_bounded(self):
+        with tempfile.TemporaryDirectory() as disk_dir:
+            cache = EncodedImageCache(disk_dir=disk_dir, max_disk_files=10)
+            for index in range(0, 25):
+                await cache.put(f"key{index}", b"image")
+            await cache.wait_for_disk()
+            self.assertLessEqual(len(list(cache._disk_dir.glob("*.jpg"))), 10)
+
+    async def test_concurrent_disk_writes_stay_bounded(self):
+        with tempfile.TemporaryDirectory() as disk_dir:
+            cache = EncodedImageCache(disk_dir=disk_dir, max_disk_files=10)
+            await asyncio.gather(*(cache.put(f"key{index}", b"image") for index in range(0, 100)))
+            await cache.wait_for_disk()
+            files = len(list(cache._disk_dir.glob("*.jpg")))
+            self.assertLessEqual(files, 10)
+            self.assertEqual(cache._disk_files, files)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import asyncio
+import unittest
+from keyed_lock import KeyedLock
+
+
+class TestKeyedLock(unittest.IsolatedAsyncioTestCase):
+
+    async def test_same_key_runs_in_order(self):
+        locks = KeyedLock()
+        order = []
+
+        async def work(number):
+            async with locks("channel"):
+                order.append(("start", number))
+                await asyncio.sleep(0.01)
+                order.append(("end", number))
+
+        await asyncio.gather(*(work(number) for number in range(3)))
+        self.assertEqual(order, [("start", 0), ("end", 0), ("start", 1), ("end", 1), ("start", 2), ("end", 2)])
+
+    async def test_different_keys_run_in_parallel(self):
+        locks = KeyedLock()
+        inside = []
+
+        async def work(key):
+            async with locks(key):
+                inside.append(key)
+                await asyncio.sleep(0.01)
+                self.assertEqual(len(inside), 2)
+
+        await asyncio.gather(work("a"), work("b"))
+
+    async def test_unused_locks_are_dropped(self):
+        locks = KeyedLock()
+        async with locks("a"):
+            self.assertTrue(locks.locked("a"))
+            self.assertEqual(len(locks), 1)
+        self.assertEqual(len(locks), 0)
+
+        with self.assertRaises(ValueError):
+            async with locks("b"):
+                raise ValueError()
+        self.assertEqual(len(locks), 0)
+
+    async def test_cancelled_waiter_is_dropped(self):
+        locks = KeyedLock()
+        async with locks("a"):
+            waiter = asyncio.ensure_future(locks("a").__aenter__())
+            await asyncio.sleep(0)
+            waiter.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await waiter
+        self.assertEqual(len(locks), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
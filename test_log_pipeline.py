@@ -0,0 +1,96 @@
+import json
+import logging
+import os
+import tempfile
+import unittest
+from log_pipeline import DuplicateFilter, LogPipeline
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _error(message="Failed", exception=None):
+    record = logging.LogRecord("test", logging.ERROR, __file__, 1, message, None, None)
+    if exception is not None:
+        record.exc_info = (type(exception), exception, None)
+    return record
+
+
+class TestDuplicateFilter(unittest.TestCase):
+
+    def test_repeated_errors_are_suppressed_then_counted(self):
+        clock = FakeClock()
+        duplicates = DuplicateFilter(window=10, clock=clock)
+        self.assertTrue(duplicates.filter(_error(exception=ValueError("bad"))))
+        self.assertFalse(duplicates.filter(_error(exception=ValueError("bad"))))
+        self.assertFalse(duplicates.filter(_error(exception=ValueError("bad"))))
+        self.assertTrue(duplicates.filter(_error(exception=ValueError("other"))))
+        self.assertTrue(duplicates.filter(_error("Something else")))
+        info = logging.LogRecord("test", logging.INFO, __file__, 1, "Failed", None, None)
+        self.assertTrue(duplicates.filter(info))
+
+        clock.now = 11
+        record = _error(exception=ValueError("bad"))
+        self.assertTrue(duplicates.filter(record))
+        self.assertEqual(record.repeated, 2)
+
+
+class TestLogPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "log.txt")
+        self.root_handlers = logging.getLogger().handlers[:]
+        self.root_level = logging.getLogger().level
+
+    def tearDown(self):
+        root = logging.getLogger()
+        root.handlers[:] = self.root_handlers
+        root.setLevel(self.root_level)
+        self.directory.cleanup()
+
+    def read_entries(self, path=None):
+        with open(path or self.path, encoding="utf-8") as log_file:
+            return [json.loads(line) for line in log_file]
+
+    def test_records_are_written_as_json(self):
+        pipeline = LogPipeline(self.path, console=False)
+        pipeline.start()
+        logger = logging.getLogger("test.pipeline")
+        logger.debug("Not logged")
+        logger.info("Hello %s", "there")
+        try:
+            raise ValueError("bad")
+        except ValueError:
+            logger.exception("Failed")
+            logger.exception("Failed")
+        pipeline.stop()
+
+        entries = self.read_entries()
+        self.assertEqual([(entry["level"], entry["message"]) for entry in entries],
+                         [("INFO", "Hello there"), ("ERROR", "Failed")])
+        self.assertEqual(entries[0]["logger"], "test.pipeline")
+        self.assertIn("ValueError: bad", entries[1]["exception"])
+        self.assertNotIn(pipeline._enqueue, logging.getLogger().handlers)
+
+    def test_files_rotate_at_max_bytes(self):
+        pipeline = LogPipeline(self.path, max_bytes=1000, backup_count=2, console=False)
+        pipeline.start()
+        logger = logging.getLogger("test.pipeline")
+        for index in range(0, 100):
+            logger.info(f"Message {index} {'x' * 50}")
+        pipeline.stop()
+
+        self.assertLessEqual(os.path.getsize(self.path), 1000)
+        self.assertTrue(os.path.exists(self.path + ".2"))
+        self.assertFalse(os.path.exists(self.path + ".3"))
+        self.assertEqual(self.read_entries()[-1]["message"], f"Message 99 {'x' * 50}")
+
+
+if __name__ == '__main__':
+    unittest.main()
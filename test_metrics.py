@@ -0,0 +1,55 @@
+import asyncio
+from metrics import Metrics, NullMetrics, PrometheusHttpSink
+import unittest
+
+
+class TestMetrics(unittest.IsolatedAsyncioTestCase):
+
+    def test_timer_records_latency_and_errors(self):
+        metrics = Metrics(loop_lag_interval=0)
+        with metrics.time("stage", stage="render"):
+            pass
+        with self.assertRaises(ValueError):
+            with metrics.time("stage", stage="render"):
+                raise ValueError()
+        histogram = metrics.histograms["wordle_stage_seconds"][(("stage", "render"),)]
+        self.assertEqual(histogram.count, 2)
+        self.assertEqual(metrics.counters["wordle_stage_errors_total"][(("stage", "render"),)], 1)
+
+    def test_exposition(self):
+        metrics = Metrics(loop_lag_interval=0)
+        metrics.observe("stage_seconds", 0.003, stage="save")
+        metrics.increment("render_rejected")
+        metrics.register_gauge("active_games", lambda: 42)
+        text = metrics.exposition()
+        self.assertIn('wordle_stage_seconds_bucket{stage="save",le="0.0025"} 0', text)
+        self.assertIn('wordle_stage_seconds_bucket{stage="save",le="0.005"} 1', text)
+        self.assertIn('wordle_stage_seconds_bucket{stage="save",le="+Inf"} 1', text)
+        self.assertIn('wordle_stage_seconds_count{stage="save"} 1', text)
+        self.assertIn("wordle_render_rejected_total 1", text)
+        self.assertIn("wordle_active_games 42", text)
+
+    def test_null_metrics(self):
+        metrics = NullMetrics()
+        with metrics.time("stage", stage="render"):
+            metrics.increment("anything")
+        self.assertFalse(metrics.enabled)
+
+    async def test_http_endpoint(self):
+        from aiohttp import ClientSession
+        sink = PrometheusHttpSink(port=0)
+        metrics = Metrics(sinks=[sink], loop_lag_interval=0.01)
+        await metrics.start()
+        try:
+            await asyncio.sleep(0.05)
+            port = sink._runner.addresses[0][1]
+            async with ClientSession() as session:
+                async with session.get(f"http://127.0.0.1:{port}/metrics") as response:
+                    self.assertEqual(response.status, 200)
+                    self.assertIn("wordle_event_loop_lag_seconds_count", await response.text())
+        finally:
+            await metrics.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import asyncio
+import unittest
+from outbound import OutboundScheduler, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_burst_then_paced(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2.0, capacity=3, clock=clock)
+        self.assertEqual([bucket.reserve() for _ in range(3)], [0.0, 0.0, 0.0])
+        self.assertEqual(bucket.reserve(), 0.5)
+        self.assertEqual(bucket.reserve(), 1.0)
+        clock.now = 1.0
+        self.assertEqual(bucket.reserve(), 0.5)
+        self.assertEqual(bucket.time_to_full(), 2.0)
+
+
+class TestOutboundScheduler(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.published = []
+        self.scheduler = OutboundScheduler(self.publish, rate=1000.0, burst=10)
+
+    async def publish(self, item):
+        await asyncio.sleep(0.01)
+        self.published.append(item)
+
+    async def test_pending_updates_collapse(self):
+        first = asyncio.ensure_future(self.scheduler.submit("channel", 0))
+        await asyncio.sleep(0)  # let the first start publishing
+        results = await asyncio.gather(*(self.scheduler.submit("channel", item) for item in range(1, 5)))
+        self.assertTrue(await first)
+        self.assertEqual(results, [False, False, False, True])
+        self.assertEqual(self.published, [0, 4])
+
+    async def test_kept_updates_are_published(self):
+        results = await asyncio.gather(self.scheduler.submit("channel", 0),
+                                       self.scheduler.submit("channel", 1, keep=True),
+                                       self.scheduler.submit("channel", 2),
+                                       self.scheduler.submit("channel", 3))
+        self.assertEqual(results, [False, True, False, True])
+        self.assertEqual(self.published, [1, 3])
+
+    async def test_keys_are_independent(self):
+        await asyncio.gather(self.scheduler.submit("a", 1), self.scheduler.submit("b", 2))
+        self.assertEqual(sorted(self.published), [1, 2])
+
+    async def test_publish_errors_reach_the_caller(self):
+        async def fail(item):
+            raise RuntimeError("upload failed")
+        scheduler = OutboundScheduler(fail)
+        with self.assertRaises(RuntimeError):
+            await scheduler.submit("channel", 1)
+        await scheduler.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import tempfile
+import tracemalloc
+import unittest
+from pathlib import Path
+from board_renderer import BoardRenderer
+from profiler import CommandProfiler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCommandProfiler(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.clock = FakeClock()
+        self.rolls = []
+        self.profiler = CommandProfiler(sample_rate=0.5, slow_seconds=1.0, directory=self.directory.name,
+                                        memory_interval=0, max_dumps=1, random=lambda: self.rolls.pop(0),
+                                        clock=self.clock)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def run_command(self, name, seconds):
+        with self.profiler.profile(name):
+            self.clock.now += seconds
+
+    async def test_nothing_is_profiled_until_started(self):
+        self.run_command("wordle", 5)
+        self.assertEqual(self.profiler.counters, {"profiled": 0, "slow": 0, "dumps": 0})
+
+    async def test_slow_sampled_commands_are_kept(self):
+        await self.profiler.start_capture()
+        self.rolls = [0.9, 0.1, 0.1]
+        self.run_command("wordle", 0.1)  # not sampled
+        self.run_command("wordle", 0.1)  # sampled, but fast
+        self.run_command("wordle", 2)
+        self.assertEqual(self.profiler.counters, {"profiled": 2, "slow": 1, "dumps": 1})
+        self.assertTrue(self.profiler.latest_dump.exists())
+        self.assertTrue(self.profiler.latest_profile.startswith("wordle took 2.00s"))
+        self.assertIn("Profiled 2, slow 1, saved 1", self.profiler.report())
+
+    async def test_slow_unsampled_command_is_profiled_next_time(self):
+        await self.profiler.start_capture()
+        self.rolls = [0.9]
+        self.run_command("wordle_hint", 2)
+        self.assertEqual(self.profiler.counters["profiled"], 0)
+        self.run_command("wordle_hint", 2)  # armed, so no roll is needed
+        self.rolls = [0.9]
+        self.run_command("wordle", 2)  # a different command, so not armed
+        self.assertEqual(self.profiler.counters, {"profiled": 1, "slow": 3, "dumps": 1})
+        self.assertEqual(len(list(Path(self.directory.name).glob("*.prof"))), 1)
+        await self.profiler.stop_capture()
+        self.assertFalse(self.profiler.capturing)
+
+    async def test_memory_report(self):
+        profiler = CommandProfiler(memory_interval=60)
+        profiler.add_memory_source("active games", lambda: 3)
+        profiler.add_memory_source("board canvases", lambda: (2, 2 * 1024 * 1024))
+        await profiler.start_capture()
+        try:
+            buffers = [bytes(1024) for _ in range(0, 100)]
+            report = await profiler.snapshot_memory()
+        finally:
+            await profiler.close()
+        self.assertIsNotNone(buffers)
+        self.assertIn("traced", report)
+        self.assertIn("not traced: active games 3, board canvases 2 (2.0 MiB)", report)
+        self.assertFalse(tracemalloc.is_tracing())
+        self.assertIsNone(await profiler.snapshot_memory())
+
+    async def test_tracing_started_elsewhere_is_left_running(self):
+        tracemalloc.start()
+        try:
+            profiler = CommandProfiler(memory_interval=60)
+            await profiler.start_capture()
+            await profiler.stop_capture()
+            self.assertTrue(tracemalloc.is_tracing())
+        finally:
+            tracemalloc.stop()
+
+    def test_renderer_memory_counts_pixels(self):
+        renderer = BoardRenderer(None, None, pixel_width=400, pixel_height=550)
+        renderer._canvases["game"] = None
+        self.assertEqual(renderer.memory_usage(), {"canvases": (1, 400 * 550 * 4), "sprites": (0, 0)})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import asyncio
+import threading
+import wordle
+from render_pool import RenderExecutor, RenderQueueFull
+import unittest
+
+
+class TestRenderExecutor(unittest.IsolatedAsyncioTestCase):
+
+    async def _encode_with(self, mode):
+        game = wordle.WordleGame()
+        game.game_state.solution = 'CRUST'
+        game.submit_guess("TRUST", "Nobody")
+        executor = RenderExecutor(mode=mode, max_workers=2)
+        try:
+            return await executor.run(wordle.encode_board, *game.snapshot())
+        finally:
+            await executor.shutdown()
+
+    async def test_modes_encode_the_same_board(self):
+        inline = await self._encode_with("inline")
+        self.assertEqual(await self._encode_with("thread"), inline)
+        self.assertEqual(await self._encode_with("process"), inline)
+
+    async def test_queue_limit(self):
+        executor = RenderExecutor(mode="thread", max_workers=1, max_queue=1)
+        release = threading.Event()
+        running = asyncio.ensure_future(executor.run(release.wait))
+        await asyncio.sleep(0.05)
+        waiting = asyncio.ensure_future(executor.run(lambda: "waited"))
+        await asyncio.sleep(0)
+        self.assertEqual(executor.queue_depth, 1)
+        with self.assertRaises(RenderQueueFull):
+            await executor.run(lambda: "rejected")
+        release.set()
+        self.assertTrue(await running)
+        self.assertEqual(await waiting, "waited")
+        await executor.shutdown()
+        with self.assertRaises(RuntimeError):
+            await executor.run(lambda: "closed")
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            RenderExecutor(mode="gpu")
+
+
+if __name__ == '__main__':
+    unittest.main()
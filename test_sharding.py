@@ -0,0 +1,58 @@
+import os
+import unittest
+from unittest import mock
+from sharding import ShardConfig
+from storage.base_storage import filter_game_states, shard_for_guild
+
+
+class FakeClient:
+    def __init__(self, shard_id=None, shard_count=None, shard_ids=None):
+        self.shard_id = shard_id
+        self.shard_count = shard_count
+        if shard_ids is not None:
+            self.shard_ids = shard_ids
+
+
+class TestShardConfig(unittest.TestCase):
+
+    def test_from_env(self):
+        with mock.patch.dict(os.environ, {"SHARD_COUNT": "4", "SHARD_IDS": "1,3"}):
+            shards = ShardConfig.from_env()
+        self.assertEqual((shards.shard_ids, shards.shard_count), ((1, 3), 4))
+        self.assertTrue(shards.sharded)
+        self.assertFalse(shards.primary)
+        with mock.patch.dict(os.environ, {"SHARD_COUNT": "2", "SHARD_IDS": ""}):
+            self.assertEqual(ShardConfig.from_env().shard_ids, (0, 1))
+        with mock.patch.dict(os.environ, {"SHARD_COUNT": "2", "SHARD_IDS": "2"}):
+            with self.assertRaises(ValueError):
+                ShardConfig.from_env()
+
+    def test_from_client(self):
+        single = ShardConfig.from_client(None)
+        self.assertFalse(single.sharded)
+        self.assertIsNone(single.storage_filter)
+        self.assertTrue(single.owns(123456789012345678))
+
+        one_of_three = ShardConfig.from_client(FakeClient(shard_id=2, shard_count=3))
+        self.assertEqual(one_of_three.storage_filter, ((2,), 3))
+        self.assertTrue(one_of_three.owns(2 << 22))
+        self.assertFalse(one_of_three.owns(1 << 22))
+
+        auto = ShardConfig.from_client(FakeClient(shard_count=3, shard_ids=[0, 1, 2]))
+        self.assertFalse(auto.sharded)
+
+    def test_every_guild_has_one_owner(self):
+        configs = [ShardConfig((shard_id,), 4) for shard_id in range(4)]
+        for guild_id in (None, 1, 81384788765712384, 1 << 22, 3 << 22):
+            self.assertEqual(sum(config.owns(guild_id) for config in configs), 1)
+        self.assertEqual(shard_for_guild(None, 4), 0)
+
+    def test_filter_rows_by_shard(self):
+        rows = [{"channel_id": channel_id, "game_state": '{"guild_id": %d}' % (channel_id << 22)}
+                for channel_id in range(6)]
+        kept = filter_game_states(rows, include_finished=False, shard=((1,), 3))
+        self.assertEqual([row["channel_id"] for row in kept], [1, 4])
+
+
+if __name__ == '__main__':
+    unittest.main()
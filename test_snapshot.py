@@ -0,0 +1,94 @@
+import os
+import tempfile
+import unittest
+import warnings
+from board_renderer import BoardRenderer
+from metrics import NullMetrics
+from snapshot import Snapshot, SnapshotError, StartupTimer, write_snapshot
+import wordle
+
+warnings.simplefilter("ignore", DeprecationWarning)  # Pillow warns about textsize on every call
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "snapshot.bin")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        write_snapshot(self.path, {"a": b"first", "empty": b"", "b": b"second"})
+        snapshot = Snapshot(self.path)
+        self.assertEqual(bytes(snapshot.section("a")), b"first")
+        self.assertEqual(bytes(snapshot.section("empty")), b"")
+        self.assertEqual(bytes(snapshot.section("b")), b"second")
+        self.assertIsNone(snapshot.section("missing"))
+        snapshot.close()
+
+    def test_corruption_is_caught(self):
+        write_snapshot(self.path, {"a": b"first", "b": b"second"})
+        with open(self.path, "r+b") as snapshot_file:
+            snapshot_file.seek(-1, os.SEEK_END)
+            snapshot_file.write(b"X")
+        with self.assertRaises(SnapshotError):
+            Snapshot(self.path)
+        with self.assertLogs("snapshot", level="WARNING"):
+            self.assertIsNone(Snapshot.open(self.path))
+
+    def test_missing_or_truncated_file(self):
+        self.assertIsNone(Snapshot.open(None))
+        self.assertIsNone(Snapshot.open(self.path))
+        write_snapshot(self.path, {"a": b"first"})
+        with open(self.path, "r+b") as snapshot_file:
+            snapshot_file.truncate(10)
+        with self.assertLogs("snapshot", level="WARNING"):
+            self.assertIsNone(Snapshot.open(self.path))
+
+    def test_sprites_round_trip(self):
+        wordle.encode_board([[("c", wordle.GREEN), ("r", wordle.YELLOW)]], "")
+        exported = wordle.board_renderer.export_sprites()
+        renderer = BoardRenderer(lambda: self.fail("the font was loaded"), lambda: None,
+                                 rows=wordle.NUMBER_OF_GUESSES, cols=wordle.NUMBER_OF_LETTERS)
+        self.assertGreaterEqual(renderer.import_sprites(exported), 2)
+        renderer.render([[("c", wordle.GREEN), ("r", wordle.YELLOW)]])
+        with self.assertRaises(ValueError):
+            BoardRenderer(None, None, pixel_width=200).import_sprites(exported)
+
+    def test_warm_start_round_trip(self):
+        game = wordle.WordleGame()
+        game.game_state.solution = "moldy"
+        game.submit_guess("crane", "Player", 5)
+        finished = wordle.WordleGame()
+        finished.game_state.is_over = True
+        wordle.write_warm_start(self.path, [(1, game), (2, finished)], wordle.ShardConfig())
+
+        warm_start = wordle._open_warm_start(self.path)
+        self.assertEqual(warm_start["meta"]["shards"], [[0], 1])
+        words, dictionary = wordle._load_word_lists(warm_start)
+        self.assertEqual(list(words), list(wordle.words))
+        self.assertTrue(dictionary.contains("crane"))
+        rows = wordle.unpack_snapshot_games(warm_start["games"])
+        self.assertEqual([row["channel_id"] for row in rows], [1])
+        restored = wordle.decode_game_state(rows[0]["game_state"])
+        self.assertEqual((restored.solution, restored.guess_count, restored.participants), ("moldy", 1, [5]))
+
+
+class TestStartupTimer(unittest.TestCase):
+
+    def test_report_is_slowest_first(self):
+        timer = StartupTimer()
+        timer.add("fast", 0.001)
+        timer.add("slow", 0.5)
+        with timer.phase("timed"):
+            pass
+        self.assertTrue(timer.report().startswith("slow 500.0ms, fast 1.0ms"))
+        with self.assertLogs("snapshot", level="INFO"):
+            timer.report_once(NullMetrics())
+        timer.report_once(NullMetrics())  # only the first call logs
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import itertools
+import tempfile
+import unittest
+import numpy as np
+import wordle
+from feedback import pattern_code
+from solver import FeedbackMatrix, Solver
+
+_FEEDBACK = {wordle.GRAY: 0, wordle.YELLOW: 1, wordle.GREEN: 2}
+
+WORDS = ["buggy", "debug", "crane", "slate", "moldy", "geese", "eerie", "speed", "abbey", "kebab"]
+
+
+def _match_letters_code(guess, solution):
+    game = wordle.WordleGame()
+    game.game_state.solution = solution
+    game._match_letters(guess)
+    return pattern_code(_FEEDBACK[color] for _, color in game.game_state.board.rows()[0])
+
+
+class TestFeedbackMatrix(unittest.TestCase):
+
+    def test_matches_game_scoring(self):
+        matrix = FeedbackMatrix.build(WORDS, WORDS)
+        for guess, solution in itertools.product(WORDS, WORDS):
+            self.assertEqual(matrix.feedback(guess, solution), _match_letters_code(guess, solution),
+                             f"{guess} against {solution}")
+
+    def test_duplicate_letters(self):
+        matrix = FeedbackMatrix.build(["buggy", "geese"], ["debug", "speed"])
+        # only one of the g's is in debug, and the first one takes it
+        self.assertEqual(matrix.feedback("buggy", "debug"), pattern_code([1, 1, 1, 0, 0]))
+        # speed has two e's, one of them matched exactly
+        self.assertEqual(matrix.feedback("geese", "speed"), pattern_code([0, 1, 2, 1, 0]))
+
+    def test_saved_matrix_is_memory_mapped(self):
+        with tempfile.TemporaryDirectory() as directory:
+            built = FeedbackMatrix.load_or_build(WORDS, WORDS[:4], directory)
+            loaded = FeedbackMatrix.load_or_build(WORDS, WORDS[:4], directory)
+            self.assertIsInstance(loaded.codes, np.memmap)
+            self.assertTrue(np.array_equal(built.codes, loaded.codes))
+            # a different word list gets its own matrix
+            other = FeedbackMatrix.load_or_build(WORDS, WORDS[:5], directory)
+            self.assertEqual(other.codes.shape, (len(WORDS), 5))
+
+
+class TestSolver(unittest.TestCase):
+
+    def setUp(self):
+        self.solver = Solver(FeedbackMatrix.build(WORDS, WORDS))
+
+    def test_candidates_agree_with_feedback(self):
+        history = [("crane", self.solver.matrix.feedback("crane", "slate"))]
+        remaining = [WORDS[column] for column in self.solver.candidates(history)]
+        self.assertIn("slate", remaining)
+        for word in remaining:
+            self.assertEqual(self.solver.matrix.feedback("crane", word), history[0][1])
+
+    def test_guess_outside_the_matrix(self):
+        solver = Solver(FeedbackMatrix.build(WORDS[:4], WORDS))
+        history = [("moldy", _match_letters_code("moldy", "speed"))]
+        self.assertIn(WORDS.index("speed"), solver.candidates(history))
+
+    def test_rank_guesses(self):
+        columns = self.solver.candidates([])
+        ranking = self.solver.rank_guesses(columns, limit=3)
+        self.assertEqual(len(ranking), 3)
+        self.assertEqual(ranking, sorted(ranking, key=lambda item: item[1]))
+        # a guess that splits every solution apart leaves less than one on average
+        self.assertLess(ranking[0][1], 1.0)
+        self.assertEqual(self.solver.rank_guesses(columns, limit=3), ranking)
+
+    def test_rank_prefers_possible_solutions(self):
+        columns = np.array([WORDS.index("buggy"), WORDS.index("debug")])
+        best, expected = self.solver.rank_guesses(columns, limit=1)[0]
+        self.assertIn(best, ("buggy", "debug"))
+        self.assertEqual(expected, 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import random
+import unittest
+from stats import GUILD_TOTALS, GuildStats, Leaderboard, PlayerStats, StatsTracker
+from storage.memory import MemoryStorage
+
+
+class TestPlayerStats(unittest.TestCase):
+
+    def test_streaks_and_distribution(self):
+        stats = PlayerStats()
+        for won, guess_count in [(True, 3), (True, 4), (False, 6), (True, 3)]:
+            stats.record(won, guess_count)
+        self.assertEqual((stats.played, stats.wins, stats.streak, stats.max_streak), (4, 3, 1, 2))
+        self.assertEqual(stats.distribution, [0, 0, 2, 1, 0, 0])
+        restored = PlayerStats.from_json(stats.to_json())
+        self.assertEqual(restored.to_json(), stats.to_json())
+
+
+class TestLeaderboard(unittest.TestCase):
+
+    def test_matches_full_sort(self):
+        rng = random.Random(1)
+        leaderboard = Leaderboard(size=5)
+        players = {user_id: PlayerStats() for user_id in range(1, 40)}
+        for _ in range(500):
+            user_id = rng.choice(list(players))
+            players[user_id].record(rng.random() < 0.4, rng.randint(1, 6))
+            leaderboard.update(user_id, players[user_id])
+        expected = sorted(players, key=lambda user_id: (players[user_id].wins, players[user_id].max_streak),
+                          reverse=True)[:5]
+        self.assertEqual([(entry[1], entry[2]) for entry in leaderboard.entries],
+                         [(players[user_id].wins, players[user_id].max_streak) for user_id in expected])
+
+    def test_round_trip(self):
+        stats = GuildStats(leaderboard_size=3)
+        player = PlayerStats()
+        player.record(True, 2)
+        stats.leaderboard.update(7, player)
+        stats.played = stats.wins = 1
+        restored = GuildStats.from_json(stats.to_json(), leaderboard_size=3)
+        self.assertEqual(restored.leaderboard.entries, [[7, 1, 1, 1]])
+        self.assertEqual((restored.played, restored.wins), (1, 1))
+
+
+class TestStatsTracker(unittest.IsolatedAsyncioTestCase):
+
+    async def test_record_and_read(self):
+        storage = MemoryStorage()
+        tracker = StatsTracker(storage, "wordle")
+        await tracker.record_game(10, [1, 2], 2, 4)
+        await tracker.record_game(10, [1], None, 6)
+        await tracker.record_game(11, [1], 1, 1)
+
+        one = await tracker.player_stats(10, 1)
+        self.assertEqual((one.played, one.wins, one.streak), (2, 0, 0))
+        two = await tracker.player_stats(10, 2)
+        self.assertEqual((two.played, two.wins, two.distribution[3]), (1, 1, 1))
+        guild = await tracker.guild_stats(10)
+        self.assertEqual((guild.played, guild.wins), (2, 1))
+        self.assertEqual([entry[0] for entry in guild.leaderboard.entries], [2, 1])
+
+        # another process, or a restart, reads the same rows from storage
+        restarted = StatsTracker(storage, "wordle")
+        self.assertEqual((await restarted.player_stats(10, 2)).to_json(), two.to_json())
+        self.assertEqual((await restarted.guild_stats(11)).leaderboard.entries, [[1, 1, 1, 1]])
+        self.assertIn(GUILD_TOTALS, storage.load_stats("wordle", 10, [GUILD_TOTALS]))
+
+    async def test_evicted_rows_reload(self):
+        tracker = StatsTracker(MemoryStorage(), "wordle", max_cached=2)
+        for user_id in range(1, 6):
+            await tracker.record_game(10, [user_id], user_id, 3)
+        self.assertLessEqual(len(tracker._cache), 2)
+        self.assertEqual((await tracker.player_stats(10, 1)).wins, 1)
+        self.assertEqual((await tracker.guild_stats(10)).played, 5)
+
+    async def test_without_storage(self):
+        tracker = StatsTracker(None, "wordle")
+        await tracker.record_game(None, [1], 1, 2)
+        self.assertEqual((await tracker.player_stats(None, 1)).wins, 1)
+        await tracker.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,292 @@
+from storage.base_storage import BaseStorage, summarize_game_state
+from storage.game_state_header import FLAG_IS_OVER, FLAGS_OFFSET, GAME_STATE_MAGIC, GUESS_COUNT_OFFSET, STATE_HEADER
+from storage.memory import MemoryStorage
+from storage.sqlite import SqliteStorage
+from storage.sync_adapter import SyncStorageAdapter, as_async_storage
+from storage.write_behind import WriteBehindStorage
+import asyncio
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+
+class DictStorage(BaseStorage):
+    """A BaseStorage kept in a dict, recording which thread each call ran on"""
+
+    def __init__(self):
+        self.game_states = {}
+        self.threads = set()
+        self.batches = []
+
+    def delete_game_state(self, game_name, channel_id):
+        self.threads.add(threading.get_ident())
+        self.game_states.pop((game_name, channel_id), None)
+
+    def get_all_game_states(self, game_name):
+        self.threads.add(threading.get_ident())
+        return [{"channel_id": channel_id, "game_state": game_state}
+                for (name, channel_id), game_state in self.game_states.items() if name == game_name]
+
+    def load_game_state(self, game_name, channel_id):
+        self.threads.add(threading.get_ident())
+        return self.game_states.get((game_name, channel_id))
+
+    def save_game_state(self, game_name, channel_id, game_state):
+        self.threads.add(threading.get_ident())
+        self.game_states[(game_name, channel_id)] = game_state
+
+    def save_game_states(self, game_name, game_states):
+        self.batches.append(dict(game_states))
+        super().save_game_states(game_name, game_states)
+
+
+class TestSyncStorageAdapter(unittest.IsolatedAsyncioTestCase):
+
+    async def test_calls_run_off_the_event_loop(self):
+        backend = DictStorage()
+        adapter = as_async_storage(backend)
+        self.assertIsInstance(adapter, SyncStorageAdapter)
+        self.assertIs(as_async_storage(adapter), adapter)
+        self.assertIsNone(as_async_storage(None))
+
+        await adapter.save_game_state("wordle", 1, "one")
+        await adapter.save_game_state("wordle", 2, "two")
+        self.assertEqual(await adapter.load_game_state("wordle", 1), "one")
+        self.assertEqual(len(await adapter.get_all_game_states("wordle")), 2)
+        await adapter.delete_game_state("wordle", 1)
+        self.assertIsNone(await adapter.load_game_state("wordle", 1))
+        await adapter.close()
+
+        self.assertEqual(len(backend.threads), 1)
+        self.assertNotIn(threading.get_ident(), backend.threads)
+
+    async def test_iter_streams_batches(self):
+        backend = DictStorage()
+        for channel_id in range(5):
+            backend.save_game_state("wordle", channel_id, '{"is_over": %s}' % ("true" if channel_id == 2 else "false"))
+        adapter = as_async_storage(backend)
+        batches = [[row["channel_id"] for row in batch]
+                   async for batch in adapter.iter_game_states("wordle", batch_size=2)]
+        self.assertEqual(batches, [[0, 1], [3, 4]])
+        await adapter.close()
+
+
+class TestSummarizeGameState(unittest.TestCase):
+
+    def test_binary_and_json(self):
+        self.assertEqual(summarize_game_state(b"WG\x01\x01\x04rest"), (True, 4, None))
+        self.assertEqual(summarize_game_state(b"WG\x01\x00\x02rest"), (False, 2, None))
+        self.assertEqual(summarize_game_state('{"is_over": true, "guess_count": 6, "guild_id": 7}'), (True, 6, 7))
+        self.assertEqual(summarize_game_state('not json'), (False, 0, None))
+
+    def test_sql_offsets_match_the_header(self):
+        # the Postgres backfill reads single bytes of the header, at these offsets
+        header = STATE_HEADER.pack(GAME_STATE_MAGIC, 3, FLAG_IS_OVER, 4, 6, 5)
+        self.assertEqual(header[FLAGS_OFFSET], FLAG_IS_OVER)
+        self.assertEqual(header[GUESS_COUNT_OFFSET], 4)
+
+
+class TestMemoryStorage(unittest.TestCase):
+
+    def test_round_trip(self):
+        backend = MemoryStorage()
+        backend.save_game_states("wordle", {1: b"one", 2: "two"})
+        backend.save_game_state("other", 1, "elsewhere")
+        self.assertEqual(backend.load_game_state("wordle", 1), b"one")
+        self.assertEqual(sorted(row["channel_id"] for row in backend.get_all_game_states("wordle")), [1, 2])
+        backend.delete_game_state("wordle", 1)
+        self.assertIsNone(backend.load_game_state("wordle", 1))
+        self.assertEqual(backend.load_game_state("other", 1), "elsewhere")
+
+    def test_stats(self):
+        backend = MemoryStorage()
+        backend.save_stats("wordle", 10, {0: "guild", 5: "player"})
+        self.assertEqual(backend.load_stats("wordle", 10, [0, 5, 6]), {0: "guild", 5: "player"})
+        self.assertEqual(backend.load_stats("wordle", 11, [0, 5]), {})
+
+
+class TestSqliteStorage(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "games.db")
+        self.backend = SqliteStorage(self.path)
+
+    def tearDown(self):
+        self.backend.close()
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        self.backend.save_game_state("wordle", 1, "{}")
+        self.backend.save_game_state("wordle", 1, b"WG binary")
+        self.backend.save_game_states("wordle", {2: b"two", 3: "three"})
+        self.assertEqual(self.backend.load_game_state("wordle", 1), b"WG binary")
+        self.assertEqual(self.backend.load_game_state("wordle", 3), "three")
+        self.assertIsNone(self.backend.load_game_state("other", 1))
+        self.assertEqual(sorted(row["channel_id"] for row in self.backend.get_all_game_states("wordle")), [1, 2, 3])
+        self.backend.delete_game_state("wordle", 2)
+        self.assertIsNone(self.backend.load_game_state("wordle", 2))
+
+    def test_iter_skips_finished_games(self):
+        finished = b"WG\x01\x01\x06rest"  # the is_over flag set
+        playing = b"WG\x01\x00\x02rest"
+        self.backend.save_game_states("wordle", {channel_id: finished if channel_id % 3 == 0 else playing
+                                                 for channel_id in range(1, 11)})
+        batches = list(self.backend.iter_game_states("wordle", batch_size=3))
+        self.assertEqual([[row["channel_id"] for row in batch] for batch in batches], [[1, 2, 4], [5, 7, 8], [10]])
+        everything = list(self.backend.iter_game_states("wordle", include_finished=True, batch_size=100))
+        self.assertEqual(len(everything[0]), 10)
+
+    def test_iter_only_own_shard(self):
+        def game_state(guild_id):
+            return b"WG\x02\x10\x01\x06\x05" + guild_id.to_bytes(8, "big") + b"rest"
+        self.backend.save_game_states("wordle", {channel_id: game_state(channel_id << 22) for channel_id in range(6)})
+        self.backend.save_game_state("wordle", 10, "{}")  # no guild, shard 0
+        batches = list(self.backend.iter_game_states("wordle", shard=((0, 2), 3)))
+        self.assertEqual([row["channel_id"] for batch in batches for row in batch], [0, 2, 3, 5, 10])
+
+    def test_archive_moves_old_finished_games(self):
+        finished = b"WG\x01\x01\x06rest"
+        playing = b"WG\x01\x00\x02rest"
+        self.backend.save_game_states("wordle", {1: finished, 2: playing, 3: finished})
+        self.backend._connection.execute("update game_states set updated_at=updated_at-1000 where channel_id in (1, 2)")
+        self.assertEqual(self.backend.archive_game_states("wordle", finished_age=500, stale_age=5000, batch_size=1),
+                         (1, 0))
+        self.assertIsNone(self.backend.load_game_state("wordle", 1))
+        self.assertEqual(self.backend.load_game_state("wordle", 3), finished)
+        archived = self.backend._connection.execute("select channel_id, guess_count, game_state_bin "
+                                                    "from game_states_archive").fetchall()
+        self.assertEqual(archived, [(1, 6, finished)])
+
+        self.assertEqual(self.backend.archive_game_states("wordle", finished_age=500, stale_age=500), (0, 1))
+        self.assertIsNone(self.backend.load_game_state("wordle", 2))
+
+    def test_migrates_older_table(self):
+        self.backend.close()
+        os.remove(self.path)
+        connection = sqlite3.connect(self.path)
+        connection.execute("create table game_states (game_name text not null, channel_id integer not null, "
+                           "game_state text, game_state_bin blob)")
+        connection.execute("insert into game_states values ('wordle', 1, null, ?)", (b"WG\x01\x01\x03rest",))
+        connection.commit()
+        connection.close()
+        self.backend = SqliteStorage(self.path)
+        row = self.backend._connection.execute("select is_over, guess_count, updated_at > 0 "
+                                               "from game_states").fetchone()
+        self.assertEqual(row, (1, 3, 1))
+
+    def test_stats(self):
+        self.backend.save_stats("wordle", 10, {0: "guild", 5: "player"})
+        self.backend.save_stats("wordle", 10, {5: "player again"})
+        self.backend.save_stats("wordle", 11, {5: "elsewhere"})
+        self.assertEqual(self.backend.load_stats("wordle", 10, [0, 5, 6]), {0: "guild", 5: "player again"})
+
+    def test_reopen_keeps_games(self):
+        self.backend.save_game_states("wordle", {1: b"one"})
+        self.backend.close()
+        self.backend = SqliteStorage(self.path)
+        self.assertEqual(self.backend.load_game_state("wordle", 1), b"one")
+        journal_mode = self.backend._connection.execute("pragma journal_mode").fetchone()[0]
+        self.assertEqual(journal_mode, "wal")
+
+
+class TestWriteBehindStorage(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.backend = DictStorage()
+        self.storage = WriteBehindStorage(as_async_storage(self.backend), flush_interval=60, max_pending=3)
+        await self.storage.open()
+
+    async def asyncTearDown(self):
+        await self.storage.close()
+
+    async def test_saves_are_coalesced(self):
+        for state in ["a", "b", "c"]:
+            await self.storage.save_game_state("wordle", 1, state)
+        await self.storage.save_game_state("wordle", 2, "x")
+        self.assertEqual(self.backend.game_states, {})
+        self.assertEqual(await self.storage.load_game_state("wordle", 1), "c")
+
+        await self.storage.flush()
+        self.assertEqual(self.backend.batches, [{1: "c", 2: "x"}])
+        self.assertEqual(self.storage.counters,
+                         {"saves": 4, "coalesced": 2, "flushed": 2, "flushes": 1, "pending": 0})
+
+    async def test_flush_when_full(self):
+        for channel_id in range(0, 3):
+            await self.storage.save_game_state("wordle", channel_id, "state")
+        self.assertEqual(len(self.backend.game_states), 3)
+
+    async def test_close_flushes(self):
+        await self.storage.save_game_state("wordle", 1, "final")
+        await self.storage.close()
+        self.assertEqual(self.backend.game_states, {("wordle", 1): "final"})
+
+    async def test_delete_drops_pending(self):
+        await self.storage.save_game_state("wordle", 1, "state")
+        await self.storage.delete_game_state("wordle", 1)
+        await self.storage.flush()
+        self.assertEqual(self.backend.game_states, {})
+
+    async def test_load_during_flush_sees_the_state_being_written(self):
+        self.backend.game_states[("wordle", 1)] = "old"
+        released = asyncio.Event()
+        backend = self.storage._storage
+        save_game_states = backend.save_game_states
+
+        async def save_slowly(game_name, game_states):
+            await released.wait()
+            await save_game_states(game_name, game_states)
+
+        backend.save_game_states = save_slowly
+        await self.storage.save_game_state("wordle", 1, "new")
+        flushing = asyncio.ensure_future(self.storage.flush())
+        await asyncio.sleep(0)
+        try:
+            self.assertEqual(await self.storage.load_game_state("wordle", 1), "new")
+        finally:
+            released.set()
+            await flushing
+        self.assertEqual(await self.storage.load_game_state("wordle", 1), "new")
+
+    async def test_iteration_stopped_early_closes_the_backend(self):
+        closed = []
+
+        async def iter_game_states(game_name, include_finished=False, batch_size=500, shard=None):
+            try:
+                yield [{"channel_id": 1, "game_state": "state"}]
+                yield [{"channel_id": 2, "game_state": "state"}]
+            finally:
+                closed.append(game_name)
+
+        self.storage._storage.iter_game_states = iter_game_states
+        batches = self.storage.iter_game_states("wordle")
+        async for _ in batches:
+            break
+        await batches.aclose()
+        self.assertEqual(closed, ["wordle"])
+
+    async def test_delete_during_flush_stays_deleted(self):
+        released = asyncio.Event()
+        backend = self.storage._storage
+        save_game_states = backend.save_game_states
+
+        async def save_slowly(game_name, game_states):
+            await released.wait()
+            await save_game_states(game_name, game_states)
+
+        backend.save_game_states = save_slowly
+        await self.storage.save_game_state("wordle", 1, "state")
+        flushing = asyncio.ensure_future(self.storage.flush())
+        await asyncio.sleep(0)
+        deleting = asyncio.ensure_future(self.storage.delete_game_state("wordle", 1))
+        await asyncio.sleep(0)
+        released.set()
+        await asyncio.gather(flushing, deleting)
+        self.assertEqual(self.backend.game_states, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
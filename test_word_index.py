@@ -0,0 +1,40 @@
+from word_index import WordIndex
+import unittest
+
+
+class TestWordIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = WordIndex(["crane", "crate", "adieu", "cranes", "Trust", "cat"])
+
+    def test_contains_is_case_insensitive(self):
+        self.assertTrue(self.index.contains("CRANE"))
+        self.assertTrue("trust" in self.index)
+        self.assertFalse(self.index.contains("xyzab"))
+        self.assertFalse(self.index.contains(""))
+
+    def test_length_buckets(self):
+        self.assertEqual(len(self.index), 6)
+        self.assertEqual(self.index.lengths(), [3, 5, 6])
+        self.assertEqual(self.index.words_of_length(5), ["adieu", "crane", "crate", "trust"])
+        self.assertIsNone(self.index.random_word(7))
+        self.assertEqual(self.index.random_word(6), "cranes")
+
+    def test_prefix(self):
+        self.assertEqual(self.index.with_prefix("cra"), ["crane", "crate", "cranes"])
+        self.assertEqual(self.index.with_prefix("CRA", length=5), ["crane", "crate"])
+        self.assertEqual(self.index.with_prefix("zz"), [])
+
+    def test_pattern(self):
+        self.assertEqual(self.index.matching("cra_e"), ["crane", "crate"])
+        self.assertEqual(self.index.matching("??i?u"), ["adieu"])
+        self.assertEqual(self.index.matching("cr_n"), [])
+
+    def test_add_after_query(self):
+        self.assertEqual(self.index.with_prefix("cro"), [])
+        self.index.add("CROWN")
+        self.assertEqual(self.index.with_prefix("cro"), ["crown"])
+
+
+if __name__ == '__main__':
+    unittest.main()
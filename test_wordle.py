@@ -1,5 +1,8 @@
+import itertools
+import json
 import wordle
 from wordle import WordleGame
+from storage.base_storage import summarize_game_state
 import unittest
 
 
@@ -197,6 +200,94 @@ class TestWordle(unittest.TestCase):
         self.assertEqual(game.game_state.is_over, True)
         self.assertEqual(game.current_message, "Nobody\nWins in 6!")
 
+    def test_tile_views_write_through(self):
+        board = wordle.WordleBoard()
+        tile = board.get_tile(2, 3)
+        self.assertEqual((tile.letter, tile.color), (' ', wordle.EMPTY))
+        tile.letter = "Q"
+        tile.color = wordle.GREEN
+        self.assertEqual(board.rows()[2][3], ("Q", wordle.GREEN))
+        board.set_tile(2, 3, "#123456", "é")
+        self.assertEqual((board.board[2][3].letter, board.board[2][3].color), ("é", "#123456"))
+
+    def test_json_round_trip(self):
+        game = WordleGame()
+        game.game_state.solution = 'CRUST'
+        game.submit_guess("TRUST", "Nobody")
+        game.submit_guess("XYZAB", "Nobody")
+        restored = wordle.WordleGameState()
+        restored.from_dict(json.loads(json.dumps(game.game_state, cls=wordle.WordleJSONEncoder)))
+        self.assertEqual(restored.board.rows(), game.game_state.board.rows())
+        self.assertEqual(restored.solution, 'CRUST')
+        self.assertEqual(restored.guess_count, 1)
+
+    def test_binary_round_trip(self):
+        game = WordleGame()
+        game.game_state.solution = 'SIXTH'
+        game.submit_guess("FIRST", "Nobody")
+        game.submit_guess("XYZAB", "Nobody")
+        game.game_state.board.set_tile(5, 4, "#123456", "é")
+        game.game_state.game_board_message_id = 1012345678901234567
+        game.game_state.is_over = True
+        blob = wordle.encode_game_state(game.game_state)
+        self.assertTrue(blob.startswith(wordle.GAME_STATE_MAGIC))
+        restored = wordle.decode_game_state(blob)
+        self.assertEqual(restored.board.rows(), game.game_state.board.rows())
+        self.assertEqual(restored.solution, 'SIXTH')
+        self.assertEqual(restored.guess_count, 1)
+        self.assertEqual(restored.game_board_message_id, 1012345678901234567)
+        self.assertTrue(restored.is_over)
+
+    def test_binary_guild_id_is_summarized(self):
+        game = WordleGame()
+        game.game_state.channel_id = 42
+        game.game_state.guild_id = 987654321987654321
+        game.game_state.game_board_message_id = 7
+        blob = wordle.encode_game_state(game.game_state)
+        self.assertEqual(wordle.decode_game_state(blob).guild_id, 987654321987654321)
+        self.assertEqual(summarize_game_state(blob), (False, 0, 987654321987654321))
+
+    def test_summary_matches_the_codec(self):
+        # storage reads is_over, guess_count and guild_id from the header alone, so they must agree with a full decode
+        for over, message_id, channel_id, guild_id, participants in itertools.product(
+                (False, True), (None, 7), (None, 42), (None, 987654321987654321), ([], [5, 6])):
+            game = WordleGame()
+            game.game_state.solution = 'CRUST'
+            game.submit_guess("TRUST", "Nobody")
+            game.game_state.is_over = over
+            game.game_state.game_board_message_id = message_id
+            game.game_state.channel_id = channel_id
+            game.game_state.guild_id = guild_id
+            game.game_state.participants = list(participants)
+            blob = wordle.encode_game_state(game.game_state)
+            restored = wordle.decode_game_state(blob)
+            self.assertEqual(summarize_game_state(blob), (restored.is_over, restored.guess_count, restored.guild_id))
+            self.assertEqual(summarize_game_state(blob), (over, 1, guild_id))
+
+    def test_decode_json_game_state(self):
+        game = WordleGame()
+        game.game_state.solution = 'CRUST'
+        game.submit_guess("TRUST", "Nobody")
+        encoded = json.dumps(game.game_state, cls=wordle.WordleJSONEncoder)
+        for blob in (encoded, encoded.encode()):
+            restored = wordle.decode_game_state(blob)
+            self.assertEqual(restored.board.rows(), game.game_state.board.rows())
+            self.assertEqual(restored.guess_count, 1)
+
+    def test_participants_round_trip(self):
+        game = WordleGame()
+        game.game_state.solution = 'CRUST'
+        game.submit_guess("TRUST", "One", 111)
+        game.submit_guess("XYZAB", "Two", 222)  # not a word, so it doesn't count
+        game.submit_guess("CRUST", "Three", 2 ** 63 + 3)
+        self.assertEqual(game.game_state.participants, [111, 2 ** 63 + 3])
+        self.assertEqual(game.winner_id, 2 ** 63 + 3)
+        restored = wordle.decode_game_state(wordle.encode_game_state(game.game_state))
+        self.assertEqual(restored.participants, [111, 2 ** 63 + 3])
+        self.assertEqual(restored.board.rows(), game.game_state.board.rows())
+        restored = wordle.decode_game_state(json.dumps(game.game_state, cls=wordle.WordleJSONEncoder))
+        self.assertEqual(restored.participants, [111, 2 ** 63 + 3])
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,338 @@
+import asyncio
+import itertools
+import os
+import tempfile
+import unittest
+import warnings
+from pathlib import Path
+import discord
+import wordle
+from render_pool import MODE_INLINE, RenderExecutor, RenderQueueFull
+from image_cache import EncodedImageCache
+from metrics import Metrics, NullMetrics
+from solver import FeedbackMatrix, Solver
+from storage.sync_adapter import as_async_storage
+from storage.write_behind import WriteBehindStorage
+from test_storage import DictStorage
+
+warnings.simplefilter("ignore", DeprecationWarning)  # Pillow warns about textsize on every call
+
+_message_ids = itertools.count(1000)
+
+
+class FakeResponse:
+    def __init__(self):
+        self.deferred = False
+        self.sent = []
+
+    async def defer(self, thinking=False, ephemeral=False):
+        self.deferred = True
+
+    async def send_message(self, content=None, ephemeral=False):
+        self.sent.append(content)
+
+
+class FakeFollowup:
+    def __init__(self, channel, delay=0.0):
+        self.channel = channel
+        self.delay = delay
+        self.sent = []
+
+    async def send(self, content=None, file=None, wait=False, ephemeral=False, allowed_mentions=None):
+        await asyncio.sleep(self.delay)
+        if content is not None:
+            self.sent.append(content)
+        message_id = next(_message_ids)
+        self.channel.messages.add(message_id)
+        return FakePartialMessage(self.channel, message_id)
+
+
+class FakePartialMessage:
+    def __init__(self, channel, message_id):
+        self.channel = channel
+        self.id = message_id
+
+    async def delete(self):
+        await asyncio.sleep(self.channel.delay)
+        if self.id not in self.channel.messages:
+            raise discord.NotFound(FakeHttpResponse(404), "Unknown Message")
+        self.channel.messages.discard(self.id)
+
+
+class FakeHttpResponse:
+    def __init__(self, status):
+        self.status = status
+        self.reason = "Not Found"
+
+
+class FakeChannel:
+    def __init__(self, channel_id, delay=0.0, guild_id=None):
+        self.id = channel_id
+        self.guild_id = guild_id
+        self.delay = delay
+        self.messages = set()
+
+    def get_partial_message(self, message_id):
+        return FakePartialMessage(self, message_id)
+
+
+class FakeBot:
+    def __init__(self, shard_id=None, shard_count=None):
+        self.shard_id = shard_id
+        self.shard_count = shard_count
+
+    async def wait_until_ready(self):
+        pass
+
+
+class FakeUser:
+    def __init__(self, name, user_id=1):
+        self.id = user_id
+        self.name = name
+        self.nick = None
+
+
+class FakeInteraction:
+    def __init__(self, channel, user="Player", delay=0.0, user_id=1, administrator=False):
+        self.channel = channel
+        self.permissions = discord.Permissions(administrator=administrator)
+        self.channel_id = channel.id
+        self.guild_id = channel.guild_id
+        self.user = FakeUser(user, user_id)
+        self.response = FakeResponse()
+        self.followup = FakeFollowup(channel, delay)
+        self.cleared = False
+
+    async def delete_original_response(self):
+        self.cleared = True
+
+
+class TestWordleDiscordHandler(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.storage = DictStorage()
+        self.handler = wordle.WordleDiscordHandler(None, self.storage,
+                                                   render_executor=RenderExecutor(mode=MODE_INLINE),
+                                                   image_cache=EncodedImageCache(),
+                                                   metrics=NullMetrics())
+
+    async def guess(self, ctx, guess):
+        await self.handler._guess.callback(self.handler, ctx, guess)
+
+    async def test_guess_posts_board_and_saves(self):
+        channel = FakeChannel(1)
+        ctx = FakeInteraction(channel)
+        await self.guess(ctx, "crane")
+        self.assertTrue(ctx.response.deferred)
+        self.assertEqual(len(channel.messages), 1)
+        saved = wordle.decode_game_state(self.storage.game_states[(wordle.DB_GAME_NAME, 1)])
+        self.assertEqual(saved.game_board_message_id, next(iter(channel.messages)))
+        self.assertEqual(saved.guess_count, 1)
+
+    async def test_prior_board_replaced(self):
+        channel = FakeChannel(1)
+        await self.guess(FakeInteraction(channel), "crane")
+        first = set(channel.messages)
+        await self.guess(FakeInteraction(channel), "slate")
+        self.assertEqual(len(channel.messages), 1)
+        self.assertTrue(first.isdisjoint(channel.messages))
+
+    async def test_unreadable_stored_game_starts_a_new_one(self):
+        truncated = wordle.GAME_STATE_MAGIC + bytes([wordle.GAME_STATE_VERSION, 0, 1, 6, 5])
+        for channel_id, blob in ((1, truncated), (2, b"{not json")):
+            self.storage.save_game_state(wordle.DB_GAME_NAME, channel_id, blob)
+            ctx = FakeInteraction(FakeChannel(channel_id))
+            with self.assertLogs(wordle.logger, "ERROR"):
+                await self.guess(ctx, "crane")
+            self.assertEqual(len(ctx.channel.messages), 1)
+            saved = wordle.decode_game_state(self.storage.game_states[(wordle.DB_GAME_NAME, channel_id)])
+            self.assertEqual(saved.guess_count, 1)
+
+    async def test_missing_prior_board_still_saves(self):
+        self.handler._metrics = Metrics()
+        channel = FakeChannel(1)
+        await self.guess(FakeInteraction(channel), "crane")
+        channel.messages.clear()  # someone deleted the board by hand
+        await self.guess(FakeInteraction(channel), "slate")
+        self.assertNotIn("wordle_stage_errors_total", self.handler._metrics.counters)
+        saved = wordle.decode_game_state(self.storage.game_states[(wordle.DB_GAME_NAME, 1)])
+        self.assertEqual(saved.guess_count, 2)
+        self.assertEqual(len(channel.messages), 1)
+
+    async def test_prior_board_deleted_after_post(self):
+        channel = FakeChannel(1, delay=0.05)
+        await self.guess(FakeInteraction(channel, delay=0.05), "crane")
+        first = set(channel.messages)
+        posted = []
+        ctx = FakeInteraction(channel, delay=0.05)
+        send = ctx.followup.send
+
+        async def send_while_prior_board_is_up(*args, **kwargs):
+            message = await send(*args, **kwargs)
+            posted.append(first <= channel.messages)
+            return message
+
+        ctx.followup.send = send_while_prior_board_is_up
+        await self.guess(ctx, "slate")
+        self.assertEqual(posted, [True])
+        self.assertTrue(first.isdisjoint(channel.messages))
+
+    async def test_full_render_queue_keeps_prior_board(self):
+        channel = FakeChannel(1)
+        await self.guess(FakeInteraction(channel), "crane")
+        first = set(channel.messages)
+
+        async def full(*args):
+            raise RenderQueueFull("no room")
+
+        self.handler._render_executor.run = full
+        ctx = FakeInteraction(channel)
+        await self.guess(ctx, "slate")
+        self.assertLessEqual(first, channel.messages)
+        self.assertIn("recorded", ctx.followup.sent[-1])
+        saved = wordle.decode_game_state(self.storage.game_states[(wordle.DB_GAME_NAME, 1)])
+        self.assertEqual(saved.guess_count, 2)
+        self.assertEqual({saved.game_board_message_id}, first)
+
+    async def test_piled_up_guesses_post_latest_board(self):
+        channel = FakeChannel(1, delay=0.02)
+        await self.guess(FakeInteraction(channel, delay=0.02), "crane")
+        contexts = [FakeInteraction(channel, delay=0.02) for _ in range(3)]
+        await asyncio.gather(*(self.guess(ctx, guess) for ctx, guess in zip(contexts, ["slate", "pious", "moldy"])))
+        saved = wordle.decode_game_state(self.storage.game_states[(wordle.DB_GAME_NAME, 1)])
+        self.assertEqual(saved.guess_count, 4)
+        self.assertEqual([letter for letter, _ in saved.board.rows()[3]], list("moldy"))
+        self.assertEqual(len(channel.messages), 1)
+        # all three arrived before any of them went out, so only the last was posted
+        self.assertEqual([ctx.cleared for ctx in contexts], [True, True, False])
+        self.assertEqual(self.handler._outbound.counters["superseded"], 2)
+
+    async def test_simultaneous_first_guesses_share_a_game(self):
+        channel = FakeChannel(1)
+        await asyncio.gather(*(self.guess(FakeInteraction(channel), guess) for guess in ["crane", "slate", "pious"]))
+        saved = wordle.decode_game_state(self.storage.game_states[(wordle.DB_GAME_NAME, 1)])
+        self.assertEqual(saved.guess_count, 3)
+        self.assertEqual(["".join(letter for letter, _ in row) for row in saved.board.rows()[:3]],
+                         ["crane", "slate", "pious"])
+        self.assertEqual(len(self.handler._channel_locks), 0)
+
+    async def test_restore_skips_finished_games(self):
+        playing = wordle.WordleGame()
+        playing.submit_guess("crane", "Player")
+        finished = wordle.WordleGame()
+        finished.game_state.is_over = True
+        self.storage.save_game_state(wordle.DB_GAME_NAME, 1, wordle.encode_game_state(playing.game_state))
+        self.storage.save_game_state(wordle.DB_GAME_NAME, 2, wordle.encode_game_state(finished.game_state))
+
+        await self.handler.cog_load()
+        await self.handler._restore_task
+        self.assertIn(1, self.handler._active_games)
+        self.assertNotIn(2, self.handler._active_games)
+        await self.handler.cog_unload()
+
+    async def test_shutdown_snapshot_restores_games(self):
+        game = wordle.WordleGame()
+        game.submit_guess("crane", "Player")
+        with tempfile.TemporaryDirectory() as directory:
+            self.handler._snapshot_path = os.path.join(directory, "snapshot.bin")
+            await self.handler.cog_load()
+            await self.handler._active_games.put(1, game)
+            await self.handler.cog_unload()
+
+            handler = wordle.WordleDiscordHandler(None, None, render_executor=RenderExecutor(mode=MODE_INLINE),
+                                                  image_cache=EncodedImageCache(), metrics=NullMetrics())
+            handler._warm_start = wordle._open_warm_start(self.handler._snapshot_path)
+            await handler.cog_load()
+            await handler._restore_task
+            # used up, so a crash before the next clean shutdown can't restore the same games over newer ones
+            self.assertFalse(os.path.exists(self.handler._snapshot_path))
+        restored = await handler._active_games.get(1)
+        self.assertEqual(restored.game_state.solution, game.game_state.solution)
+        self.assertEqual(restored.game_state.guess_count, 1)
+        await handler.cog_unload()
+
+    async def test_snapshot_from_other_shards_is_left_for_them(self):
+        game = wordle.WordleGame()
+        game.submit_guess("crane", "Player")
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "snapshot.bin")
+            wordle.write_warm_start(path, [(1, game)], wordle.ShardConfig([1], 2))
+            handler = wordle.WordleDiscordHandler(FakeBot(shard_id=0, shard_count=2), None,
+                                                  render_executor=RenderExecutor(mode=MODE_INLINE),
+                                                  image_cache=EncodedImageCache(), metrics=NullMetrics())
+            handler._warm_start = wordle._open_warm_start(path)
+            await handler.cog_load()
+            self.assertTrue(os.path.exists(path))  # shard 1 still needs it
+            self.assertNotIn(1, handler._active_games)
+            await handler.cog_unload()
+
+    async def test_profile_is_admin_only(self):
+        channel = FakeChannel(1)
+        ctx = FakeInteraction(channel)
+        await self.handler._profile.callback(self.handler, ctx, "start")
+        self.assertFalse(self.handler._profiler.capturing)
+        self.assertIn("Only server admins", ctx.response.sent[0])
+
+        with tempfile.TemporaryDirectory() as directory:
+            self.handler._profiler.directory = Path(directory)
+            self.handler._profiler.sample_rate = 1.0
+            self.handler._profiler.slow_seconds = 0
+            ctx = FakeInteraction(channel, administrator=True)
+            await self.handler._profile.callback(self.handler, ctx, "start")
+            self.assertTrue(self.handler._profiler.capturing)
+            await self.guess(FakeInteraction(channel), "crane")
+            ctx = FakeInteraction(channel, administrator=True)
+            await self.handler._profile.callback(self.handler, ctx, "report")
+            self.assertIn("Profiled 1, slow 1, saved 1", ctx.followup.sent[0])
+            await self.handler._profile.callback(self.handler, FakeInteraction(channel, administrator=True), "stop")
+            self.assertFalse(self.handler._profiler.capturing)
+
+    async def test_write_behind_counters_are_published(self):
+        metrics = Metrics()
+        wordle.WordleDiscordHandler(None, WriteBehindStorage(as_async_storage(DictStorage())),
+                                    render_executor=RenderExecutor(mode=MODE_INLINE),
+                                    image_cache=EncodedImageCache(), metrics=metrics)
+        self.assertEqual(len(metrics.gauges["wordle_storage_writes"]), 5)
+
+    async def test_hint_narrows_to_the_solution(self):
+        self.handler = wordle.WordleDiscordHandler(None, self.storage,
+                                                   render_executor=RenderExecutor(mode=MODE_INLINE),
+                                                   image_cache=EncodedImageCache(),
+                                                   metrics=NullMetrics(),
+                                                   solver=Solver(FeedbackMatrix.build(["crane", "slate", "moldy"],
+                                                                                      ["slate", "moldy"])))
+        channel = FakeChannel(1)
+        ctx = FakeInteraction(channel)
+        await self.handler._hint.callback(self.handler, ctx)
+        self.assertIn("no game", ctx.followup.sent[0])
+
+        game = wordle.WordleGame()
+        game.game_state.solution = "moldy"
+        game.submit_guess("crane", "Player")
+        await self.handler._active_games.put(1, game)
+        ctx = FakeInteraction(channel)
+        await self.handler._hint.callback(self.handler, ctx)
+        self.assertEqual(ctx.followup.sent, ["Only one word fits: ||moldy||"])
+
+    async def test_finished_game_counts_towards_stats(self):
+        channel = FakeChannel(1, guild_id=10)
+        game = wordle.WordleGame()
+        game.game_state.solution = "moldy"
+        await self.handler._active_games.put(1, game)
+        await self.guess(FakeInteraction(channel, user="One", user_id=5), "crane")
+        await self.guess(FakeInteraction(channel, user="Two", user_id=6), "moldy")
+
+        ctx = FakeInteraction(channel, user="Two", user_id=6)
+        await self.handler._show_stats.callback(self.handler, ctx)
+        self.assertTrue(ctx.followup.sent[0].startswith("**Two**\nPlayed 1 | Won 1 (100%) | Streak 1"))
+        ctx = FakeInteraction(channel)
+        await self.handler._show_stats.callback(self.handler, ctx, FakeUser("One", 5))
+        self.assertIn("Won 0 (0%)", ctx.followup.sent[0])
+        ctx = FakeInteraction(channel)
+        await self.handler._show_leaderboard.callback(self.handler, ctx)
+        self.assertEqual(ctx.followup.sent[0].splitlines()[1:], ["1. <@6> 1 wins of 1, best streak 1",
+                                                                 "2. <@5> 0 wins of 1, best streak 0"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+import bisect
+import random
+
+
+class WordIndex:
+    """
+    A set of words bucketed by length.  Membership checks are hashed, and each bucket also keeps a sorted list so that
+    prefix queries and random picks don't need to scan the whole index.
+    """
+
+    WILDCARDS = ('_', '?', '.')
+
+    def __init__(self, words=()):
+        self._buckets = {}  # map of word length -> set of words
+        self._sorted = {}  # map of word length -> sorted list of words, rebuilt lazily after an add
+        self.add_all(words)
+
+    def __contains__(self, word):
+        return self.contains(word)
+
+    def __len__(self):
+        return sum(len(bucket) for bucket in self._buckets.values())
+
+    def __iter__(self):
+        for length in sorted(self._buckets):
+            yield from self._sorted_bucket(length)
+
+    @classmethod
+    def from_files(cls, *paths):
+        """
+        Build an index from one or more files containing one word per line
+        :param paths: the files to read
+        :return: the new WordIndex instance
+        """
+        index = cls()
+        for path in paths:
+            with open(path, "r") as word_file:
+                index.add_all(word_file.read().splitlines())
+        return index
+
+    @classmethod
+    def from_sorted(cls, words):
+        """
+        Build an index from words that are already lowercase, unique, and sorted within each length, as iterating over
+        an index gives them, without checking or sorting them again
+        :param words: the words, in order
+        :return: the new WordIndex instance
+        """
+        index = cls()
+        for word in words:
+            bucket = index._sorted.get(len(word))
+            if bucket is None:
+                bucket = index._sorted[len(word)] = []
+            bucket.append(word)
+        index._buckets = {length: set(bucket) for length, bucket in index._sorted.items()}
+        return index
+
+    def add(self, word):
+        word = word.lower()
+        bucket = self._buckets.setdefault(len(word), set())
+        if word not in bucket:
+            bucket.add(word)
+            self._sorted.pop(len(word), None)
+
+    def add_all(self, words):
+        for word in words:
+            if word:
+                self.add(word)
+
+    def contains(self, word):
+        """
+        Check if the word is in the index.  The check is case-insensitive.
+        :param word: the string to look up
+        :return: boolean - True if the word is present
+        """
+        bucket = self._buckets.get(len(word))
+        return bucket is not None and word.lower() in bucket
+
+    def lengths(self):
+        return sorted(self._buckets)
+
+    def words_of_length(self, length):
+        """
+        :param length: the word length to return
+        :return: a sorted list of all words of that length.  Callers must not modify it.
+        """
+        return self._sorted_bucket(length)
+
+    def random_word(self, length):
+        """
+        Pick a random word of the given length
+        :param length: the word length to pick from
+        :return: a string value of the chosen word, or None if there are no words of that length
+        """
+        bucket = self._sorted_bucket(length)
+        if not bucket:
+            return None
+        return random.choice(bucket)
+
+    def with_prefix(self, prefix, length=None):
+        """
+        Find all words that start with the prefix
+        :param prefix: the leading characters to match
+        :param length: optionally restrict the results to words of this length
+        :return: a sorted list of matching words
+        """
+        prefix = prefix.lower()
+        lengths = [length] if length is not None else self.lengths()
+        results = []
+        for word_length in lengths:
+            if word_length < len(prefix):
+                continue
+            bucket = self._sorted_bucket(word_length)
+            start = bisect.bisect_left(bucket, prefix)
+            end = bisect.bisect_left(bucket, prefix + '\U0010ffff')
+            results.extend(bucket[start:end])
+        return results
+
+    def matching(self, pattern):
+        """
+        Find all words that fit a pattern, where '_', '?' or '.' match any single letter, e.g. "cr_ne"
+        :param pattern: the pattern to match, only words of the same length can match
+        :return: a sorted list of matching words
+        """
+        pattern = pattern.lower()
+        fixed = [(position, letter) for position, letter in enumerate(pattern) if letter not in self.WILDCARDS]
+
+        # Narrow down using the leading fixed letters first, so we only test the remaining positions
+        prefix = ""
+        for letter in pattern:
+            if letter in self.WILDCARDS:
+                break
+            prefix += letter
+        candidates = self.with_prefix(prefix, len(pattern))
+        fixed = fixed[len(prefix):]
+        return [word for word in candidates if all(word[position] == letter for position, letter in fixed)]
+
+    def _sorted_bucket(self, length):
+        bucket = self._sorted.get(length)
+        if bucket is None:
+            bucket = sorted(self._buckets.get(length, ()))
+            self._sorted[length] = bucket
+        return bucket
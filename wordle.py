@@ -1,12 +1,36 @@
+import asyncio
+import functools
 import io
+from array import array
 import json
 import logging
-import random
+import os
+import struct
+import time
+from typing import Literal
 import discord
-from PIL import Image, ImageDraw, ImageFont
+import feedback
+from PIL import ImageFont
 from pathlib import Path
 from discord.ext.commands import Bot, Cog
-import storage.base_storage
+import storage.async_base_storage
+from storage.game_state_header import (FLAG_CHANNEL_ID, FLAG_GUILD_ID, FLAG_IS_OVER, FLAG_MESSAGE_ID,
+                                       FLAG_PARTICIPANTS, FLAG_WIDE_COLORS, GAME_STATE_MAGIC, STATE_HEADER)
+from storage.sync_adapter import as_async_storage
+from storage.write_behind import WriteBehindStorage
+from board_renderer import BoardRenderer
+from game_cache import GameCache
+from image_cache import EncodedImageCache, board_key
+from keyed_lock import KeyedLock
+from metrics import Metrics
+from outbound import OutboundScheduler
+from profiler import CommandProfiler
+from render_pool import RenderExecutor, RenderQueueFull
+from sharding import ShardConfig
+from snapshot import Snapshot, StartupTimer, write_snapshot
+from solver import Solver
+from stats import GuildStats, PlayerStats, StatsTracker
+from word_index import WordIndex
 
 logger = logging.getLogger(__name__)
 
@@ -20,6 +44,27 @@ YELLOW = "#c9b458"
 BLACK = "#000000"
 RED = "#cc6666"
 WHITE = "#ffffff"
+EMPTY = "#333"  # a dark gray, for tiles that haven't been guessed yet
+
+# Boards store a one byte code per tile color.  Any color not listed here is given the next free code when first seen.
+_colors_by_code = [EMPTY, GRAY, GREEN, YELLOW, RED]
+_codes_by_color = {color: code for code, color in enumerate(_colors_by_code)}
+
+
+# feedback values from the feedback module, and the tile colors that show them
+_colors_by_feedback = {feedback.GRAY: GRAY, feedback.YELLOW: YELLOW, feedback.GREEN: GREEN}
+_feedback_by_color = {color: value for value, color in _colors_by_feedback.items()}
+
+
+def _color_code(color):
+    code = _codes_by_color.get(color)
+    if code is None:
+        if len(_colors_by_code) > 255:
+            raise ValueError(f"Too many distinct tile colors to store {color}")
+        code = len(_colors_by_code)
+        _colors_by_code.append(color)
+        _codes_by_color[color] = code
+    return code
 
 # Declaring these globally in case we ever want a variation
 NUMBER_OF_GUESSES = 6
@@ -29,46 +74,150 @@ NUMBER_OF_LETTERS = 5
 source_path = Path(__file__).resolve()
 source_dir = source_path.parent
 
-tile_font = ImageFont.truetype(f"{source_dir}/fonts/Roboto-Regular.ttf", 40)
-message_font = ImageFont.truetype(f"{source_dir}/fonts/Roboto-Regular.ttf", 35)
+FONT_PATH = f"{source_dir}/fonts/Roboto-Regular.ttf"
+BOARD_IMAGE_VERSION = 1  # bump whenever a change to the renderer alters how a board looks
+JPEG_QUALITY = 75
+# the files a snapshot is built from, it is only used while none of them have changed
+SNAPSHOT_SOURCES = ("data/words.txt", "data/dictionary.txt", "fonts/Roboto-Regular.ttf")
+
+# each phase of starting up is timed, and the breakdown is logged once the bot is ready
+startup = StartupTimer()
+
+
+def _source_fingerprint():
+    fingerprint = {}
+    for name in SNAPSHOT_SOURCES:
+        stat = os.stat(source_dir / name)
+        fingerprint[name] = [stat.st_size, stat.st_mtime_ns]
+    return fingerprint
+
+
+def _snapshot_layout():
+    return {"sources": _source_fingerprint(), "rows": NUMBER_OF_GUESSES, "cols": NUMBER_OF_LETTERS}
+
+
+def _open_warm_start(path):
+    """
+    Read the snapshot at path, if there is one and it was written from the same word lists, fonts and game layout
+    :param path: the snapshot file, or None
+    :return: a dict of its meta, words, dictionary, sprites and games sections, copied out, or None
+    """
+    snapshot = Snapshot.open(path)
+    if snapshot is None:
+        return None
+    try:
+        meta = json.loads(bytes(snapshot.section("meta") or b"{}"))
+        if meta.get("layout") != _snapshot_layout():
+            logger.info(f"Snapshot {path} is out of date, starting without it")
+            return None
+        sections = {name: bytes(snapshot.section(name) or b"") for name in ("words", "dictionary", "sprites", "games")}
+        sections["meta"] = meta
+        sections["path"] = path
+        return sections
+    except (ValueError, OSError) as e:
+        logger.warning(f"Ignoring snapshot {path}: {e}")
+        return None
+    finally:
+        snapshot.close()
+
+
+def _load_word_lists(warm_start):
+    if warm_start and warm_start["words"] and warm_start["dictionary"]:
+        return (WordIndex.from_sorted(warm_start["words"].decode().split("\n")),
+                WordIndex.from_sorted(warm_start["dictionary"].decode().split("\n")))
+    return (WordIndex.from_files(f"{source_dir}/data/words.txt"),
+            WordIndex.from_files(f"{source_dir}/data/dictionary.txt", f"{source_dir}/data/words.txt"))
+
+
+with startup.phase("snapshot"):
+    warm_start = _open_warm_start(os.getenv("SNAPSHOT_PATH"))
+
+# fonts are loaded the first time a tile has to be drawn, which a snapshot's sprites put off until a new letter is
+board_renderer = BoardRenderer(functools.partial(ImageFont.truetype, FONT_PATH, 40),
+                               functools.partial(ImageFont.truetype, FONT_PATH, 35),
+                               rows=NUMBER_OF_GUESSES, cols=NUMBER_OF_LETTERS,
+                               max_canvases=int(os.getenv("BOARD_CANVAS_CACHE_SIZE") or 32))
+# part of every image cache key, so cached images are only reused while the boards would come out the same
+BOARD_IMAGE_VARIANT = (f"v{BOARD_IMAGE_VERSION}:{board_renderer.pixel_width}x{board_renderer.pixel_height}:"
+                       f"{board_renderer.block_size}:q{JPEG_QUALITY}:font{os.path.getsize(FONT_PATH)}")
+if warm_start and warm_start["sprites"]:
+    with startup.phase("sprites"):
+        try:
+            board_renderer.import_sprites(warm_start["sprites"])
+        except (ValueError, struct.error) as e:
+            logger.warning(f"Ignoring the snapshot's sprites: {e}")
 
-dictionary = []
-with open(f"{source_dir}/data/dictionary.txt", "r") as dictionary_file:
-    dictionary.extend(dictionary_file.read().splitlines())
+with startup.phase("word lists"):
+    # words are possible solutions, and the dictionary is every word accepted as a guess (which includes words)
+    words, dictionary = _load_word_lists(warm_start)
 
-words = []
-with open(f"{source_dir}/data/words.txt", "r") as word_file:
-    words.extend(word_file.read().splitlines())
-    dictionary.extend(words)
+
+def encode_board(rows, message, key=None):
+    """
+    Render a board and encode it as a JPEG.  This is the unit of work handed to the RenderExecutor, so it only takes
+    plain values that are cheap to send to another process.
+    :param rows: the (letter, color) rows from WordleGame.snapshot
+    :param message: the message to show under the board
+    :param key: identifies the game, so the renderer can reuse its base image
+    :return: the encoded image bytes
+    """
+    image = board_renderer.render(rows, message, key=key)
+    arr = io.BytesIO()  # makes an in-memory array behave like a file when it's not actually a file
+    image.save(arr, format="JPEG", quality=JPEG_QUALITY)  # saves image in-memory
+    return arr.getvalue()
 
 
 class WordleTile:
     """
-    Represents a single tile, with a color and a letter.
+    Represents a single tile, with a color and a letter.  Tiles don't hold any state themselves, they are a view onto
+    one position of the WordleBoard that created them, so setting a value updates the board.
     """
+    __slots__ = ('_board', '_index')
 
-    def __init__(self):
-        self.color = "#333"  # default of a dark gray
-        self.letter = ' '  # default to a space just so the rendering functions doesn't fail
-        self.font_color = "#000000"
+    def __init__(self, board, index):
+        self._board = board
+        self._index = index
 
     def __str__(self):
         return f"{self.letter} {self.color}"
 
+    @property
+    def letter(self):
+        return chr(self._board._letters[self._index])
+
+    @letter.setter
+    def letter(self, letter):
+        self._board._letters[self._index] = ord(letter)
+
+    @property
+    def color(self):
+        return _colors_by_code[self._board._colors[self._index]]
+
+    @color.setter
+    def color(self, color):
+        self._board._colors[self._index] = _color_code(color)
+
+    @property
+    def font_color(self):
+        return BLACK
+
     def from_dict(self, tile):
-        self.color = tile.get('color')
-        self.letter = tile.get('letter')
-        self.font_color = tile.get('font_color')
+        self.color = tile.get('color') or EMPTY
+        self.letter = tile.get('letter') or ' '
 
 
 class WordleBoard:
     """
-    Represents an entire board, made of a multidimensional array of WordleTile instances
+    Represents an entire board.  The letters and colors are kept in two flat fixed size arrays, one slot per tile in
+    row order, rather than as a tile object per position.
     """
+    __slots__ = ('row_count', 'col_count', '_letters', '_colors')
 
     def __init__(self):
-        self.board = []
-        self._init_board(NUMBER_OF_GUESSES, NUMBER_OF_LETTERS)
+        self.row_count = NUMBER_OF_GUESSES
+        self.col_count = NUMBER_OF_LETTERS
+        self._letters = array('I', [ord(' ')]) * (self.row_count * self.col_count)  # unicode code point per tile
+        self._colors = bytearray(self.row_count * self.col_count)  # color code per tile, 0 is the empty color
 
     def __str__(self):
         result = ""
@@ -78,23 +227,34 @@ class WordleBoard:
             result += "\n"
         return result
 
-    def _init_board(self, row_count, col_count):
-        for y in range(0, row_count):
-            self.board.append([])
-            for x in range(0, col_count):
-                self.board[y].append(WordleTile())
+    @property
+    def board(self):
+        """
+        :return: a multidimensional list of WordleTile views, indexed by row then column
+        """
+        return [[WordleTile(self, (row * self.col_count) + col) for col in range(0, self.col_count)]
+                for row in range(0, self.row_count)]
 
     def get_tile(self, row, col):
-        return self.board[row][col]
+        return WordleTile(self, (row * self.col_count) + col)
 
     def set_tile(self, row, col, color, letter):
-        self.board[row][col].color = color
-        self.board[row][col].letter = letter
+        index = (row * self.col_count) + col
+        self._colors[index] = _color_code(color)
+        self._letters[index] = ord(letter)
+
+    def rows(self):
+        """
+        :return: a tuple of rows, each a tuple of (letter, color) for every tile, as used by the renderer
+        """
+        tiles = [(chr(letter), _colors_by_code[color]) for letter, color in zip(self._letters, self._colors)]
+        return tuple(tuple(tiles[start:start + self.col_count]) for start in range(0, len(tiles), self.col_count))
 
     def from_dict(self, board):
         for y in range(0, len(board)):
             for x in range(0, len(board[y])):
-                self.board[y][x].from_dict(board[y][x])
+                tile = board[y][x]
+                self.set_tile(y, x, tile.get('color') or EMPTY, tile.get('letter') or ' ')
 
 
 class WordleGameState:
@@ -102,14 +262,18 @@ class WordleGameState:
     Maintain the attributes needed to represent the current state of the board, so that it may be persisted and
     restored as needed.
     """
+    __slots__ = ('game_board_message_id', 'guess_count', 'solution', 'channel_id', 'guild_id', 'is_over', 'board',
+                 'participants')
 
     def __init__(self):
         self.game_board_message_id = None  # the Discord message the correlates to our game board
         self.guess_count = 0
         self.solution = None
         self.channel_id = None
+        self.guild_id = None  # the server the channel is in, which decides the shard that owns the game
         self.is_over = False
         self.board = WordleBoard()
+        self.participants = []  # user ids of everyone who has made a guess, so their stats count the game
 
     def __str__(self):
         return f"solution: {self.solution}\nboard:\n{self.board}"
@@ -119,8 +283,10 @@ class WordleGameState:
         self.guess_count = game_state.get('guess_count')
         self.solution = game_state.get('solution')
         self.channel_id = game_state.get('channel_id')
+        self.guild_id = game_state.get('guild_id')
         self.is_over = game_state.get('is_over')
         self.board.from_dict(game_state.get('board'))
+        self.participants = list(game_state.get('participants') or [])
 
 
 class WordleJSONEncoder(json.JSONEncoder):
@@ -134,8 +300,10 @@ class WordleJSONEncoder(json.JSONEncoder):
                     "game_board_message_id": obj.game_board_message_id,
                     "guess_count": obj.guess_count,
                     "solution": obj.solution,
+                    "guild_id": obj.guild_id,
                     "is_over": obj.is_over,
-                    "board": obj.board}
+                    "board": obj.board,
+                    "participants": obj.participants}
         elif isinstance(obj, WordleBoard):
             return obj.board
         elif isinstance(obj, WordleTile):
@@ -146,6 +314,144 @@ class WordleJSONEncoder(json.JSONEncoder):
             return json.JSONEncoder.default(self, obj)
 
 
+# Binary game state layout, see encode_game_state.  Bump the version whenever the layout changes, and keep decoding the
+# older versions so that saved games still load.
+# The header and flags are in storage.game_state_header, which storage also reads its columns from.
+GAME_STATE_VERSION = 3  # 2 added the guild id, 3 added the participants
+_STANDARD_COLOR_COUNT = 5  # EMPTY, GRAY, GREEN, YELLOW and RED have the same code in every process
+
+
+def encode_game_state(game_state):
+    """
+    Serialize a WordleGameState into a compact binary form.  After a fixed header (magic, version, flags, guess count,
+    rows and cols) come the optional message, channel and guild ids, the solution, a table of any non-standard colors, a
+    color code per tile packed two to a byte, the tile letters as UTF-8, and any participants' user ids.
+    :param game_state: the WordleGameState to serialize
+    :return: the encoded bytes
+    """
+    board = game_state.board
+    flags = 0
+    if game_state.is_over:
+        flags |= FLAG_IS_OVER
+    if game_state.game_board_message_id is not None:
+        flags |= FLAG_MESSAGE_ID
+    if game_state.channel_id is not None:
+        flags |= FLAG_CHANNEL_ID
+    if game_state.guild_id is not None:
+        flags |= FLAG_GUILD_ID
+    if game_state.participants:
+        flags |= FLAG_PARTICIPANTS
+
+    # Colors beyond the standard ones only have a process local code, so store those in a table in the blob itself
+    extra_colors = []
+    codes = board._colors
+    if max(codes) >= _STANDARD_COLOR_COUNT:
+        codes = bytearray(codes)
+        for index, code in enumerate(codes):
+            if code >= _STANDARD_COLOR_COUNT:
+                color = _colors_by_code[code]
+                if color not in extra_colors:
+                    extra_colors.append(color)
+                codes[index] = _STANDARD_COLOR_COUNT + extra_colors.index(color)
+    if _STANDARD_COLOR_COUNT + len(extra_colors) > 16:
+        flags |= FLAG_WIDE_COLORS
+
+    parts = [STATE_HEADER.pack(GAME_STATE_MAGIC, GAME_STATE_VERSION, flags, game_state.guess_count,
+                                board.row_count, board.col_count)]
+    if flags & FLAG_MESSAGE_ID:
+        parts.append(struct.pack('>Q', game_state.game_board_message_id))
+    if flags & FLAG_CHANNEL_ID:
+        parts.append(struct.pack('>q', game_state.channel_id))
+    if flags & FLAG_GUILD_ID:
+        parts.append(struct.pack('>Q', game_state.guild_id))
+    solution = (game_state.solution or "").encode()
+    parts.append(struct.pack('>B', len(solution)))
+    parts.append(solution)
+    parts.append(struct.pack('>B', len(extra_colors)))
+    for color in extra_colors:
+        color = color.encode()
+        parts.append(struct.pack('>B', len(color)))
+        parts.append(color)
+    if flags & FLAG_WIDE_COLORS:
+        parts.append(bytes(codes))
+    else:
+        padded = bytes(codes) + b'\x00'
+        parts.append(bytes((padded[index] << 4) | padded[index + 1] for index in range(0, len(codes), 2)))
+    letters = "".join(map(chr, board._letters)).encode()
+    parts.append(struct.pack('>H', len(letters)))
+    parts.append(letters)
+    if flags & FLAG_PARTICIPANTS:
+        parts.append(struct.pack(f'>H{len(game_state.participants)}Q', len(game_state.participants),
+                                 *game_state.participants))
+    return b"".join(parts)
+
+
+def decode_game_state(blob):
+    """
+    Restore a WordleGameState from either the binary form written by encode_game_state, or the JSON written by
+    WordleJSONEncoder.
+    :param blob: bytes or str, as loaded from storage
+    :return: a new WordleGameState instance
+    """
+    game_state = WordleGameState()
+    if isinstance(blob, str) or bytes(blob[:2]) != GAME_STATE_MAGIC:
+        game_state.from_dict(json.loads(blob))
+        return game_state
+
+    blob = bytes(blob)
+    magic, version, flags, guess_count, row_count, col_count = STATE_HEADER.unpack_from(blob, 0)
+    if version > GAME_STATE_VERSION:
+        raise ValueError(f"Game state version {version} is newer than this code supports")
+    offset = STATE_HEADER.size
+    game_state.guess_count = guess_count
+    game_state.is_over = bool(flags & FLAG_IS_OVER)
+    if flags & FLAG_MESSAGE_ID:
+        game_state.game_board_message_id = struct.unpack_from('>Q', blob, offset)[0]
+        offset += 8
+    if flags & FLAG_CHANNEL_ID:
+        game_state.channel_id = struct.unpack_from('>q', blob, offset)[0]
+        offset += 8
+    if flags & FLAG_GUILD_ID:
+        game_state.guild_id = struct.unpack_from('>Q', blob, offset)[0]
+        offset += 8
+    length = blob[offset]
+    game_state.solution = blob[offset + 1:offset + 1 + length].decode() or None
+    offset += 1 + length
+
+    code_map = list(range(0, _STANDARD_COLOR_COUNT))
+    for _ in range(0, blob[offset]):
+        offset += 1
+        length = blob[offset]
+        code_map.append(_color_code(blob[offset + 1:offset + 1 + length].decode()))
+        offset += length
+    offset += 1
+
+    tile_count = row_count * col_count
+    if flags & FLAG_WIDE_COLORS:
+        codes = blob[offset:offset + tile_count]
+        offset += tile_count
+    else:
+        packed = blob[offset:offset + (tile_count + 1) // 2]
+        codes = bytearray()
+        for byte in packed:
+            codes.append(byte >> 4)
+            codes.append(byte & 0x0f)
+        offset += len(packed)
+    length = struct.unpack_from('>H', blob, offset)[0]
+    letters = blob[offset + 2:offset + 2 + length].decode()
+    offset += 2 + length
+    if flags & FLAG_PARTICIPANTS:
+        count = struct.unpack_from('>H', blob, offset)[0]
+        game_state.participants = list(struct.unpack_from(f'>{count}Q', blob, offset + 2))
+
+    board = game_state.board
+    board.row_count = row_count
+    board.col_count = col_count
+    board._colors = bytearray(code_map[code] for code in codes[:tile_count])
+    board._letters = array('I', map(ord, letters))
+    return game_state
+
+
 class WordleGame:
 
     def __init__(self):
@@ -157,6 +463,8 @@ class WordleGame:
         self.pixel_width = 400  # no point in going too big since Discord will scale it down anyway
         self.pixel_height = 550
         self.submitter = None
+        self.submitter_id = None
+        self.winner_id = None  # the user id that made the winning guess, once there is one
         self.current_message = ""
         self.game_state = WordleGameState()
         self._pick_random_word()
@@ -166,55 +474,21 @@ class WordleGame:
         From the words list, pick a random value and return it
         :return: a string value of the chosen word
         """
-        self.game_state.solution = words[random.randint(0, len(words))]
+        self.game_state.solution = words.random_word(self.col_count)
 
     def render(self):
         """
         Render an image file that represents the current state of the game board.
         :return: the Image instance
         """
-        board_padding = 20
-        cell_padding: int = 3
-        block_size = int((self.pixel_width - (board_padding * 2)) / 5)
-
-        image = Image.new("RGB", (self.pixel_width, self.pixel_height))
-        draw = ImageDraw.Draw(image)
-
-        # Draw all the individual tiles
-        for row in range(0, self.max_guesses):
-            for col in range(0, self.col_count):
-                block = self.game_state.board.get_tile(row, col)
-                x1 = board_padding + (col * block_size) + cell_padding
-                y1 = board_padding + (row * block_size) + cell_padding
-                x2 = x1 + block_size - cell_padding
-                y2 = y1 + block_size - cell_padding
-                draw.rounded_rectangle(xy=((x1, y1), (x2, y2)),
-                                       radius=4,
-                                       fill=block.color)
-                text_size = draw.textsize(text=block.letter.upper(), font=tile_font)
-
-                # center the letter in the tile
-                draw.text(xy=(x1 + (block_size - text_size[0]) / 2 - (cell_padding / 2),
-                              y1 + (block_size - text_size[1]) / 2 - cell_padding),
-                          text=block.letter.upper(),
-                          font=tile_font
-                          )
-
-        # Render an optional message at the bottom of the board.  This may be an error, or indicate the end of a game.
-        if self.current_message:
-            y1 = board_padding + (block_size * self.max_guesses) + (cell_padding * 4)
-            # If there are multiple lines, render each line horizontally centered
-            for message_line in self.current_message.splitlines():
-                text_size = draw.textsize(text=message_line, font=message_font)
-                x1 = (self.pixel_width - text_size[0]) / 2
-                if x1 < board_padding:
-                    x1 = board_padding
-                draw.text(xy=(x1,
-                              y1),
-                          text=message_line,
-                          font=message_font)
-                y1 += text_size[1] + (cell_padding * 2)
-        return image
+        return board_renderer.render(self.game_state.board.rows(), self.current_message, key=id(self))
+
+    def snapshot(self):
+        """
+        Capture just what is needed to render the board, so rendering can happen elsewhere while the game moves on.
+        :return: the arguments for encode_board
+        """
+        return self.game_state.board.rows(), self.current_message, id(self)
 
     def _check_valid_word(self, guess):
         """
@@ -232,7 +506,7 @@ class WordleGame:
             self.current_message = f"Word too short"
             return False
 
-        if guess.lower() not in dictionary:
+        if not dictionary.contains(guess):
             self.current_message = "Not in word list\nTry again"
             for x in range(0, len(guess)):
                 self.game_state.board.set_tile(row, x, RED, guess[x])
@@ -247,28 +521,8 @@ class WordleGame:
         :return: nothing
         """
         row = self.game_state.guess_count
-
-        # We want character lists of both the solution and guess so that we can modify the lists to remove characters
-        # that match while looping over them.
-        solution = list(self.game_state.solution)
-        guess = list(guess)  # shadow the passed param as a list so that we can modify it
-
-        # Find exact match tiles first, those will be green regardless of order, to handle cases where the user
-        # guesses multiples of the same letter, but only one matches, and it's not the first instance of that letter.
-        for x in range(0, len(guess)):
-            self.game_state.board.set_tile(row, x, GRAY, guess[x])  # default all tiles to gray
-            if guess[x] == solution[x]:
-                self.game_state.board.set_tile(row, x, GREEN, guess[x])  # exact match on letter and position
-                # The letters in solution and guess were used now, so clear them so that they don't end up getting used
-                # again in the partial match loop next.  Make them different so that the empty values can't match.
-                solution[x] = None
-                guess[x] = ' '
-
-        # second pass marks any letters remaining in the guess that weren't exact matches, but are partial matches
-        for x in range(0, len(guess)):
-            if guess[x] in solution:
-                self.game_state.board.set_tile(row, x, YELLOW, guess[x])  # letter matches, but not the position
-                solution[solution.index(guess[x])] = None
+        for x, color in enumerate(feedback.score_colors(guess, self.game_state.solution)):
+            self.game_state.board.set_tile(row, x, _colors_by_feedback[color], guess[x])
 
     def _check_winner(self, guess):
         """
@@ -279,6 +533,7 @@ class WordleGame:
         if guess == self.game_state.solution:
             self.current_message = f"{self.submitter}\nWins in {self.game_state.guess_count}!"
             self.game_state.is_over = True
+            self.winner_id = self.submitter_id
             return True
         else:
             return False
@@ -292,45 +547,444 @@ class WordleGame:
             self.current_message = "Better luck next time"
             self.game_state.is_over = True
 
-    def submit_guess(self, guess, submitter):
+    def feedback_history(self):
+        """
+        :return: a (guess, pattern code) tuple for each guess made so far, as the Solver takes them
+        """
+        history = []
+        for row in self.game_state.board.rows()[:self.game_state.guess_count]:
+            guess = "".join(letter for letter, _ in row).lower()
+            history.append((guess, feedback.pattern_code(_feedback_by_color[color] for _, color in row)))
+        return history
+
+    def submit_guess(self, guess, submitter, submitter_id=None):
         """
         Processes a word submission.  Resets some parts of the game state itself, and delegate to
         other methods to validate specific criteria and further update the game state as necessary.
         :param guess: the string the user submitted
         :param submitter: the Discord author object of the user that submitted the attempt
+        :param submitter_id: the user's id, so the game counts towards their stats
         :return: nothing
         """
         self.current_message = ""
         self.submitter = submitter
+        self.submitter_id = submitter_id
         if self._check_valid_word(guess):
+            if submitter_id is not None and submitter_id not in self.game_state.participants:
+                self.game_state.participants.append(submitter_id)
             self._match_letters(guess)
             self.game_state.guess_count += 1
             if not self._check_winner(guess):
                 self._check_max_guesses()
 
 
+def decode_games(rows):
+    """
+    Decode stored game states into games, skipping any that are over or can't be read.  Restores run this in an
+    executor, a batch at a time.
+    :param rows: dicts of channel_id and game_state, as storage returns them
+    :return: a list of (channel id, WordleGame)
+    """
+    games = []
+    for row in rows:
+        try:
+            game_state = decode_game_state(row["game_state"])
+        except Exception:
+            logger.exception(f"Failed to decode the stored game for channel {row['channel_id']}")
+            continue
+        if game_state.is_over:
+            continue
+        game = WordleGame()
+        game.game_state = game_state
+        games.append((row["channel_id"], game))
+    return games
+
+
+_snapshot_game = struct.Struct('>qI')  # channel id, game state length, followed by the encoded game state
+
+
+def pack_snapshot_games(games):
+    """
+    :param games: (channel id, WordleGame) for each game to keep
+    :return: the unfinished games' encoded states, packed for a snapshot
+    """
+    parts = []
+    for channel_id, game in games:
+        if game.game_state.is_over:
+            continue
+        game_state = encode_game_state(game.game_state)
+        parts.append(_snapshot_game.pack(channel_id, len(game_state)))
+        parts.append(game_state)
+    return b"".join(parts)
+
+
+def unpack_snapshot_games(data):
+    """
+    :param data: bytes from pack_snapshot_games
+    :return: a list of dicts of channel_id and game_state, as storage returns them, for decode_games
+    """
+    rows = []
+    offset = 0
+    while offset < len(data):
+        channel_id, length = _snapshot_game.unpack_from(data, offset)
+        offset += _snapshot_game.size
+        rows.append({"channel_id": channel_id, "game_state": bytes(data[offset:offset + length])})
+        offset += length
+    return rows
+
+
+def write_warm_start(path, games, shards: ShardConfig):
+    """
+    Write a snapshot of the word lists, the tile sprites drawn so far, and the unfinished games, so the next start can
+    skip reading and rebuilding them.  The handler runs this in an executor on shutdown.
+    :param path: the snapshot file
+    :param games: (channel id, WordleGame) for each game held in memory
+    :param shards: the shards the games belong to, a snapshot's games are only restored by the same shards
+    :return: the number of bytes written
+    """
+    meta = {"created": time.time(), "layout": _snapshot_layout(),
+            "shards": [list(shards.shard_ids), shards.shard_count]}
+    return write_snapshot(path, {"meta": json.dumps(meta).encode(),
+                                 "words": "\n".join(words).encode(),
+                                 "dictionary": "\n".join(dictionary).encode(),
+                                 "sprites": board_renderer.export_sprites(),
+                                 "games": pack_snapshot_games(games)})
+
+
+def hint_message(solver: Solver, history):
+    """
+    Work out the best next guess from the feedback so far.  Ranking guesses is CPU bound, so the handler runs this in
+    an executor.
+    :param solver: the Solver instance
+    :param history: the game's feedback_history
+    :return: the hint text for the player
+    """
+    columns = solver.candidates(history)
+    if len(columns) == 0:
+        return "No word in the list fits those clues"
+    if len(columns) == 1:
+        return f"Only one word fits: ||{solver.matrix.solutions[columns[0]]}||"
+    ranking = solver.rank_guesses(columns, limit=3)
+    best, expected = ranking[0]
+    message = f"{len(columns)} words still fit.  Try **{best}**, which leaves about {expected:.1f} of them on average"
+    if len(ranking) > 1:
+        message += f"\nAlso good: {', '.join(guess for guess, _ in ranking[1:])}"
+    return message
+
+
+def stats_message(name, stats: PlayerStats):
+    """
+    :param name: the player's display name
+    :param stats: their PlayerStats
+    :return: the text for /wordle_stats
+    """
+    if not stats.played:
+        return f"{name} hasn't finished a game here yet"
+    lines = [f"**{name}**",
+             f"Played {stats.played} | Won {stats.wins} ({stats.wins * 100 // stats.played}%) | "
+             f"Streak {stats.streak} | Best streak {stats.max_streak}"]
+    most = max(stats.distribution) or 1
+    for guesses, count in enumerate(stats.distribution, 1):
+        lines.append(f"`{guesses}` {'█' * max(1, count * 12 // most) if count else '▏'} {count}")
+    return "\n".join(lines)
+
+
+def leaderboard_message(stats: GuildStats):
+    """
+    :param stats: the guild's GuildStats
+    :return: the text for /wordle_leaderboard
+    """
+    if not stats.leaderboard.entries:
+        return "Nobody has finished a game here yet"
+    lines = [f"**Leaderboard** ({stats.played} games played, {stats.wins} won)"]
+    for place, (user_id, wins, max_streak, played) in enumerate(stats.leaderboard.entries, 1):
+        lines.append(f"{place}. <@{user_id}> {wins} wins of {played}, best streak {max_streak}")
+    return "\n".join(lines)
+
+
 class WordleDiscordHandler(Cog):
     """
     The Cog registers the slash commands with Discord, and handles when a user triggers a command
     """
 
-    def __init__(self, bot: Bot, game_storage):
+    def __init__(self, bot: Bot, game_storage, render_executor: RenderExecutor = None,
+                 image_cache: EncodedImageCache = None, metrics: Metrics = None, solver: Solver = None,
+                 stats: StatsTracker = None, profiler: CommandProfiler = None):
         self.bot = bot
-        self._game_storage: storage.base_storage.BaseStorage = game_storage
-        self._active_games = {}  # map of channel id -> game instance, assumes one active game per channel
-        self._load_active_games()
+        # blocking BaseStorage backends are wrapped, so the handler only ever awaits storage
+        self._game_storage: storage.async_base_storage.AsyncBaseStorage = as_async_storage(game_storage)
+        self._render_executor = render_executor or RenderExecutor.from_env()
+        self._image_cache = image_cache or EncodedImageCache.from_env()
+        # channel id -> game instance, assumes one active game per channel.  Games are loaded from storage the first
+        # time their channel is used, and dropped again once idle.
+        self._active_games = GameCache(load=self._load_game,
+                                       save=self._save_game if self._game_storage else None,
+                                       max_games=int(os.getenv("MAX_ACTIVE_GAMES") or 10000),
+                                       idle_ttl=float(os.getenv("GAME_IDLE_TTL") or 3600))
+        # held while a guess is applied, one lock per channel with a guess in progress
+        self._channel_locks = KeyedLock()
+        # board posts go out one at a time per channel, paced, and collapsed to the latest state when guesses pile up
+        self._outbound = OutboundScheduler.from_env(self._publish_board)
+        self._restore_task = None
+        self._retention_task = None
+        # the snapshot read at import, its games are restored once, and a new one is written on shutdown
+        self._warm_start = warm_start
+        self._snapshot_path = os.getenv("SNAPSHOT_PATH")
+        self._loaded_at = None
+        # the feedback matrix is only loaded, or built, once someone asks for a hint
+        self._solver = solver
+        self._solver_loading = None
+        self._stats = stats or StatsTracker.from_env(self._game_storage, DB_GAME_NAME)
+        self._metrics = metrics or Metrics.from_env()
+        self._metrics.register_gauge("active_games", lambda: len(self._active_games))
+        self._metrics.register_gauge("render_queue_depth", lambda: self._render_executor.queue_depth)
+        for counter in ("published", "superseded"):
+            self._metrics.register_gauge("board_updates", functools.partial(self._outbound_stat, counter),
+                                         outcome=counter)
+        for stat in ("hits", "disk_hits", "misses", "evictions", "bytes"):
+            self._metrics.register_gauge("image_cache", functools.partial(self._image_cache_stat, stat), stat=stat)
+        if isinstance(self._game_storage, WriteBehindStorage):
+            for counter in ("saves", "coalesced", "flushed", "flushes", "pending"):
+                self._metrics.register_gauge("storage_writes", functools.partial(self._storage_stat, counter),
+                                             counter=counter)
+        # off until an admin starts it with /wordle_profile
+        self._profiler = profiler or CommandProfiler.from_env()
+        self._profiler.add_memory_source("active games", lambda: len(self._active_games))
+        self._profiler.add_memory_source("cached image bytes", functools.partial(self._image_cache_stat, "bytes"))
+        # the renderer in this process, render pool workers each hold their own
+        for cache in ("canvases", "sprites"):
+            self._profiler.add_memory_source(f"board {cache}", functools.partial(self._renderer_memory, cache))
+
+    async def cog_load(self):
+        self._loaded_at = time.perf_counter()
+        if self._game_storage:
+            with startup.phase("storage open"):
+                await self._game_storage.open()
+        self._active_games.start()
+        await self._metrics.start()
+        await self._profiler.start()
+        if self._warm_start:
+            self._consume_snapshot(ShardConfig.from_client(self.bot))
+        snapshot_games = self._warm_start and self._warm_start["games"]
+        if (self._game_storage or snapshot_games) and (os.getenv("RESTORE_GAMES") or "1") != "0":
+            self._restore_task = asyncio.ensure_future(self._restore_games())
+        else:
+            startup.report_once(self._metrics)
+        retention_interval = float(os.getenv("RETENTION_INTERVAL") or 3600)
+        if self._game_storage and retention_interval > 0:
+            self._retention_task = asyncio.ensure_future(self._retain_periodically(retention_interval))
+
+    async def cog_unload(self):
+        for task in (self._restore_task, self._retention_task):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._restore_task = self._retention_task = None
+        await self._metrics.stop()
+        await self._profiler.close()
+        await self._outbound.close()
+        games = self._active_games.games()
+        await self._active_games.close()
+        if self._snapshot_path:
+            await self._write_snapshot(games)
+        await self._render_executor.shutdown()
+        await self._image_cache.wait_for_disk()
+        await self._stats.close()
+        if self._game_storage:
+            await self._game_storage.close()
+
+    def _image_cache_stat(self, stat):
+        return self._image_cache.stats[stat]
+
+    @staticmethod
+    def _renderer_memory(cache):
+        return board_renderer.memory_usage()[cache]
 
-    def _load_active_games(self):
+    def _storage_stat(self, counter):
+        return self._game_storage.counters[counter]
+
+    def _outbound_stat(self, counter):
+        return self._outbound.counters[counter]
+
+    async def _load_game(self, channel_id):
         """
-        If there were any active games when the program last shutdown, reload those game states
-        :return:
+        If the channel had a game when it was last used, reload that game state
+        :param channel_id: the Discord channel id
+        :return: a WordleGame instance, or None if there is nothing stored for the channel, or what is stored can't be
+            read, in which case it is deleted so the channel starts a new game
+        """
+        if not self._game_storage:
+            return None
+        game_state = await self._game_storage.load_game_state(DB_GAME_NAME, channel_id)
+        if game_state is None:
+            return None
+        game = WordleGame()
+        try:
+            game.game_state = decode_game_state(game_state)
+        except (ValueError, IndexError, struct.error):
+            logger.exception(f"Failed to decode the stored game for channel {channel_id}, starting a new one")
+            await self._game_storage.delete_game_state(DB_GAME_NAME, channel_id)
+            return None
+        return game
+
+    def _consume_snapshot(self, shards: ShardConfig):
         """
+        Remove the snapshot the bot started from, now that its games are held in memory.  Games move on in storage from
+        here, so if this process died without writing a new snapshot, restarting from the old one would roll them back.
+        When several processes share SNAPSHOT_PATH, one running other shards leaves the snapshot for the shards that
+        wrote it, and only uses its word lists and sprites.
+        :param shards: the shards this process runs
+        :return: nothing
+        """
+        if shards.sharded and self._warm_start["meta"].get("shards") != [list(shards.shard_ids), shards.shard_count]:
+            logger.info(f"Leaving the snapshot {self._warm_start['path']} for the shards that wrote it")
+            self._warm_start["games"] = b""
+            return
+        try:
+            os.unlink(self._warm_start["path"])
+        except FileNotFoundError:
+            pass
+        except OSError:
+            logger.exception(f"Failed to remove the snapshot {self._warm_start['path']}, ignoring its games")
+            self._warm_start["games"] = b""
+
+    async def _write_snapshot(self, games):
+        """
+        Write the warm start snapshot to SNAPSHOT_PATH.  Failing to is logged, the next start just takes longer.
+        :param games: (channel id, WordleGame) for each game that was held in memory
+        :return: nothing
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            size = await loop.run_in_executor(None, write_warm_start, self._snapshot_path, games,
+                                              ShardConfig.from_client(self.bot))
+            logger.info(f"Wrote a {size} byte snapshot to {self._snapshot_path}")
+        except Exception:
+            logger.exception(f"Failed to write the snapshot {self._snapshot_path}")
+
+    async def _restore_games(self):
+        """
+        Load unfinished games into memory ahead of their next guess, in the background once the bot has logged in.
+        Games in a recent enough snapshot from the same shards are restored first.  Then rows are streamed from
+        storage and decoded in batches off the event loop, until the game cache is full, skipping games the snapshot
+        had.  When the bot is sharded across processes, only games in guilds this process's shards own are restored.
+        Games that aren't restored still load on their channel's next guess.
+        :return: nothing
+        """
+        if self.bot is not None:
+            await self.bot.wait_until_ready()  # the shard count is only known for sure once connected
+        startup.add("connect", time.perf_counter() - self._loaded_at)
+        shards = ShardConfig.from_client(self.bot)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        restored = 0
+        if self._warm_start and self._warm_start["games"]:
+            with startup.phase("snapshot games"):
+                restored += await self._restore_snapshot_games(shards)
+        self._warm_start = None  # only needed once
         if self._game_storage:
-            game_states = self._game_storage.get_all_game_states(DB_GAME_NAME)
-            for game_state in game_states:
-                game = WordleGame()
-                game.game_state.from_dict(json.loads(game_state['json_game_state']))
-                self._active_games[game_state['channel_id']] = game
+            with startup.phase("storage games"):
+                restored += await self._restore_stored_games(shards)
+        elapsed = loop.time() - started
+        self._metrics.observe("restore_seconds", elapsed)
+        logger.info(f"Restored {restored} games for shards {shards.shard_ids} of {shards.shard_count} "
+                    f"in {elapsed:.1f}s")
+        startup.report_once(self._metrics)
+
+    async def _restore_snapshot_games(self, shards: ShardConfig):
+        """
+        :param shards: the shards this process runs
+        :return: the number of games restored from the snapshot, none if it is from other shards or older than
+            SNAPSHOT_MAX_AGE seconds, as its games may have moved on in storage since
+        """
+        meta = self._warm_start["meta"]
+        if meta.get("shards") != [list(shards.shard_ids), shards.shard_count]:
+            logger.info("The snapshot's games are from other shards, restoring from storage")
+            return 0
+        age = time.time() - meta.get("created", 0)
+        if age > float(os.getenv("SNAPSHOT_MAX_AGE") or 900):
+            logger.info(f"The snapshot's games are {age:.0f}s old, restoring from storage")
+            return 0
+        loop = asyncio.get_running_loop()
+        rows = unpack_snapshot_games(self._warm_start["games"])
+        restored = 0
+        for channel_id, game in await loop.run_in_executor(None, decode_games, rows):
+            if self._active_games.prime(channel_id, game):
+                restored += 1
+        return restored
+
+    async def _restore_stored_games(self, shards: ShardConfig):
+        """
+        :param shards: the shards this process runs
+        :return: the number of games restored from storage
+        """
+        loop = asyncio.get_running_loop()
+        restored = 0
+        batches = self._game_storage.iter_game_states(DB_GAME_NAME,
+                                                      batch_size=int(os.getenv("RESTORE_BATCH_SIZE") or 500),
+                                                      shard=shards.storage_filter)
+        try:
+            async for rows in batches:
+                for channel_id, game in await loop.run_in_executor(None, decode_games, rows):
+                    if self._active_games.prime(channel_id, game):
+                        restored += 1
+                if len(self._active_games) >= self._active_games.max_games:
+                    break
+        except Exception:
+            logger.exception("Failed to restore games, the rest will load when their channel is next used")
+        finally:
+            await batches.aclose()
+        return restored
+
+    async def _retain_periodically(self, interval):
+        """
+        Keep the game_states table down to games worth restoring.  Finished games are moved to the archive once they
+        are ARCHIVE_AFTER seconds old, and unfinished games nobody has played for DELETE_STALE_AFTER seconds are
+        deleted.  Retention covers every shard's games, so only the process running shard 0 does it.
+        :param interval: seconds between runs
+        :return: nothing
+        """
+        finished_age = float(os.getenv("ARCHIVE_AFTER") or 24 * 60 * 60)
+        stale_age = float(os.getenv("DELETE_STALE_AFTER") or 30 * 24 * 60 * 60)
+        while True:
+            await asyncio.sleep(interval)
+            if not ShardConfig.from_client(self.bot).primary:
+                continue
+            try:
+                with self._metrics.time("retention"):
+                    archived, deleted = await self._game_storage.archive_game_states(DB_GAME_NAME, finished_age,
+                                                                                    stale_age)
+                self._metrics.increment("games_archived", archived)
+                self._metrics.increment("games_deleted", deleted)
+                if archived or deleted:
+                    logger.info(f"Archived {archived} finished games, deleted {deleted} stale games")
+            except Exception:
+                logger.exception("Failed to archive old games, will retry")
+
+    async def _get_solver(self):
+        """
+        :return: the Solver instance, loading its feedback matrix in an executor the first time
+        """
+        if self._solver is None:
+            if self._solver_loading is None:
+                loop = asyncio.get_running_loop()
+                self._solver_loading = loop.run_in_executor(None, Solver.from_env,
+                                                            dictionary.words_of_length(NUMBER_OF_LETTERS),
+                                                            words.words_of_length(NUMBER_OF_LETTERS),
+                                                            f"{source_dir}/data")
+            try:
+                self._solver = await self._solver_loading
+            finally:
+                self._solver_loading = None  # so a failed load is tried again on the next hint
+        return self._solver
+
+    async def _save_game(self, channel_id, game: WordleGame):
+        await self._game_storage.save_game_state(game_name=DB_GAME_NAME,
+                                                 channel_id=channel_id,
+                                                 game_state=encode_game_state(game.game_state))
 
     # For the slash commands to register and work properly, we need to bind to particular server (guild) IDs.  There
     # was mention in forums that command will work without explicit server ID binding, but that did not appear to be
@@ -350,45 +1004,206 @@ class WordleDiscordHandler(Cog):
                                 description="Submit a guess for the current Wordle game. If there is no active game,"
                                 "a new one will be started.", )
     async def _guess(self, ctx, guess: str):
+        with self._metrics.time("command", command="wordle"), self._profiler.profile("wordle"):
+            # acknowledge the interaction right away, everything after this may involve storage or rendering
+            await ctx.response.defer(thinking=True)
+            await self._handle_guess(ctx, guess)
 
-        # if a game isn't active, just start a new one
-        game = self._active_games.get(ctx.channel_id)
-        if not game or game.game_state.is_over:
-            game = WordleGame()
-            self._active_games[ctx.channel_id] = game
+    @discord.app_commands.command(name="wordle_hint", description="Privately suggest a next guess for this channel's "
+                                                                  "Wordle game.")
+    async def _hint(self, ctx):
+        with self._metrics.time("command", command="wordle_hint"), self._profiler.profile("wordle_hint"):
+            await ctx.response.defer(ephemeral=True, thinking=True)
+            game = await self._active_games.get(ctx.channel_id)
+            if not game or game.game_state.is_over:
+                await ctx.followup.send("There is no game going in this channel, use `/wordle` to start one.",
+                                        ephemeral=True)
+                return
+            history = game.feedback_history()
+            solver = await self._get_solver()
+            with self._metrics.time("stage", stage="hint"):
+                message = await asyncio.get_running_loop().run_in_executor(None, hint_message, solver, history)
+            await ctx.followup.send(message, ephemeral=True)
 
-        # Check the user's guess, update the board, and post it to discord
-        game.submit_guess(guess, ctx.user.nick or ctx.user.name)
-        prior_message_id = game.game_state.game_board_message_id
-        await self._update_board(game, ctx)
+    async def _handle_guess(self, ctx, guess):
+        # Loading or starting the game, applying the guess and queueing the board all happen under the channel's lock,
+        # so guesses in one channel are applied strictly in order while other channels carry on in parallel.
+        async with self._channel_locks(ctx.channel_id):
+            # if a game isn't active, just start a new one
+            game = await self._active_games.get(ctx.channel_id)
+            if not game or game.game_state.is_over:
+                game = WordleGame()
+                game.game_state.channel_id = ctx.channel_id
+                game.game_state.guild_id = ctx.guild_id
+                await self._active_games.put(ctx.channel_id, game)
 
-        # If there was a prior board posted to Discord for this game, delete that image.  We don't want to keep prior
-        # boards around for the current game, only the final image
-        if prior_message_id:
-            prior_message = await ctx.channel.fetch_message(prior_message_id)
-            await prior_message.delete()
+            # Check the user's guess, update the board, and post it to discord.  If more guesses come in for the
+            # channel before this board goes out, only the latest board is posted.  A finished game's board is always
+            # posted, since it is the one that stays in the channel.
+            game.submit_guess(guess, ctx.user.nick or ctx.user.name, ctx.user.id)
+            finished = game.game_state.is_over
+            self._active_games.mark_dirty(ctx.channel_id)
+            cost = 2 if game.game_state.game_board_message_id else 1  # the upload, and the delete of the prior board
+            publishing = self._outbound.enqueue(ctx.channel_id, (ctx, game), cost=cost, keep=game.game_state.is_over)
 
+        published = await publishing
+        if not published:
+            # a later guess posts a board that includes this one, so just clear the "thinking" response
+            try:
+                await ctx.delete_original_response()
+            except discord.HTTPException:
+                logger.exception(f"Failed to clear superseded response in channel {ctx.channel_id}")
+        if finished:
+            await self._record_game(ctx, game)
+
+    async def _record_game(self, ctx, game: WordleGame):
+        """
+        Count a finished game towards its players' and guild's stats
+        :param ctx: the Interaction for the guess that finished the game
+        :param game: the finished WordleGame instance
+        :return: nothing
+        """
+        try:
+            with self._metrics.time("stage", stage="stats"):
+                await self._stats.record_game(ctx.guild_id, game.game_state.participants, game.winner_id,
+                                              game.game_state.guess_count)
+        except Exception:
+            logger.exception(f"Failed to record stats for the game in channel {ctx.channel_id}")
+
+    async def _publish_board(self, item):
+        """
+        Replace the channel's board with the game's current one, and save the game.  Called by the outbound scheduler,
+        at most once at a time per channel.
+        :param item: a tuple of the Interaction whose response gets the board, and the WordleGame instance
+        :return: nothing
+        """
+        ctx, game = item
+        prior_message_id = game.game_state.game_board_message_id
+        posted = await self._post_board(game, ctx)
+
+        # The prior board is only deleted once the new one is up, so a failed post leaves the channel the board it had,
+        # and the game keeps pointing at it.  The delete and the save don't depend on each other, so they run at the
+        # same time, and a failure in one doesn't stop the other.
+        steps = []
+        if posted:
+            steps.append(self._delete_board(ctx, prior_message_id))
         if self._game_storage:
-            self._game_storage.save_game_state(game_name=DB_GAME_NAME,
-                                               channel_id=ctx.channel_id,
-                                               game_state=json.dumps(game.game_state, cls=WordleJSONEncoder))
+            steps.append(self._save_active_game(ctx.channel_id, game))
+        results = await asyncio.gather(*steps, return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"Failed to finish guess in channel {ctx.channel_id}", exc_info=result)
 
-    # discord.app_commands.command(name="wordle_stats",
-    #                    description = "View how many guesses you won.",)
+    async def _post_board(self, game: WordleGame, ctx):
+        """
+        Post the updated board
+        :param game: a valid WordleGame instance
+        :param ctx: the Interaction for the guess
+        :return: True if the new board was posted
+        """
+        try:
+            await self._update_board(game, ctx)
+            return True
+        except RenderQueueFull:
+            # The guess still counts, the next board posted will include it
+            logger.warning(f"Render queue full, skipped board update for channel {ctx.channel_id}")
+            self._metrics.increment("render_rejected")
+            try:
+                await ctx.followup.send("Too many boards are being drawn right now, your guess was recorded and will "
+                                        "show on the next board.")
+            except Exception:
+                logger.exception(f"Failed to tell channel {ctx.channel_id} its board was skipped")
+        except Exception:
+            logger.exception(f"Failed to post the board in channel {ctx.channel_id}")
+        return False
 
-    @staticmethod
-    async def _update_board(game: WordleGame, ctx):
+    async def _save_active_game(self, channel_id, game: WordleGame):
+        # cleared before saving, so that a change made while the save is in flight marks it unsaved again
+        self._active_games.mark_saved(channel_id)
+        try:
+            with self._metrics.time("stage", stage="save"):
+                await self._save_game(channel_id, game)
+        except Exception:
+            self._active_games.mark_dirty(channel_id)
+            raise
+        # a finished game won't be saved again, so don't leave its final state sitting in a write buffer
+        if game.game_state.is_over:
+            await self._game_storage.flush()
+
+    async def _delete_board(self, ctx, message_id):
+        """
+        If there was a prior board posted to Discord for this game, delete that image.  We don't want to keep prior
+        boards around for the current game, only the final image.  The delete goes straight to the message id, without
+        fetching the message first.
+        :param ctx: the Interaction for the guess
+        :param message_id: the prior board's message id, or None
+        :return: nothing
+        """
+        if not message_id:
+            return
+        with self._metrics.time("stage", stage="delete_prior"):
+            try:
+                await ctx.channel.get_partial_message(message_id).delete()
+            except discord.NotFound:
+                pass  # someone already deleted it, which isn't an error
+
+    @discord.app_commands.command(name="wordle_stats", description="View your Wordle stats in this server, or "
+                                                                    "another player's.")
+    async def _show_stats(self, ctx, player: discord.Member = None):
+        with self._metrics.time("command", command="wordle_stats"), self._profiler.profile("wordle_stats"):
+            await ctx.response.defer(thinking=True)
+            player = player or ctx.user
+            stats = await self._stats.player_stats(ctx.guild_id, player.id)
+            await ctx.followup.send(stats_message(getattr(player, "nick", None) or player.name, stats))
+
+    @discord.app_commands.command(name="wordle_leaderboard", description="View this server's top Wordle players.")
+    async def _show_leaderboard(self, ctx):
+        with self._metrics.time("command", command="wordle_leaderboard"), self._profiler.profile("wordle_leaderboard"):
+            await ctx.response.defer(thinking=True)
+            stats = await self._stats.guild_stats(ctx.guild_id)
+            # the players are mentioned so Discord shows their names, but nobody should be pinged for it
+            await ctx.followup.send(leaderboard_message(stats), allowed_mentions=discord.AllowedMentions.none())
+
+    @discord.app_commands.command(name="wordle_profile", description="Start or stop profiling the bot, or see the "
+                                                                     "latest profiling report.  Admins only.")
+    @discord.app_commands.default_permissions(administrator=True)
+    async def _profile(self, ctx, action: Literal["start", "stop", "report"] = "report"):
+        # default_permissions only hides the command, server admins can still grant it to anyone
+        if not ctx.permissions.administrator:
+            await ctx.response.send_message("Only server admins can profile the bot", ephemeral=True)
+            return
+        await ctx.response.defer(ephemeral=True, thinking=True)
+        if action == "start":
+            await self._profiler.start_capture()
+        elif action == "stop":
+            await self._profiler.stop_capture()
+        elif self._profiler.capturing:
+            await self._profiler.snapshot_memory()
+        report = f"```\n{self._profiler.report()}\n```"
+        dump = self._profiler.latest_dump
+        if action == "report" and dump is not None and dump.exists():
+            await ctx.followup.send(report, file=discord.File(str(dump)), ephemeral=True)
+        else:
+            await ctx.followup.send(report, ephemeral=True)
+
+    async def _update_board(self, game: WordleGame, ctx):
         """
         Uploads the latest game board image to Discord, and keeps track of the new post in case we need to remove
         it later.
         :param game: a valid WordleGame instance
-        :param ctx: a SlashContext object
+        :param ctx: the deferred Interaction for the guess
         :return: nothing
         """
-        image = game.render()
-        arr = io.BytesIO()  # makes an in-memory array behave like a file when it's not actually a file
-        image.save(arr, format="JPEG")  # saves image in-memory
-        arr.seek(0)
+        # many boards are identical (an empty board, a popular opening guess), so reuse the encoded image if we have it
+        with self._metrics.time("stage", stage="render"):
+            rows, message, render_key = game.snapshot()
+            image_key = board_key(rows, message, BOARD_IMAGE_VARIANT)
+            image_bytes = await self._image_cache.get(image_key)
+            if image_bytes is None:
+                image_bytes = await self._render_executor.run(encode_board, rows, message, render_key)
+                await self._image_cache.put(image_key, image_bytes)
+        arr = io.BytesIO(image_bytes)
         f = discord.File(arr, filename='wordle_board.jpg')  # creates the "file" representation
-        game_board_message = await (await ctx.client.get_context(ctx)).send(file=f)  # sends representation of the in-memory array to discord
+        with self._metrics.time("stage", stage="upload"):
+            game_board_message = await ctx.followup.send(file=f, wait=True)  # sends representation of the in-memory array to discord
         game.game_state.game_board_message_id = game_board_message.id